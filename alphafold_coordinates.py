@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features From AlphaFold Coordinates ###
+#######################################################
+
+# import statements
+import sys
+import os
+import glob
+import gzip
+import shlex
+import multiprocessing
+import numpy as np
+
+# distance in angstroms between the alpha carbons of two residues in contact
+contact_cutoff = 8.0
+# atomic masses used for the center of mass, other elements count as carbon
+element_masses = {'H': 1.008, 'C': 12.011, 'N': 14.007, 'O': 15.999, 'S': 32.06, 'P': 30.974, 'SE': 78.971}
+# headeralpha columns made from the coordinates
+coordinate_labels = ['Minimum Distance to Center of Mass', 'Maximum Distance to Center of Mass', 'Average Distance to Center of Mass', 'Number of Contacts']
+structure_suffixes = ['.pdb', '.pdb.gz', '.cif', '.cif.gz']
+# output of write_coordinate_features in the databases folder
+coordinate_features_name = 'alphafold_coordinate_features.csv'
+
+# functions
+def open_structure(path):
+    '''
+    Opens a coordinate file for reading text, gzip compressed when it ends in .gz
+    '''
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt')
+    return open(path)
+
+def read_pdb_atoms(fo):
+    '''
+    Reads the ATOM records of the first model of a PDB file
+    Outputs:
+        atoms (list): (residue key, atom name, element, x, y, z) per atom, the residue key is (chain, residue number, insertion code)
+    '''
+    atoms = []
+    for line in fo:
+        record = line[:6]
+        if record == 'ENDMDL':
+            break
+        if record != 'ATOM  ':
+            continue
+        # only the first of alternate locations
+        if line[16] not in (' ', 'A'):
+            continue
+        element = line[76:78].strip().upper() or line[12:16].strip()[:1]
+        atoms.append(((line[21], line[22:26].strip(), line[26]), line[12:16].strip(), element, float(line[30:38]), float(line[38:46]), float(line[46:54])))
+    return atoms
+
+def read_cif_atoms(fo):
+    '''
+    Reads the ATOM rows of the first model of the _atom_site table of an mmCIF file
+    Outputs:
+        atoms (list): (residue key, atom name, element, x, y, z) per atom, like read_pdb_atoms
+    '''
+    columns = []
+    atoms = []
+    model = None
+    for line in fo:
+        if line.startswith('_atom_site.'):
+            columns.append(line.strip().split('.', 1)[1])
+            continue
+        if not columns or not line.strip():
+            continue
+        if line.startswith(('#', 'loop_', '_')):
+            # end of the _atom_site table
+            break
+        values = shlex.split(line) if '"' in line or "'" in line else line.split()
+        row = dict(zip(columns, values))
+        if row.get('group_PDB') != 'ATOM':
+            continue
+        model = model or row.get('pdbx_PDB_model_num')
+        if row.get('pdbx_PDB_model_num') != model:
+            break
+        if row.get('label_alt_id', '.') not in ('.', '?', 'A'):
+            continue
+        chain = row.get('auth_asym_id', row.get('label_asym_id'))
+        number = row.get('auth_seq_id', row.get('label_seq_id'))
+        insertion = row.get('pdbx_PDB_ins_code', '?')
+        atoms.append(((chain, number, insertion), row.get('label_atom_id', row.get('auth_atom_id')), row.get('type_symbol', '').upper(), float(row['Cartn_x']), float(row['Cartn_y']), float(row['Cartn_z'])))
+    return atoms
+
+def read_structure(path):
+    '''
+    Reads the atom coordinates of an AlphaFold model
+    Inputs:
+        path (str): PDB (.pdb) or mmCIF (.cif) file, either can be gzip compressed (.gz)
+    Outputs:
+        structure (dict): 'coordinates' (atoms x 3), 'masses' (per atom) and 'alpha_carbons' (residues x 3, in file order)
+    '''
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+    with open_structure(path) as fo:
+        atoms = read_cif_atoms(fo) if name.endswith('.cif') else read_pdb_atoms(fo)
+    if not atoms:
+        raise ValueError(path + ' has no atoms')
+    coordinates = np.array([atom[3:] for atom in atoms], dtype=float)
+    masses = np.array([element_masses.get(atom[2], element_masses['C']) for atom in atoms])
+    alpha_carbons = {}
+    for index in range(len(atoms)):
+        if atoms[index][1] == 'CA' and atoms[index][0] not in alpha_carbons:
+            alpha_carbons[atoms[index][0]] = index
+    return {'coordinates': coordinates, 'masses': masses, 'alpha_carbons': coordinates[list(alpha_carbons.values())]}
+
+def center_of_mass_distances(structure):
+    '''
+    Distance of each residue's alpha carbon to the center of mass of all atoms, the values of a centerofmass _dcom.csv file
+    '''
+    center = structure['masses'] @ structure['coordinates']/structure['masses'].sum()
+    return np.sqrt(((structure['alpha_carbons'] - center)**2).sum(axis=1))
+
+def count_contacts(points, cutoff=contact_cutoff):
+    '''
+    Number of residue pairs closer than the cutoff, each pair counted once, with a k-d tree so only nearby residues are compared
+    Inputs:
+        points (numpy array): residues x 3 alpha carbon coordinates
+        cutoff (float): default contact_cutoff, contact distance in angstroms
+    Outputs:
+        (int) number of contacts, like get_num_contacts counts the upper triangle of a contact map
+    '''
+    from scipy.spatial import cKDTree
+    if len(points) < 2:
+        return 0
+    tree = cKDTree(points)
+    # count_neighbors counts every ordered pair and each residue with itself
+    return int((tree.count_neighbors(tree, cutoff) - len(points))//2)
+
+def coordinate_features(path, cutoff=contact_cutoff):
+    '''
+    The center of mass and contact features of one AlphaFold model, the values get_com and get_num_contacts read from precomputed files
+    Inputs:
+        path (str): PDB or mmCIF file, can be gzip compressed
+        cutoff (float): default contact_cutoff, contact distance in angstroms
+    Outputs:
+        out_dict (dict): coordinate_labels mapped to values
+    '''
+    structure = read_structure(path)
+    distances = center_of_mass_distances(structure)
+    return {
+        'Minimum Distance to Center of Mass': float(distances.min()),
+        'Maximum Distance to Center of Mass': float(distances.max()),
+        'Average Distance to Center of Mass': float(distances.mean()),
+        'Number of Contacts': count_contacts(structure['alpha_carbons'], cutoff),
+    }
+
+def structure_files(structure_dir):
+    '''
+    Finds the AlphaFold models in a folder, named like AF-P04637-F1-model_v4.pdb or .cif (optionally .gz)
+    Outputs:
+        (dict) uniprot id mapped to its file, the highest model version when there are several
+    '''
+    files = {}
+    versions = {}
+    for path in sorted(glob.glob(os.path.join(structure_dir, 'AF-*-F1-model_v*'))):
+        if not any(path.endswith(suffix) for suffix in structure_suffixes):
+            continue
+        version = os.path.basename(path).split('-model_v', 1)[1].split('.')[0]
+        if not version.isdigit():
+            continue
+        gnuid = os.path.basename(path).split('-')[1]
+        # compared as numbers, model_v10 is newer than model_v4
+        if gnuid not in versions or int(version) >= versions[gnuid]:
+            files[gnuid] = path
+            versions[gnuid] = int(version)
+    return files
+
+def features_in_worker(task):
+    gnuid, path, cutoff = task
+    try:
+        return gnuid, coordinate_features(path, cutoff)
+    except (OSError, ValueError, IndexError, KeyError, EOFError) as error:
+        return gnuid, error
+
+def coordinate_features_for_all(structure_dir, ids=None, processes=1, cutoff=contact_cutoff):
+    '''
+    Center of mass and contact features of many AlphaFold models, spread over processes
+    Inputs:
+        structure_dir (str): folder of AlphaFold models
+        ids (list): default every model in the folder, uniprot ids to run
+        processes (int): default 1, number of processes
+        cutoff (float): default contact_cutoff, contact distance in angstroms
+    Outputs:
+        features (dict): uniprot id mapped to its out_dict from coordinate_features
+        errors (dict): uniprot id mapped to the error of models that could not be read
+    '''
+    from build_progress import ProgressReporter
+    files = structure_files(structure_dir)
+    if ids is not None:
+        files = {gnuid: files[gnuid] for gnuid in ids if gnuid in files}
+    tasks = [(gnuid, files[gnuid], float(cutoff)) for gnuid in sorted(files)]
+    progress = ProgressReporter(len(tasks), 'structures')
+    features = {}
+    errors = {}
+    if processes > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        results = pool.imap_unordered(features_in_worker, tasks, chunksize=max(1, len(tasks)//(processes*16)))
+    else:
+        pool = None
+        results = map(features_in_worker, tasks)
+    for gnuid, result in results:
+        if isinstance(result, Exception):
+            errors[gnuid] = result
+        else:
+            features[gnuid] = result
+        progress.update()
+    if pool is not None:
+        pool.close()
+        pool.join()
+    progress.finish()
+    return features, errors
+
+def write_coordinate_features(structure_dir, database_root='./databases/', processes=1, cutoff=contact_cutoff):
+    '''
+    Writes the center of mass and contact features of every AlphaFold model in a folder to databases/alphafold_coordinate_features.csv, one line per uniprot id
+    Models that cannot be read are listed in databases/alphafold_coordinate_errors.csv
+    Inputs:
+        structure_dir (str): folder of AlphaFold models
+        database_root (str): default './databases/'
+        processes (int): default 1, number of processes
+        cutoff (float): default contact_cutoff, contact distance in angstroms
+    Outputs:
+        (int) number of models written
+    '''
+    database_root = os.path.join(database_root, '')
+    features, errors = coordinate_features_for_all(structure_dir, processes=int(processes), cutoff=float(cutoff))
+    with open(database_root + coordinate_features_name, 'w') as fo:
+        fo.write(','.join(['Name'] + coordinate_labels) + '\n')
+        for gnuid in sorted(features):
+            fo.write(','.join([gnuid] + [str(features[gnuid][label]) for label in coordinate_labels]) + '\n')
+    with open(database_root + 'alphafold_coordinate_errors.csv', 'w') as fo:
+        for gnuid in sorted(errors):
+            fo.write(gnuid + ',' + str(errors[gnuid]).replace(',', ' ') + '\n')
+    return len(features)
+
+def read_coordinate_features(database_root='./databases/'):
+    '''
+    Reads databases/alphafold_coordinate_features.csv
+    Outputs:
+        (dict) uniprot id mapped to coordinate_labels mapped to values
+    '''
+    features = {}
+    with open(database_root + coordinate_features_name) as fo:
+        labels = fo.readline().rstrip('\n').split(',')[1:]
+        for line in fo:
+            split_line = line.rstrip('\n').split(',')
+            features[split_line[0]] = {labels[index]: float(split_line[index + 1]) for index in range(len(labels))}
+    return features
+
+if __name__ == '__main__':
+    # python alphafold_coordinates.py structure_dir [databases/] [processes] [cutoff]
+    print(write_coordinate_features(*sys.argv[1:]))
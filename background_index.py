@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Nearest Background Search  ###
+#######################################################
+
+# import statements
+import sys
+import os
+import glob
+import numpy as np
+from generate_structural_features import StructuralFeatures, load_background, read_sample_file, write_output, parse_bool, make_frames, frequency_features, average_features, all_headers
+
+# kept in the databases folder, the feature vectors of every background
+index_name = 'background_index.npz'
+index_labels = frequency_features + average_features
+# a folder with these files is a background, see make_background.py
+background_feature_files = ['number_proteins_found.csv', 'frequency_background.csv', 'average_background.csv']
+nearest_columns = ['background', 'similarity', 'distance', 'proteins_in_background']
+
+# functions
+def find_backgrounds(database_root):
+    '''
+    Names of the background folders in a databases folder
+    '''
+    names = []
+    for path in sorted(glob.glob(database_root + '*/')):
+        if all(os.path.exists(path + file_name) for file_name in background_feature_files):
+            names.append(os.path.basename(path[:-1]))
+    return names
+
+def background_vector(background, labels):
+    '''
+    Feature values of a loaded background, the average for continous features and the frequency for the others, 0 when missing like compare_frequency_to_background
+    Inputs:
+        background (dict): output of load_background
+        labels (list): feature labels
+    Outputs:
+        (numpy array) one value per label
+    '''
+    values = []
+    for label in labels:
+        if label in background['average']:
+            values.append(background['average'][label][0])
+        else:
+            values.append(background['frequency'].get(label, 0))
+    return np.array(values, dtype=float)
+
+def build_background_index(database_root='./databases/', backgrounds=None, index_path=None):
+    '''
+    Writes the feature vectors of many backgrounds to one file that samples can be ranked against, run again after adding backgrounds
+    Inputs:
+        database_root (str): default './databases/', folder with the background folders
+        backgrounds (list): default every background folder in database_root, names of the backgrounds
+        index_path (str): default background_index.npz in database_root
+    Outputs:
+        index_path (str): file written
+    '''
+    database_root = os.path.join(database_root, '')
+    if backgrounds is None:
+        backgrounds = find_backgrounds(database_root)
+    if not backgrounds:
+        raise ValueError('No backgrounds found in ' + database_root)
+    index_path = index_path or database_root + index_name
+    values = np.zeros((len(backgrounds), len(index_labels)))
+    found = np.zeros(len(backgrounds), dtype=np.int64)
+    for row in range(len(backgrounds)):
+        # only the frequency and average files are read
+        background = load_background(database_root + backgrounds[row] + '/', ['human', 'alphafold'])
+        values[row] = background_vector(background, index_labels)
+        found[row] = background['found']
+    with open(index_path, 'wb') as fo:
+        np.savez(fo, names=np.array(backgrounds, dtype=str), labels=np.array(index_labels, dtype=str), values=values, found=found)
+    return index_path
+
+class BackgroundIndex:
+    '''
+    Feature vectors of many backgrounds, each feature scaled to mean 0 and standard deviation 1 across the backgrounds so that lengths and fractions weigh the same
+    Samples are ranked against every background at once by the cosine similarity of their scaled vectors
+    '''
+    def __init__(self, index_path, labels=None):
+        '''
+        Inputs:
+            index_path (str): file written by build_background_index
+            labels (list): default every feature of the index, features compared, like the labels of the selected feature groups
+        '''
+        with np.load(index_path) as data:
+            self.names = [str(name) for name in data['names']]
+            index_order = [str(label) for label in data['labels']]
+            values = data['values']
+            self.found = data['found']
+        self.labels = [label for label in index_order if labels is None or label in labels]
+        if not self.labels:
+            raise ValueError('None of the features are in ' + index_path)
+        values = values[:, [index_order.index(label) for label in self.labels]]
+        self.center = values.mean(axis=0)
+        self.scale = values.std(axis=0)
+        # features that are the same in every background tell them apart by nothing
+        self.scale[self.scale == 0] = np.inf
+        self.scaled = (values - self.center)/self.scale
+        self.norms = np.linalg.norm(self.scaled, axis=1)
+
+    def rank(self, vectors, top_k=None):
+        '''
+        Ranks the backgrounds for many samples with one matrix product
+        Inputs:
+            vectors (numpy array): samples x labels feature values, or one sample's values
+            top_k (int): default every background, number of backgrounds kept per sample
+        Outputs:
+            order (numpy array): samples x top_k background rows, most similar first
+            similarity (numpy array): cosine similarity of the scaled vectors, 0 for a vector at the center of the backgrounds
+            distance (numpy array): euclidean distance between the scaled vectors
+        '''
+        # a sample with no proteins found has no averages
+        scaled = (np.nan_to_num(np.atleast_2d(np.asarray(vectors, dtype=float))) - self.center)/self.scale
+        norms = np.linalg.norm(scaled, axis=1)
+        products = scaled @ self.scaled.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = np.nan_to_num(products/(norms[:, None]*self.norms[None, :]), nan=0.0, posinf=0.0, neginf=0.0)
+        distance = np.sqrt(np.maximum(norms[:, None]**2 + self.norms[None, :]**2 - 2*products, 0))
+        order = np.argsort(-similarity, axis=1, kind='stable')[:, :top_k]
+        return order, np.take_along_axis(similarity, order, axis=1), np.take_along_axis(distance, order, axis=1)
+
+    def ranking_rows(self, order, similarity, distance):
+        '''
+        Rows in nearest_columns order of one sample's ranking
+        '''
+        return [(self.names[order[position]], float(similarity[position]), float(distance[position]), int(self.found[order[position]])) for position in range(len(order))]
+
+def open_index(sf, index_path=None):
+    '''
+    BackgroundIndex of a StructuralFeatures' databases folder, over the features of its selected feature groups
+    '''
+    return BackgroundIndex(index_path or sf.database_root + index_name, sf.frequency_labels + sf.average_labels)
+
+def nearest_backgrounds(sf, genes, use_weight=None, top_k=None, index=None):
+    '''
+    Ranks the backgrounds by how similar their features are to a gene list's averages
+    Inputs:
+        sf (StructuralFeatures): loaded databases
+        genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to expression values
+        use_weight (bool): weigh the averages by the expression values, by default True when weights are given
+        top_k (int): default every background, number of backgrounds returned
+        index (BackgroundIndex): default the index in the databases folder
+    Outputs:
+        (pandas DataFrame) nearest_columns, most similar background first
+    '''
+    import pandas as pd
+    index = index or open_index(sf)
+    summary = sf.aggregate(genes, use_weight)
+    if summary['found'] == 0:
+        raise ValueError('None of the genes or protiens were found in the structural features database')
+    order, similarity, distance = index.rank([summary['average'][label] for label in index.labels], top_k)
+    return pd.DataFrame(index.ranking_rows(order[0], similarity[0], distance[0]), columns=nearest_columns)
+
+def score_nearest(sf, genes, use_weight=None, top_k=1, index=None):
+    '''
+    Scores a gene list against only its most similar backgrounds, the gene list is aggregated once
+    Inputs:
+        sf (StructuralFeatures): loaded databases, the backgrounds are folders of its databases folder
+        genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to expression values
+        use_weight (bool): weigh the averages by the expression values, by default True when weights are given
+        top_k (int): default 1, number of backgrounds scored against
+        index (BackgroundIndex): default the index in the databases folder
+    Outputs:
+        ranking (pandas DataFrame): nearest_columns of the top_k backgrounds
+        scores (dict): background name mapped to the average and frequency DataFrames of StructuralFeatures.score
+    '''
+    import pandas as pd
+    index = index or open_index(sf)
+    summary = sf.aggregate(genes, use_weight)
+    if summary['found'] == 0:
+        raise ValueError('None of the genes or protiens were found in the structural features database')
+    order, similarity, distance = index.rank([summary['average'][label] for label in index.labels], top_k)
+    rows = index.ranking_rows(order[0], similarity[0], distance[0])
+    scores = {}
+    for row in rows:
+        average_rows, frequency_rows = sf.compare(summary, row[0])
+        scores[row[0]] = make_frames(average_rows, frequency_rows, [], summary['found'])
+    return pd.DataFrame(rows, columns=nearest_columns), scores
+
+def nearest_for_all_files_in_folder(input_dir, folder_out, top_k=None, use_weight=False, database_root='./databases/', features=None):
+    '''
+    Ranks the backgrounds for every input file of a directory, all samples against all backgrounds in one matrix product
+    Inputs:
+        input_dir (str): directory containing all input files
+        folder_out (str): directory the ranking is written to, as nearest_backgrounds.csv with one line per sample and background, samples with no proteins found are listed in errors.csv
+        top_k (int): default every background, number of backgrounds written per sample
+        use_weight (bool or str): default False, weigh the averages by the input expression levels
+        database_root (str): default './databases/', folder with the databases and background_index.npz
+        features (str): default None for all, comma separated feature groups compared, see parse_feature_groups
+    Outputs:
+        (int) number of samples ranked
+    '''
+    use_weight = parse_bool(use_weight)
+    top_k = int(top_k) if top_k else None
+    sf = StructuralFeatures(database_root, features=features)
+    index = open_index(sf)
+    input_files = sorted(glob.glob(input_dir + '*'))
+    if not input_files:
+        return 0
+    batch = sf.aggregate_many([read_sample_file(sample_file, use_weight) for sample_file in input_files], use_weight)
+    if not os.path.exists(folder_out):
+        os.makedirs(folder_out)
+    # a sample with no proteins found has no averages to rank by, it is listed in errors.csv like in the other modes
+    ranked = [sample for sample in range(len(input_files)) if batch['found'][sample] > 0]
+    for sample in range(len(input_files)):
+        if batch['found'][sample] == 0:
+            write_output(folder_out + 'errors.csv', input_files[sample] + '\n')
+    order, similarity, distance = index.rank(batch['average'][ranked][:, [all_headers.index(label) for label in index.labels]], top_k)
+    with open(folder_out + 'nearest_backgrounds.csv', 'w') as fo:
+        fo.write(','.join(['sample', 'rank'] + nearest_columns) + '\n')
+        for row in range(len(ranked)):
+            rows = index.ranking_rows(order[row], similarity[row], distance[row])
+            for position in range(len(rows)):
+                fo.write(','.join([input_files[ranked[row]].split('/')[-1], str(position + 1)] + [str(value) for value in rows[position]]) + '\n')
+    return len(ranked)
+
+if __name__ == '__main__':
+    # python background_index.py databases/ to build the index
+    # python background_index.py input_dir/ output_dir/ [top_k] [use_weight] [databases/] [features] to rank the backgrounds for each input file
+    if len(sys.argv) > 2:
+        print(nearest_for_all_files_in_folder(*sys.argv[1:]))
+    else:
+        print(build_background_index(*sys.argv[1:]))
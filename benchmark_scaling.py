@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Scaling Benchmark          ###
+#######################################################
+
+# import statements
+import sys
+import os
+import io
+import json
+import math
+import time
+import random
+import sqlite3
+import resource
+import contextlib
+import subprocess
+from generate_structural_features import header, headeralpha
+
+# sizes run by default, genes in one sample and samples in one cohort
+default_gene_sizes = [100, 500, 2000, 5000, 20000]
+default_sample_sizes = [1, 10, 100, 1000, 5000]
+# budgets checked by default, None turns a check off
+default_budgets = {'seconds': None, 'peak_rss_mb': None, 'exponent': 1.5}
+benchmark_columns = ['kind', 'size', 'seconds', 'seconds_above_load', 'items_per_second', 'peak_rss_mb', 'exponent']
+
+# functions
+def peak_rss_mb():
+    '''
+    Peak resident memory of this process so far in MB
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on mac
+    if sys.platform == 'darwin':
+        return peak/(1024.0*1024.0)
+    return peak/1024.0
+
+def benchmark_ids(num_proteins):
+    '''
+    Gene names of the synthetic database, none of them is part of another so the like '%name%' lookups find one protien each
+    '''
+    return ['GENE' + str(index).zfill(6) for index in range(num_proteins)]
+
+def make_benchmark_database(database_root, num_proteins=20000, seed=0):
+    '''
+    Writes a synthetic database the size of the human proteome: the precounted tables in the feature store, a structure database with interproscan domains and scope classes, and a human_background made from every protien
+    Values are random, only the sizes and shapes are like the real databases
+    Inputs:
+        database_root (str): folder to write the databases into, ending in /
+        num_proteins (int): default 20000, number of proteins
+        seed (int): default 0, random seed
+    Outputs:
+        ids (list): gene names in the database
+    '''
+    from feature_store import FeatureStoreWriter, store_name
+    from make_background import make_backgrounds_from_ids
+    rng = random.Random(seed)
+    if not os.path.exists(database_root):
+        os.makedirs(database_root)
+    ids = benchmark_ids(num_proteins)
+    with FeatureStoreWriter(database_root + store_name, 'precounted_human_genome', header[1:], replace_table=True) as store:
+        for gnuid in ids:
+            store.add(gnuid, [rng.randint(0, 1) if label.startswith('Y/n') else rng.randint(0, 60) for label in header[1:]])
+    with FeatureStoreWriter(database_root + store_name, 'precounted_alpha_fold', headeralpha, column_type='REAL', replace_table=True) as store:
+        for index in range(len(ids)):
+            # about one in five proteins has no alpha fold model
+            if index % 5 != 0:
+                store.add(ids[index], [rng.randint(0, 50) for label in headeralpha[:-4]] + [rng.uniform(1, 5), rng.uniform(20, 60), rng.uniform(10, 30), rng.randint(100, 2000)])
+    if os.path.exists(database_root + 'structure_database.db'):
+        os.remove(database_root + 'structure_database.db')
+    con = sqlite3.connect(database_root + 'structure_database.db')
+    con.execute('CREATE TABLE uniprot_info (uid TEXT, gname TEXT, organism TEXT)')
+    con.execute('CREATE TABLE domain (id INTEGER, uid TEXT, start INTEGER, stop INTEGER, source TEXT, ips TEXT, length INTEGER, descs TEXT)')
+    con.execute('CREATE TABLE fold (id INTEGER, uid TEXT, start INTEGER, stop INTEGER, fold_id TEXT, fold TEXT, superfamily_id TEXT, superfamily TEXT, family_id TEXT, family TEXT, prob REAL, evalue REAL, pvalue REAL, coverage REAL, query_start INTEGER, query_end INTEGER, percent_identity REAL, template_start INTEGER, template_end INTEGER)')
+    uniprot_rows, domain_rows, fold_rows = [], [], []
+    for index in range(len(ids)):
+        uid = 'P' + str(index).zfill(6)
+        uniprot_rows.append((uid, ids[index] + ' ' + ids[index] + 'ALIAS', 'human'))
+        for domain in range(rng.randint(0, 4)):
+            classes = [rng.randint(0, 3000) for number in range(rng.randint(1, 3))]
+            domain_rows.append((index, uid, 0, 0, 'interproscan', ';'.join('IPR' + str(number).zfill(6) for number in classes), 0, ';'.join('domain ' + str(number) for number in classes)))
+        for fold in range(rng.randint(0, 4)):
+            number = rng.randint(0, 1200)
+            fold_rows.append((index, uid, 0, 0, 'f.' + str(number), 'fold ' + str(number), 'sf.' + str(number), 'superfamily ' + str(number), 'fa.' + str(rng.randint(0, 5000)), 'family', rng.uniform(20, 100), 10**rng.uniform(-9, -3), 10**rng.uniform(-9, -3), rng.uniform(0, 1), 0, 0, rng.uniform(10, 100), rng.randint(0, 20), rng.randint(20, 300)))
+    con.executemany('INSERT INTO uniprot_info VALUES (?,?,?)', uniprot_rows)
+    con.executemany('INSERT INTO domain VALUES (' + ','.join('?'*8) + ')', domain_rows)
+    con.executemany('INSERT INTO fold VALUES (' + ','.join('?'*19) + ')', fold_rows)
+    con.commit()
+    con.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        make_backgrounds_from_ids({'human_background': ids}, database_root)
+    return ids
+
+def write_samples(input_dir, ids, num_samples, genes_per_sample, seed=0):
+    '''
+    Writes sample files of random gene names with expression values, about one in twenty names is not in the database
+    '''
+    rng = random.Random(seed)
+    if not os.path.exists(input_dir):
+        os.makedirs(input_dir)
+    for sample in range(num_samples):
+        with open(input_dir + 'sample' + str(sample).zfill(5) + '.csv', 'w') as fo:
+            for gene in range(genes_per_sample):
+                gnuid = rng.choice(ids) if rng.random() > 0.05 else 'MISSING' + str(rng.randint(0, 10**6))
+                fo.write(gnuid + ',' + str(round(rng.uniform(0.1, 10), 2)) + '\n')
+
+def measure(kind, size, database_root, work_dir, genes_per_sample=200):
+    '''
+    Runs one end to end measurement in this process, meant to be run in a fresh process so the peak memory is its own
+    Inputs:
+        kind (str): 'load' (only loading the databases, background and statistics modules), 'genes' (one sample of size genes through run_for_all_files_in_folder) or 'samples' (size samples of genes_per_sample genes through run_cohort)
+        size (int): number of genes or samples
+        database_root (str): folder of the benchmark database
+        work_dir (str): folder for the inputs and outputs of the run
+        genes_per_sample (int): default 200, genes in each sample of a cohort
+    Outputs:
+        (dict) seconds and peak_rss_mb
+    '''
+    from generate_structural_features import StructuralFeatures, run_for_all_files_in_folder
+    from cohort import run_cohort
+    size = int(size)
+    run_dir = os.path.join(work_dir, kind + '_' + str(size), '')
+    input_dir = run_dir + 'input/'
+    folder_out = run_dir + 'out/'
+    if not os.path.exists(folder_out):
+        os.makedirs(folder_out)
+    if kind != 'load':
+        with open(database_root + 'benchmark_proteins.txt') as fo:
+            ids = benchmark_ids(int(fo.read()))
+        if kind == 'genes':
+            write_samples(input_dir, ids, 1, size)
+        else:
+            write_samples(input_dir, ids, size, int(genes_per_sample))
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if kind == 'load':
+            # the statistics modules are imported on first use, their import is part of the fixed cost of every run
+            import scipy.stats
+            import statsmodels.stats.multitest
+            import statsmodels.stats.weightstats
+            StructuralFeatures(database_root).load_background()
+        elif kind == 'genes':
+            run_for_all_files_in_folder(input_dir, folder_out, database_root=database_root)
+        else:
+            run_cohort(input_dir, folder_out, database_root=database_root)
+    return {'seconds': time.time() - start, 'peak_rss_mb': peak_rss_mb()}
+
+def measure_in_subprocess(kind, size, database_root, work_dir, genes_per_sample=200):
+    '''
+    Runs measure in a new python process
+    '''
+    command = [sys.executable, os.path.abspath(__file__), 'measure', kind, str(size), database_root, work_dir, str(genes_per_sample)]
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True, universal_newlines=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().split('\n')[-1])
+
+def scaling_rows(kind, sizes, results, load_seconds, min_seconds=0.5):
+    '''
+    Turns the measurements of one kind into rows of a scaling curve
+    The exponent is the slope of log(time above loading) against log(size) from the size before, about 1 for linear and 2 for quadratic work, left empty while the times are too short to compare
+    Inputs:
+        kind (str): 'genes' or 'samples'
+        sizes (list): sizes in increasing order
+        results (list): measure output per size
+        load_seconds (float): time loading the databases alone takes
+        min_seconds (float): default 0.5, shortest time above loading an exponent is worked out from
+    Outputs:
+        rows (list): one list per size in benchmark_columns order
+    '''
+    rows = []
+    for index in range(len(sizes)):
+        seconds = results[index]['seconds']
+        above = max(seconds - load_seconds, 0.0)
+        exponent = ''
+        if index > 0:
+            before = max(results[index - 1]['seconds'] - load_seconds, 0.0)
+            if before >= min_seconds and above >= min_seconds and sizes[index] > sizes[index - 1]:
+                exponent = round(math.log(above/before)/math.log(float(sizes[index])/sizes[index - 1]), 2)
+        rows.append([kind, sizes[index], round(seconds, 3), round(above, 3), round(sizes[index]/above, 1) if above > 0 else '', round(results[index]['peak_rss_mb'], 1), exponent])
+    return rows
+
+def check_budgets(rows, budgets):
+    '''
+    Lists the measurements over budget
+    Inputs:
+        rows (list): scaling_rows output
+        budgets (dict): 'seconds', 'peak_rss_mb' and 'exponent' limits, None for no limit
+    Outputs:
+        failures (list): one line per measurement over budget
+    '''
+    failures = []
+    for row in rows:
+        measured = dict(zip(benchmark_columns, row))
+        for name in ['seconds', 'peak_rss_mb', 'exponent']:
+            if budgets.get(name) is not None and measured[name] != '' and float(measured[name]) > float(budgets[name]):
+                failures.append(measured['kind'] + ' ' + str(measured['size']) + ': ' + name + ' ' + str(measured[name]) + ' is over the budget of ' + str(budgets[name]))
+    return failures
+
+def run_benchmark(work_dir, num_proteins=20000, gene_sizes=None, sample_sizes=None, genes_per_sample=200, budgets=None):
+    '''
+    Measures time and peak memory as the size of a sample and the size of a cohort grow, on a synthetic proteome sized database, and writes the curves to benchmark_scaling.csv in work_dir
+    The database is made once and kept in work_dir/databases/, each measurement runs in its own process
+    Inputs:
+        work_dir (str): folder for the database, inputs, outputs and results
+        num_proteins (int): default 20000, proteins in the synthetic database
+        gene_sizes (list): default 100 to 20000, genes in one sample
+        sample_sizes (list): default 1 to 5000, samples in one cohort
+        genes_per_sample (int): default 200, genes in each sample of a cohort
+        budgets (dict): limits on 'seconds', 'peak_rss_mb' and 'exponent' (see default_budgets)
+    Outputs:
+        rows (list): scaling curve rows in benchmark_columns order
+        failures (list): measurements over budget, empty when all are within budget
+    '''
+    work_dir = os.path.join(os.path.abspath(work_dir), '')
+    database_root = work_dir + 'databases/'
+    gene_sizes = sorted(int(size) for size in (gene_sizes or default_gene_sizes))
+    sample_sizes = sorted(int(size) for size in (sample_sizes or default_sample_sizes))
+    budgets = dict(default_budgets, **(budgets or {}))
+    # the database is only made again when the number of proteins changes
+    ids_file = database_root + 'benchmark_proteins.txt'
+    if not os.path.exists(ids_file) or open(ids_file).read().strip() != str(num_proteins):
+        print('making a synthetic database of ' + str(num_proteins) + ' proteins')
+        make_benchmark_database(database_root, int(num_proteins))
+        with open(ids_file, 'w') as fo:
+            fo.write(str(num_proteins) + '\n')
+    load = measure_in_subprocess('load', 0, database_root, work_dir)
+    print('loading: ' + str(round(load['seconds'], 2)) + ' seconds, ' + str(round(load['peak_rss_mb'], 1)) + ' MB')
+    rows = [['load', 0, round(load['seconds'], 3), 0.0, '', round(load['peak_rss_mb'], 1), '']]
+    for kind, sizes in [('genes', gene_sizes), ('samples', sample_sizes)]:
+        results = []
+        for size in sizes:
+            results.append(measure_in_subprocess(kind, size, database_root, work_dir, genes_per_sample))
+            print(kind + ' ' + str(size) + ': ' + str(round(results[-1]['seconds'], 2)) + ' seconds, ' + str(round(results[-1]['peak_rss_mb'], 1)) + ' MB')
+        rows += scaling_rows(kind, sizes, results, load['seconds'])
+    with open(work_dir + 'benchmark_scaling.csv', 'w') as fo:
+        fo.write(','.join(benchmark_columns) + '\n')
+        for row in rows:
+            fo.write(','.join(str(value) for value in row) + '\n')
+    return rows, check_budgets(rows, budgets)
+
+if __name__ == '__main__':
+    if sys.argv[1] == 'measure':
+        # internal: one measurement, run by measure_in_subprocess
+        print(json.dumps(measure(*sys.argv[2:])))
+    else:
+        # python benchmark_scaling.py work_dir [num_proteins=20000] [gene_sizes=100,1000] [sample_sizes=1,100] [genes_per_sample=200] [seconds=60] [peak_rss_mb=4000] [exponent=1.5]
+        options = {}
+        budgets = {}
+        for argument in sys.argv[2:]:
+            name, value = argument.split('=', 1)
+            if name in default_budgets:
+                budgets[name] = float(value) if value != 'None' else None
+            elif name in ('gene_sizes', 'sample_sizes'):
+                options[name] = [int(size) for size in value.split(',')]
+            else:
+                options[name] = int(value)
+        rows, failures = run_benchmark(sys.argv[1], budgets=budgets, **options)
+        for failure in failures:
+            print('over budget: ' + failure)
+        sys.exit(1 if failures else 0)
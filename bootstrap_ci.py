@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Bootstrap Intervals        ###
+#######################################################
+
+# import statements
+import warnings
+import numpy as np
+from generate_structural_features import header, headeralpha
+
+# columns added after the usual average_ columns
+interval_columns = ['bootstrap_ci_low', 'bootstrap_ci_high']
+
+# functions
+def sample_matrices(sf, summary, labels):
+    '''
+    The weights and continous feature values of a sample's proteins, one row per protien found in the precounted human genome or alpha fold features
+    Inputs:
+        sf (StructuralFeatures): loaded databases
+        summary (dict): output of StructuralFeatures.aggregate for the sample
+        labels (list): continous feature labels, built in or derived
+    Outputs:
+        human_weights, alpha_weights (numpy arrays): weight of each protien, 0 where it is not in that database
+        human_values, alpha_values (numpy arrays): proteins x labels of that database
+        human_labels, alpha_labels (list): labels of the columns of human_values and alpha_values
+    '''
+    ids = list(dict.fromkeys(list(summary['weights']) + list(summary['alpha_weights'])))
+    # derived features are columns of human_derived or alpha_derived, resampled with the built in ones
+    human_derived = sf.derived.table_labels('human') if sf.derived is not None else []
+    alpha_derived = sf.derived.table_labels('alpha') if sf.derived is not None else []
+    human_labels = [label for label in labels if label in header or label in human_derived]
+    alpha_labels = [label for label in labels if label in headeralpha or label in alpha_derived]
+    human_weights = np.array([summary['weights'].get(gnuid, 0) for gnuid in ids], dtype=float)
+    alpha_weights = np.array([summary['alpha_weights'].get(gnuid, 0) for gnuid in ids], dtype=float)
+    human_values = np.zeros((len(ids), len(human_labels)))
+    alpha_values = np.zeros((len(ids), len(alpha_labels)))
+    human_columns = [(sf.human_values, header.index(label) - 1) if label in header else (sf.human_derived, human_derived.index(label)) for label in human_labels]
+    alpha_columns = [(sf.alpha_values, headeralpha.index(label)) if label in headeralpha else (sf.alpha_derived, alpha_derived.index(label)) for label in alpha_labels]
+    for index in range(len(ids)):
+        if ids[index] in summary['weights']:
+            human_values[index] = [values[sf.human_rows[ids[index]], column] for values, column in human_columns]
+        if ids[index] in summary['alpha_weights']:
+            alpha_values[index] = [values[sf.alpha_rows[ids[index]], column] for values, column in alpha_columns]
+    return human_weights, alpha_weights, human_values, alpha_values, human_labels, alpha_labels
+
+def resampled_means(counts, weights, values, scale=1.0):
+    '''
+    Weighted averages of many resamples of the same proteins in one matrix product
+    Inputs:
+        counts (numpy array): resamples x proteins, times each protien was drawn
+        weights (numpy array): weight of each protien
+        values (numpy array): proteins x features
+        scale (float): the total weight is multiplied by it, like tot_weight against the sum of weights in aggregate
+    Outputs:
+        (numpy array) resamples x features averages, nan for resamples with no weight
+    '''
+    resample_weights = counts*weights
+    totals = resample_weights.sum(axis=1)*scale
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals[:, None] > 0, (resample_weights @ values)/totals[:, None], np.nan)
+
+def bootstrap_intervals(sf, summary, num_resamples=1000, confidence=0.95, seed=None, block_size=None):
+    '''
+    Percentile bootstrap confidence intervals of the averages of the continous features
+    The sample's proteins are drawn with replacement as many times as there are proteins, each keeping its weight, and the weighted averages of every resample are taken like aggregate does
+    Inputs:
+        sf (StructuralFeatures): loaded databases
+        summary (dict): output of StructuralFeatures.aggregate for the sample
+        num_resamples (int): default 1000, number of resamples
+        confidence (float): default 0.95, share of the resampled averages between the interval ends
+        seed (int): seed for reproducible resamples
+        block_size (int): number of resamples per matrix product, default keeps each block near 4 million counts
+    Outputs:
+        intervals (dict): continous feature label mapped to (low, high), nan when no resample had the protiens the feature comes from
+    '''
+    labels = sf.average_labels
+    if summary['found'] == 0:
+        raise ValueError('None of the genes or protiens were found in the structural features database')
+    if not 0 < confidence < 1:
+        raise ValueError('confidence ' + str(confidence) + ' is not between 0 and 1')
+    human_weights, alpha_weights, human_values, alpha_values, human_labels, alpha_labels = sample_matrices(sf, summary, labels)
+    num_proteins = len(human_weights)
+    # repeated names add to a protien's weight but not to tot_weight, the same ratio is kept in every resample
+    human_scale = summary['tot_weight']/human_weights.sum()
+    block_size = block_size or max(1, 4000000//num_proteins)
+    rng = np.random.default_rng(seed)
+    means = []
+    for start in range(0, num_resamples, block_size):
+        counts = rng.multinomial(num_proteins, np.full(num_proteins, 1/num_proteins), size=min(block_size, num_resamples - start)).astype(float)
+        human_means = resampled_means(counts, human_weights, human_values, human_scale)
+        # like aggregate, a resample with no alpha fold proteins averages to 0
+        alpha_means = np.nan_to_num(resampled_means(counts, alpha_weights, alpha_values), nan=0.0)
+        means.append(np.hstack([human_means, alpha_means]))
+    means = np.vstack(means)
+    tail = 50*(1 - confidence)
+    with warnings.catch_warnings():
+        # features of proteins in no resample are all nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanpercentile(means, [tail, 100 - tail], axis=0)
+    return dict(zip(human_labels + alpha_labels, zip(low, high)))
+
+def add_intervals(average_rows, intervals):
+    '''
+    Adds the interval ends to the end of each average row
+    Inputs:
+        average_rows (list): rows from StructuralFeatures.compare, starting with the feature label
+        intervals (dict): output of bootstrap_intervals
+    Outputs:
+        (list) rows with bootstrap_ci_low and bootstrap_ci_high last
+    '''
+    return [tuple(row) + tuple(intervals[row[0]]) for row in average_rows]
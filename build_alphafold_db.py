@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Alpha Fold Database Build  ###
+#######################################################
+
+# import statements
+import sys
+import os
+import json
+import multiprocessing
+import numpy as np
+from generate_structural_features import headeralpha
+from residue_store import read_csv_columns, dssp_counts, a3d_counts
+from predictor_archive import open_input, archive_for_directory, list_input_files
+
+# kept in the databases folder, the inputs each protien was last built from
+inputs_name = 'precounted_alpha_fold.inputs.json'
+error_name = 'alphafold_unfound.csv'
+
+# functions
+def alpha_columns():
+    '''
+    Where each headeralpha value comes from: ('dssp', state, key), ('a3d', key) or ('structure', label)
+    '''
+    columns = []
+    for label in headeralpha:
+        if label.endswith(' Regions'):
+            if label.startswith('Number of Amino Acids '):
+                key = label.split(' ')[4]
+                group = label.split(' in ', 1)[1][:-len(' Regions')]
+            elif label.startswith('Length of '):
+                key = 'length'
+                group = label[len('Length of '):-len(' Regions')]
+            else:
+                key = 'number'
+                group = label[len('Number of '):-len(' Regions')]
+            columns.append(('a3d', key) if group == 'Aggregation Prone' else ('dssp', group, key))
+        else:
+            columns.append(('structure', label))
+    return columns
+
+row_columns = alpha_columns()
+
+def alpha_row(all_feats, a3d_dict, structure):
+    '''
+    Puts the features of one protien in headeralpha order, amino acids not seen count 0
+    Inputs:
+        all_feats (dict of dicts): DSSP feature dictionary like get_afdssp
+        a3d_dict (dict): aggregation prone region features like get_a3d
+        structure (dict): the four center of mass and contact headeralpha labels mapped to values
+    Outputs:
+        (list) values in headeralpha order
+    '''
+    values = []
+    for column in row_columns:
+        if column[0] == 'dssp':
+            values.append(all_feats[column[1]].get(column[2], 0))
+        elif column[0] == 'a3d':
+            values.append(a3d_dict.get(column[1], 0))
+        else:
+            values.append(structure[column[1]])
+    return values
+
+def read_dssp(path):
+    '''
+    get_afdssp from one af_dssp file, counted with numpy over the whole protien
+    '''
+    residues, states = read_csv_columns(path, [1, 2])
+    return dssp_counts(np.array([state[:1] for state in states], dtype='S1'), np.array([residue[:1] for residue in residues], dtype='S1'))
+
+def read_a3d(path):
+    '''
+    get_a3d from one A3D_scores file
+    '''
+    residues, scores = read_csv_columns(path, [1, 3])
+    return a3d_counts(np.array(scores, dtype=float), np.array([residue[-1:] for residue in residues], dtype='S1'))
+
+def read_com(path):
+    '''
+    get_com from one centerofmass file
+    Outputs:
+        min, max, average (float): distances of the residues to the center of mass
+    '''
+    distances = np.array(read_csv_columns(path, [1])[0], dtype=float)
+    if len(distances) == 0:
+        raise ValueError(path + ' has no residues')
+    # a running sum like get_com, so the average is the same to the last digit
+    return float(distances.min()), float(max(distances.max(), 0)), float(np.cumsum(distances)[-1]/len(distances))
+
+def read_contacts(path):
+    '''
+    get_num_contacts from one contacts map, the True values right of the diagonal
+    '''
+    with open_input(path) as fo:
+        fo.readline()
+        lines = fo.read().split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    else:
+        lines[-1] = lines[-1][:-1]
+    return sum(lines[row].split(',')[row + 1:].count('True') for row in range(len(lines)))
+
+def input_paths(gnuid, database_root, structure_file=None):
+    '''
+    The files one protien is built from, the structure model in place of the centerofmass and contacts files when given
+    '''
+    paths = {'dssp': database_root + 'af_dssp/' + gnuid + '-F1.csv', 'a3d': database_root + 'A3D_scores/AF-' + gnuid + '-F1_A3D.csv'}
+    if structure_file is None:
+        paths['com'] = database_root + 'centerofmass/' + gnuid + '_dcom.csv'
+        paths['contacts'] = database_root + 'contacts/' + gnuid + '_map.csv'
+    else:
+        paths['structure'] = structure_file
+    return paths
+
+def input_signature(paths):
+    '''
+    Size and modification time of each input file, a file read from a predictor output archive gets the archive's
+    '''
+    signature = {}
+    for kind in sorted(paths):
+        path = paths[kind]
+        if not os.path.exists(path):
+            archive = archive_for_directory(os.path.dirname(path))
+            if archive is None or os.path.basename(path) not in archive.names:
+                signature[kind] = None
+                continue
+            path = archive.archive_path
+        stat = os.stat(path)
+        signature[kind] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+def alphafold_features(paths, cutoff=8.0):
+    '''
+    Runs the four extractors of one protien
+    Inputs:
+        paths (dict): see input_paths
+        cutoff (float): default 8.0, contact distance in angstroms, only used with a structure model
+    Outputs:
+        (list) values in headeralpha order
+    '''
+    if 'structure' in paths:
+        from alphafold_coordinates import coordinate_features
+        structure = coordinate_features(paths['structure'], cutoff)
+    else:
+        minimum, maximum, average = read_com(paths['com'])
+        structure = {'Minimum Distance to Center of Mass': minimum, 'Maximum Distance to Center of Mass': maximum, 'Average Distance to Center of Mass': average, 'Number of Contacts': read_contacts(paths['contacts'])}
+    return alpha_row(read_dssp(paths['dssp']), read_a3d(paths['a3d']), structure)
+
+def build_in_worker(task):
+    gnuid, paths, cutoff = task
+    try:
+        return gnuid, alphafold_features(paths, cutoff)
+    except (OSError, ValueError, IndexError, KeyError, EOFError) as error:
+        return gnuid, error
+
+def read_inputs_file(path, settings):
+    '''
+    The inputs recorded by the last build, empty when there was none or it had other settings
+    '''
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as fo:
+            recorded = json.load(fo)
+    except ValueError:
+        return {}
+    if recorded.get('settings') != settings:
+        return {}
+    return recorded['inputs']
+
+def write_inputs_file(path, settings, inputs):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as fo:
+        json.dump({'settings': settings, 'inputs': inputs}, fo)
+    os.replace(temp_path, path)
+
+def alias_rows(database_root, rows):
+    '''
+    Copies rows to the other names of the same protien in uniprot-gn-map.txt, like update_alphafold_db.py
+    Inputs:
+        database_root (str): folder with uniprot-gn-map.txt
+        rows (dict): name mapped to its values, of every name that has a row
+    Outputs:
+        aliases (dict): name without a row of its own mapped to the name its row is copied from
+    '''
+    aliases = {}
+    if not os.path.exists(database_root + 'uniprot-gn-map.txt'):
+        return aliases
+    with open(database_root + 'uniprot-gn-map.txt') as fo:
+        for line in fo:
+            split_line = line[:-1].split('__')
+            all_row_ids = split_line[0].split('--') + split_line[1].split('--')
+            source = next((gnuid for gnuid in all_row_ids if gnuid in rows), None)
+            if source is None:
+                continue
+            for gnuid in all_row_ids:
+                if gnuid not in rows and gnuid not in aliases:
+                    aliases[gnuid] = source
+    return aliases
+
+def build_alphafold_db(database_root='./databases/', output_format='store', processes=1, structure_dir=None, cutoff=8.0, ids=None, batch_size=1000):
+    '''
+    Builds the precounted_alpha_fold rows from the af_dssp, A3D_scores, centerofmass and contacts outputs, spread over processes
+    Proteins whose input files have the same size and modification time as in the last build are not built again, the inputs of each protien are kept in databases/precounted_alpha_fold.inputs.json
+    Names of uniprot-gn-map.txt without a row of their own get a copy of the row of another name of the same protien, and proteins that could not be built are listed in databases/alphafold_unfound.csv
+    Inputs:
+        database_root (str): default './databases/', folder with the alpha fold outputs (extracted or as archives) and where the rows are written
+        output_format (str): default 'store', the precounted_alpha_fold table of precounted_features.db, or 'folder' for one precounted_alpha_fold/<name>.txt file per name
+        processes (int): default 1, number of processes
+        structure_dir (str): default None, folder of AlphaFold models to compute the center of mass and contact features from instead of the centerofmass and contacts files, see alphafold_coordinates.py
+        cutoff (float): default 8.0, contact distance in angstroms when structure_dir is given
+        ids (list): default every protien in af_dssp, uniprot ids to build
+        batch_size (int): default 1000, rows written to the store per transaction
+    Outputs:
+        built (int): number of proteins built in this run
+        skipped (int): number of proteins whose inputs had not changed
+    '''
+    from build_progress import ProgressReporter
+    from feature_store import FeatureStoreWriter, store_name, store_tables, load_feature_table
+    database_root = os.path.join(database_root, '')
+    processes = int(processes)
+    cutoff = float(cutoff)
+    if ids is None:
+        ids = sorted(os.path.basename(path)[:-len('-F1.csv')] for path in list_input_files(database_root + 'af_dssp/') if path.endswith('-F1.csv'))
+    structure_files = {}
+    if structure_dir is not None:
+        from alphafold_coordinates import structure_files as find_structure_files
+        structure_files = find_structure_files(structure_dir)
+    settings = {'output_format': output_format, 'structure_dir': os.path.abspath(structure_dir) if structure_dir else None, 'cutoff': cutoff if structure_dir else None}
+    inputs_path = database_root + inputs_name
+    recorded = read_inputs_file(inputs_path, settings)
+
+    # the rows already written, to know which proteins can be skipped and to copy rows to aliases
+    folder = database_root + 'precounted_alpha_fold/'
+    rows = {}
+    if output_format == 'store':
+        if 'precounted_alpha_fold' in store_tables(database_root + store_name):
+            names, values = load_feature_table(database_root + store_name, 'precounted_alpha_fold', len(headeralpha))
+            rows = dict(zip(names, values.tolist()))
+    elif os.path.isdir(folder):
+        for gnuid in recorded:
+            if os.path.exists(folder + gnuid + '.txt'):
+                rows[gnuid] = None
+    else:
+        os.makedirs(folder)
+
+    tasks = []
+    inputs = {}
+    for gnuid in ids:
+        if structure_dir is not None and gnuid not in structure_files:
+            continue
+        paths = input_paths(gnuid, database_root, structure_files.get(gnuid))
+        inputs[gnuid] = input_signature(paths)
+        if gnuid in rows and recorded.get(gnuid) == inputs[gnuid]:
+            continue
+        tasks.append((gnuid, paths, cutoff))
+    skipped = len(inputs) - len(tasks)
+    print(str(skipped) + ' proteins have not changed, building ' + str(len(tasks)))
+
+    store = None
+    if output_format == 'store':
+        store = FeatureStoreWriter(database_root + store_name, 'precounted_alpha_fold', headeralpha, column_type='REAL', batch_size=batch_size)
+    progress = ProgressReporter(len(tasks), 'proteins')
+    if processes > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        results = pool.imap_unordered(build_in_worker, tasks, chunksize=max(1, min(64, len(tasks)//(processes*16))))
+    else:
+        pool = None
+        results = map(build_in_worker, tasks)
+    errors = {}
+    built = []
+    for gnuid, values in results:
+        progress.update()
+        if isinstance(values, Exception):
+            errors[gnuid] = values
+            inputs.pop(gnuid)
+            continue
+        rows[gnuid] = values
+        built.append(gnuid)
+        if store is not None:
+            store.add(gnuid, values)
+        else:
+            with open(folder + gnuid + '.txt', 'w') as fo:
+                fo.write(gnuid + ',' + ','.join(str(value) for value in values))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    progress.finish()
+
+    # aliases of proteins built in this run get their new rows
+    built_set = set(built)
+    for gnuid, source in alias_rows(database_root, {gnuid: True for gnuid in inputs}).items():
+        if source not in built_set and (gnuid in rows or (store is None and os.path.exists(folder + gnuid + '.txt'))):
+            continue
+        if store is not None:
+            store.add(gnuid, rows[source])
+        elif rows[source] is None:
+            # built in an earlier run, the row is copied from its file
+            with open(folder + source + '.txt') as fo:
+                out = fo.read()
+            with open(folder + gnuid + '.txt', 'w') as fo:
+                fo.write(gnuid + ',' + out.split(',', 1)[-1])
+        else:
+            with open(folder + gnuid + '.txt', 'w') as fo:
+                fo.write(gnuid + ',' + ','.join(str(value) for value in rows[source]))
+    if store is not None:
+        store.close()
+    # written last, so proteins are only skipped once their rows are on disk
+    write_inputs_file(inputs_path, settings, inputs)
+    with open(database_root + error_name, 'w') as fo:
+        for gnuid in sorted(errors):
+            fo.write(gnuid + ',' + str(errors[gnuid]).replace(',', ' ') + '\n')
+    return len(built), skipped
+
+if __name__ == '__main__':
+    # python build_alphafold_db.py [databases/] [store or folder] [processes] [structure_dir] [cutoff]
+    built, skipped = build_alphafold_db(*sys.argv[1:])
+    print(str(built) + ' proteins built, ' + str(skipped) + ' unchanged')
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Build Progress             ###
+#######################################################
+
+# import statements
+import os
+import sys
+import json
+import time
+
+# functions
+def format_duration(seconds):
+    '''
+    Writes a number of seconds as h:mm:ss
+    '''
+    seconds = int(round(seconds))
+    return str(seconds//3600) + ':' + str((seconds//60)%60).zfill(2) + ':' + str(seconds%60).zfill(2)
+
+class ProgressReporter:
+    '''
+    Prints how far a long loop is, at most once every few seconds, with the rate and the estimated time left
+    Example:
+        progress = ProgressReporter(len(ids), 'proteins')
+        for gnuid in ids:
+            ...
+            progress.update()
+        progress.finish()
+    '''
+    def __init__(self, total, label='items', min_interval=10, done=0, stream=None):
+        '''
+        Inputs:
+            total (int): number of items in the whole loop
+            label (str): default 'items', what is counted
+            min_interval (float): default 10, seconds between printed lines
+            done (int): default 0, items already done before this run (like when resuming), not counted in the rate
+            stream: default sys.stdout, where lines are printed
+        '''
+        self.total = total
+        self.label = label
+        self.min_interval = float(min_interval)
+        self.done = done
+        self.start_done = done
+        self.start_time = time.time()
+        self.last_print = self.start_time
+        self.stream = stream
+
+    def line(self):
+        elapsed = time.time() - self.start_time
+        rate = (self.done - self.start_done)/elapsed if elapsed > 0 else 0.0
+        out = str(self.done) + ' of ' + str(self.total) + ' ' + self.label + ' done'
+        if self.total:
+            out += ' (' + str(round(100.0*self.done/self.total, 1)) + '%)'
+        out += ', ' + str(round(rate, 1)) + ' per second'
+        if rate > 0 and self.total >= self.done:
+            out += ', about ' + format_duration((self.total - self.done)/rate) + ' left'
+        return out
+
+    def update(self, count=1):
+        '''
+        Counts finished items and prints a line when the last one was long enough ago
+        '''
+        self.done += count
+        now = time.time()
+        if now - self.last_print >= self.min_interval:
+            self.last_print = now
+            print(self.line(), file=self.stream or sys.stdout, flush=True)
+
+    def finish(self):
+        print(self.line() + ', took ' + format_duration(time.time() - self.start_time), file=self.stream or sys.stdout, flush=True)
+
+class BuildCheckpoint:
+    '''
+    Keeps how far a build got in a small json file, so an interrupted build can carry on where it stopped
+    The file is replaced in one step each time, so it is never left half written
+    A checkpoint only counts for a build with the same settings, anything else starts over
+    '''
+    def __init__(self, path, settings):
+        '''
+        Inputs:
+            path (str): checkpoint file
+            settings (dict): what the build was started with (input file, output format, ...), must be json serializable
+        '''
+        self.path = path
+        self.settings = settings
+
+    def load(self):
+        '''
+        Outputs:
+            (dict) state saved by the last save, or None when there is no checkpoint for these settings
+        '''
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as fo:
+                saved = json.load(fo)
+        except ValueError:
+            return None
+        if saved.get('settings') != self.settings:
+            return None
+        return saved.get('state')
+
+    def save(self, state):
+        '''
+        Inputs:
+            state (dict): progress to keep, must be json serializable
+        '''
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as fo:
+            json.dump({'settings': self.settings, 'state': state}, fo)
+            fo.flush()
+            os.fsync(fo.fileno())
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features For Large Cohorts          ###
+#######################################################
+
+# import statements
+import sys
+import os
+import glob
+import tempfile
+import numpy as np
+from build_progress import ProgressReporter
+from generate_structural_features import StructuralFeatures, read_sample_file, parse_bool, format_rows, frequency_features, average_features, all_headers, frequency_columns, average_columns
+
+# functions
+def estimate_sample_bytes(genes_per_sample):
+    '''
+    Rough working memory needed to score one sample, used to size blocks of samples
+    Inputs:
+        genes_per_sample (int): typical number of genes or proteins in a sample
+    Outputs:
+        (int) bytes
+    '''
+    # input names and weights, the averages of every feature and the output rows (about 4 classes per protien)
+    output_rows = len(frequency_features) + len(average_features) + 4*genes_per_sample
+    return 200*genes_per_sample + 32*len(all_headers) + 600*output_rows
+
+def block_size_for_budget(memory_budget_mb, genes_per_sample):
+    '''
+    Number of samples scored together so that one block stays within a memory budget
+    Inputs:
+        memory_budget_mb (float): working memory allowed per block in MB, on top of the loaded databases
+        genes_per_sample (int): typical number of genes or proteins in a sample
+    Outputs:
+        (int) samples per block, at least 1
+    '''
+    return max(1, int(float(memory_budget_mb)*1024*1024)//estimate_sample_bytes(max(1, genes_per_sample)))
+
+def read_gmt(gmt_path):
+    '''
+    Reads a gene set library in GMT format, one set per line: set name, description, then the genes, separated by tabs
+    Genes written as gene,weight (like the Enrichr fuzzy libraries) keep their weight
+    Inputs:
+        gmt_path (str): path to the .gmt file
+    Outputs:
+        gene_sets (dict): set name mapped to a list of (name, weight) tuples, in file order
+    '''
+    gene_sets = {}
+    with open(gmt_path) as fo:
+        for line in fo:
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) < 3 or fields[0] == '':
+                continue
+            genes = []
+            for gene in fields[2:]:
+                gene = gene.strip()
+                if gene == '':
+                    continue
+                name, comma, weight = gene.partition(',')
+                genes.append((name, float(weight) if comma else 1.0))
+            gene_sets[fields[0]] = genes
+    return gene_sets
+
+def read_cohort(input_path, work_dir=None):
+    '''
+    Reads a cohort once, a directory is only listed and its files are read a block at a time
+    A csv matrix is copied a chunk of genes at a time into a samples x genes memory mapped file, so a block of samples is read from disk in one slice and the matrix is never held whole in memory
+    Inputs:
+        input_path (str): directory of input files (one sample per file), a csv expression matrix (gene names in the first column, one column per sample) or a .gmt gene set library (one sample per set)
+        work_dir (str): default the temporary directory, folder the memory mapped copy of a matrix is written into
+    Outputs:
+        cohort (dict): 'samples' (sample names, the file paths for a directory), 'genes_per_sample' (estimated number of genes or proteins in a sample), and 'gene_sets' for a .gmt library or 'genes', 'values' (samples x genes memory mapped matrix), 'columns' (sample name mapped to its row of values) and 'path' (the memory mapped file, see close_cohort) for a matrix
+    '''
+    if os.path.isdir(input_path):
+        files = sorted(glob.glob(os.path.join(input_path, '*')))
+        sizes = [os.path.getsize(f) for f in files]
+        return {'samples': files, 'genes_per_sample': max(1, (sum(sizes)//max(1, len(sizes)))//10)}
+    if input_path.endswith('.gmt'):
+        gene_sets = read_gmt(input_path)
+        return {'samples': list(gene_sets), 'genes_per_sample': max(1, sum(len(genes) for genes in gene_sets.values())//max(1, len(gene_sets))), 'gene_sets': gene_sets}
+    import pandas as pd
+    samples = [str(column) for column in pd.read_csv(input_path, nrows=0, index_col=0).columns]
+    # chunks of about 4 million values whatever the number of samples
+    chunksize = max(1, 4000000//max(1, len(samples)))
+    genes = []
+    for chunk in pd.read_csv(input_path, usecols=[0], chunksize=chunksize):
+        genes.extend(str(gnuid) for gnuid in chunk.iloc[:, 0])
+    handle, path = tempfile.mkstemp(suffix='.npy', prefix='cohort_', dir=work_dir)
+    os.close(handle)
+    values = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(len(samples), len(genes)))
+    start = 0
+    for chunk in pd.read_csv(input_path, index_col=0, chunksize=chunksize):
+        data = chunk.to_numpy(dtype=float)
+        values[:, start:start + len(data)] = np.nan_to_num(data, nan=0.0).T
+        start += len(data)
+    values.flush()
+    del values
+    return {'samples': samples, 'genes_per_sample': len(genes), 'genes': genes, 'values': np.load(path, mmap_mode='r'), 'columns': {samples[index]: index for index in range(len(samples))}, 'path': path}
+
+def close_cohort(cohort):
+    '''
+    Deletes the memory mapped copy of a matrix made by read_cohort, nothing to do for a directory or .gmt library
+    '''
+    if 'path' in cohort:
+        cohort.pop('values', None)
+        if os.path.exists(cohort['path']):
+            os.remove(cohort['path'])
+
+def read_sample_block(cohort, samples, use_weight):
+    '''
+    Gene lists of a block of samples
+    Inputs:
+        cohort (dict): output of read_cohort
+        samples (list): names of the samples in the block
+        use_weight (bool): keep the expression values as weights
+    Outputs:
+        gene_lists (list): (name, weight) tuples for each sample, for a matrix only genes with a non zero value are kept
+    '''
+    if 'gene_sets' in cohort:
+        return [[(gnuid, weight if use_weight else 1.0) for gnuid, weight in cohort['gene_sets'][sample]] for sample in samples]
+    if 'values' not in cohort:
+        return [read_sample_file(sample_file, use_weight) for sample_file in samples]
+    gene_lists = []
+    for sample in samples:
+        row = np.asarray(cohort['values'][cohort['columns'][sample]])
+        gene_lists.append([(cohort['genes'][index], float(row[index]) if use_weight else 1.0) for index in np.flatnonzero(row)])
+    return gene_lists
+
+class CsvCohortWriter:
+    '''
+    Streams the results of every sample of a cohort into one frequency and one average csv file, each row starting with the sample name
+    '''
+    def __init__(self, folder_out, extra_columns=None):
+        extra_columns = extra_columns or []
+        self.folder_out = folder_out
+        self.frequency_file = open(os.path.join(folder_out, 'cohort_frequency.csv'), 'w')
+        self.average_file = open(os.path.join(folder_out, 'cohort_average.csv'), 'w')
+        self.frequency_file.write(','.join(['sample'] + frequency_columns + extra_columns) + '\n')
+        self.average_file.write(','.join(['sample'] + average_columns + extra_columns) + '\n')
+
+    def write(self, sample_name, average_rows, frequency_rows, found):
+        self.frequency_file.write(format_rows([(sample_name,) + tuple(row) for row in frequency_rows]))
+        self.average_file.write(format_rows([(sample_name,) + tuple(row) for row in average_rows]))
+
+    def flush(self):
+        self.frequency_file.flush()
+        self.average_file.flush()
+
+    def close(self):
+        self.frequency_file.close()
+        self.average_file.close()
+
+def run_cohort(input_path, folder_out, use_weight=False, background_folder_name='human_background', database_root='./databases/', memory_budget_mb=512, writer=None, sf=None, output_format='csv'):
+    '''
+    Generates structural features for every sample of a cohort in blocks sized to a memory budget, streaming results to disk after each block
+    Peak memory depends on the block size, not on the number of samples, a matrix is read from a memory mapped copy in folder_out and only a .gmt library is kept whole
+    Inputs:
+        input_path (str): directory of input files (one sample per file), a csv expression matrix (gene names in the first column, one column per sample) or a .gmt gene set library (one sample per set)
+        folder_out (str): directory for cohort_frequency.csv, cohort_average.csv (or the results table) and errors.csv
+        use_weight (bool or str): default False, weigh structural feature output by corresponding input expression levels
+        background_folder_name (str): default 'human_background', name of background to use
+        database_root (str): default './databases/', folder with the unzipped structural features databases
+        memory_budget_mb (float): default 512, working memory for one block of samples in MB, on top of the loaded databases
+        writer: object with write(sample_name, average_rows, frequency_rows, found), flush() and close(), default chosen by output_format
+        sf (StructuralFeatures): already loaded databases to use instead of loading database_root
+        output_format (str): default 'csv', or 'parquet' or 'feather' for one long format table of the whole run partitioned by structure type (needs pyarrow)
+    Outputs:
+        (int) number of samples written
+    '''
+    use_weight = parse_bool(use_weight)
+    if sf is None:
+        sf = StructuralFeatures(database_root, background_folder_name)
+    sf.load_background(background_folder_name)
+    if not os.path.exists(folder_out):
+        os.makedirs(folder_out)
+    if writer is None and output_format in ('parquet', 'feather'):
+        from result_tables import ColumnarResultWriter
+        writer = ColumnarResultWriter(folder_out, output_format)
+    elif writer is None:
+        writer = CsvCohortWriter(folder_out)
+    cohort = read_cohort(input_path, folder_out)
+    samples = cohort['samples']
+    block_size = block_size_for_budget(memory_budget_mb, cohort['genes_per_sample'])
+    written = 0
+    progress = ProgressReporter(len(samples), 'samples')
+    try:
+        for start in range(0, len(samples), block_size):
+            block = samples[start:start + block_size]
+            batch = sf.aggregate_many(read_sample_block(cohort, block, use_weight), use_weight)
+            # the tests of the whole block are run together
+            results = sf.compare_many(batch, background_folder_name)
+            for row in range(len(block)):
+                sample_name = os.path.basename(block[row]) if os.path.isdir(input_path) else block[row]
+                if isinstance(results[row], Exception):
+                    with open(os.path.join(folder_out, 'errors.csv'), 'a+') as fo:
+                        fo.write(block[row] + '\n')
+                    continue
+                average_rows, frequency_rows = results[row]
+                writer.write(sample_name, average_rows, frequency_rows, int(batch['found'][row]))
+                written += 1
+            del batch, results
+            writer.flush()
+            progress.update(len(block))
+    finally:
+        writer.close()
+        close_cohort(cohort)
+    progress.finish()
+    return written
+
+if __name__ == '__main__':
+    # the seventh argument is the output format, writer and sf can only be given from python
+    if len(sys.argv) > 7:
+        run_cohort(*sys.argv[1:7], output_format=sys.argv[7])
+    else:
+        run_cohort(*sys.argv[1:])
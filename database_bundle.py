@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Database Bundle            ###
+#######################################################
+
+# import statements
+import sys
+import os
+import json
+import zlib
+import struct
+import hashlib
+import numpy as np
+from generate_structural_features import header, headeralpha, load_precounted
+
+# file layout: magic, header length, json header, sha256 of the header, then the compressed blocks the header points to
+bundle_magic = b'SFBUNDLE1\n'
+bundle_name = 'structural_features.sfb'
+bundle_tables = {'precounted_human_genome': header[1:], 'precounted_alpha_fold': headeralpha}
+
+# functions
+def narrowest_dtype(column):
+    '''
+    Finds the smallest dtype that holds every value of a column exactly
+    Inputs:
+        column (numpy array): float values of one feature
+    Outputs:
+        (str) numpy dtype name
+    '''
+    if len(column) == 0:
+        return 'uint8'
+    if np.all(np.isfinite(column)) and np.all(column == np.rint(column)):
+        for dtype in ('uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32'):
+            info = np.iinfo(dtype)
+            if column.min() >= info.min and column.max() <= info.max:
+                return dtype
+        return 'int64'
+    if np.array_equal(column.astype(np.float32).astype(np.float64), column, equal_nan=True):
+        return 'float32'
+    return 'float64'
+
+def dtype_groups(dtypes):
+    '''
+    Groups column indices by dtype, in a fixed order so chunks can be decoded
+    Inputs:
+        dtypes (list): dtype name of each column
+    Outputs:
+        (list) (dtype, column indices) tuples
+    '''
+    groups = {}
+    for index in range(len(dtypes)):
+        groups.setdefault(dtypes[index], []).append(index)
+    return sorted(groups.items())
+
+def write_block(fo, data, start):
+    '''
+    Compresses and writes one block, returning where it is and its checksum
+    '''
+    compressed = zlib.compress(data, 6)
+    fo.write(compressed)
+    return [fo.tell() - start - len(compressed), len(compressed), hashlib.sha256(compressed).hexdigest()]
+
+def build_bundle(database_root='./databases/', bundle_path=None, chunk_rows=4096):
+    '''
+    Packs the precounted human genome and alpha fold folders (or feature store tables) and the alias table into one compressed file
+    Rows that are identical (aliases written by update_alphafold_db.py) are stored once and every name points to its row
+    Inputs:
+        database_root (str): default './databases/', folder with the unzipped structural features databases
+        bundle_path (str): default structural_features.sfb in database_root
+        chunk_rows (int): default 4096, rows compressed together, the unit of random row access
+    Outputs:
+        bundle_path (str): path of the written bundle
+    '''
+    database_root = os.path.join(database_root, '')
+    chunk_rows = int(chunk_rows)
+    if bundle_path is None:
+        bundle_path = database_root + bundle_name
+    bundle_header = {'version': 1, 'chunk_rows': chunk_rows, 'tables': {}, 'aliases': None}
+    temp_path = bundle_path + '.tmp'
+    with open(temp_path, 'wb') as fo:
+        start = fo.tell()
+        for table in bundle_tables:
+            columns = bundle_tables[table]
+            ids, values = load_precounted(database_root, table, len(columns))
+            unique_values, rows = np.unique(values, axis=0, return_inverse=True) if len(ids) else (values, np.zeros(0, dtype=np.int64))
+            dtypes = [narrowest_dtype(unique_values[:, index]) for index in range(len(columns))]
+            chunks = []
+            for chunk_start in range(0, len(unique_values), chunk_rows):
+                chunk = unique_values[chunk_start:chunk_start + chunk_rows]
+                data = b''.join(np.ascontiguousarray(chunk[:, indices]).astype(dtype).tobytes() for dtype, indices in dtype_groups(dtypes))
+                chunks.append(write_block(fo, data, start))
+            names = write_block(fo, json.dumps([ids, [int(row) for row in np.ravel(rows)]]).encode(), start)
+            bundle_header['tables'][table] = {'columns': columns, 'dtypes': dtypes, 'num_rows': len(unique_values), 'chunks': chunks, 'names': names}
+        if os.path.exists(database_root + 'uniprot-gn-map.txt'):
+            with open(database_root + 'uniprot-gn-map.txt', 'rb') as fi:
+                bundle_header['aliases'] = write_block(fo, fi.read(), start)
+    encoded = json.dumps(bundle_header).encode()
+    with open(bundle_path, 'wb') as fo:
+        fo.write(bundle_magic + struct.pack('<Q', len(encoded)) + encoded + hashlib.sha256(encoded).digest())
+        with open(temp_path, 'rb') as fi:
+            while True:
+                data = fi.read(1 << 24)
+                if not data:
+                    break
+                fo.write(data)
+    os.remove(temp_path)
+    return bundle_path
+
+class DatabaseBundle:
+    '''
+    Reads a bundle written by build_bundle, every block read is checked against its checksum
+    Single rows can be read without decompressing more than their chunk
+    '''
+    def __init__(self, bundle_path):
+        '''
+        Inputs:
+            bundle_path (str): path of the bundle
+        '''
+        self.bundle_path = bundle_path
+        with open(bundle_path, 'rb') as fo:
+            if fo.read(len(bundle_magic)) != bundle_magic:
+                raise ValueError(bundle_path + ' is not a structural features bundle')
+            header_length = struct.unpack('<Q', fo.read(8))[0]
+            encoded = fo.read(header_length)
+            if hashlib.sha256(encoded).digest() != fo.read(32):
+                raise ValueError(bundle_path + ' header checksum does not match, the file is damaged')
+            self.data_start = fo.tell()
+        self.header = json.loads(encoded.decode())
+        self.names = {}
+        self.cached_chunk = (None, None, None)
+
+    def read_block(self, block):
+        '''
+        Reads, checks and decompresses one block
+        Inputs:
+            block (list): offset, length and sha256 from the header
+        Outputs:
+            (bytes) decompressed data
+        '''
+        offset, length, checksum = block
+        with open(self.bundle_path, 'rb') as fo:
+            fo.seek(self.data_start + offset)
+            compressed = fo.read(length)
+        if hashlib.sha256(compressed).hexdigest() != checksum:
+            raise ValueError(self.bundle_path + ' block at ' + str(offset) + ' checksum does not match, the file is damaged')
+        return zlib.decompress(compressed)
+
+    def name_rows(self, table):
+        '''
+        Names in a table and the stored row each one points to
+        Inputs:
+            table (str): 'precounted_human_genome' or 'precounted_alpha_fold'
+        Outputs:
+            ids (list): gene or protien names, sorted like the files of the folder
+            rows (numpy array): stored row of each name
+        '''
+        if table not in self.names:
+            ids, rows = json.loads(self.read_block(self.header['tables'][table]['names']).decode())
+            self.names[table] = (ids, np.array(rows, dtype=np.int64), {ids[index]: rows[index] for index in range(len(ids))})
+        return self.names[table][0], self.names[table][1]
+
+    def decode_chunk(self, table, chunk_index):
+        '''
+        Decompresses one chunk of stored rows into float values
+        Inputs:
+            table (str): table name
+            chunk_index (int): chunk number
+        Outputs:
+            (numpy array) rows of the chunk
+        '''
+        if self.cached_chunk[:2] == (table, chunk_index):
+            return self.cached_chunk[2]
+        info = self.header['tables'][table]
+        chunk_rows = self.header['chunk_rows']
+        num_rows = min(chunk_rows, info['num_rows'] - chunk_index*chunk_rows)
+        data = self.read_block(info['chunks'][chunk_index])
+        values = np.zeros((num_rows, len(info['columns'])))
+        position = 0
+        for dtype, indices in dtype_groups(info['dtypes']):
+            size = np.dtype(dtype).itemsize*num_rows*len(indices)
+            values[:, indices] = np.frombuffer(data, dtype=dtype, count=num_rows*len(indices), offset=position).reshape(num_rows, len(indices))
+            position += size
+        self.cached_chunk = (table, chunk_index, values)
+        return values
+
+    def rows(self, table, gnuids):
+        '''
+        Reads the feature rows of some names, only decompressing the chunks they are in
+        Inputs:
+            table (str): 'precounted_human_genome' or 'precounted_alpha_fold'
+            gnuids (list): gene or protien names, all must be in the table
+        Outputs:
+            (numpy array) one row per name
+        '''
+        self.name_rows(table)
+        lookup = self.names[table][2]
+        chunk_rows = self.header['chunk_rows']
+        values = np.zeros((len(gnuids), len(self.header['tables'][table]['columns'])))
+        stored = [lookup[gnuid] for gnuid in gnuids]
+        for index in np.argsort(stored, kind='stable'):
+            values[index] = self.decode_chunk(table, stored[index]//chunk_rows)[stored[index] % chunk_rows]
+        return values
+
+    def load(self, table):
+        '''
+        Loads a whole table, same output as load_precounted_folder on the unzipped folder
+        Inputs:
+            table (str): 'precounted_human_genome' or 'precounted_alpha_fold'
+        Outputs:
+            ids (list): gene or protien names
+            values (numpy array): one row of feature values per name
+        '''
+        ids, rows = self.name_rows(table)
+        info = self.header['tables'][table]
+        unique_values = np.zeros((info['num_rows'], len(info['columns'])))
+        chunk_rows = self.header['chunk_rows']
+        for chunk_index in range(len(info['chunks'])):
+            unique_values[chunk_index*chunk_rows:(chunk_index + 1)*chunk_rows] = self.decode_chunk(table, chunk_index)
+        self.cached_chunk = (None, None, None)
+        return ids, unique_values[rows]
+
+    def aliases(self):
+        '''
+        The uniprot to gene name alias table (uniprot-gn-map.txt) stored in the bundle, None when it was not bundled
+        '''
+        if self.header['aliases'] is None:
+            return None
+        return self.read_block(self.header['aliases']).decode()
+
+    def validate(self):
+        '''
+        Checks the checksum of every block, raising ValueError on the first damaged one
+        '''
+        for table in self.header['tables']:
+            for block in self.header['tables'][table]['chunks'] + [self.header['tables'][table]['names']]:
+                self.read_block(block)
+        if self.header['aliases'] is not None:
+            self.read_block(self.header['aliases'])
+        return True
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'validate':
+        DatabaseBundle(sys.argv[2]).validate()
+        print(sys.argv[2] + ' is valid')
+    else:
+        print(build_bundle(*sys.argv[1:]))
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Derived Features           ###
+#######################################################
+
+# import statements
+import sys
+import os
+import ast
+import numpy as np
+from generate_structural_features import header, headeralpha, weighted_profile
+
+# kept in each background folder, the background values of the derived features
+derived_background_name = 'derived_background.csv'
+# functions an expression can call, each on whole columns
+expression_functions = {'min': np.minimum, 'max': np.maximum, 'abs': np.abs}
+# compiled expressions, by expression text
+compiled_expressions = {}
+
+# functions
+def read_definitions(definitions):
+    '''
+    Reads derived feature definitions
+    Inputs:
+        definitions (str, dict or list): a file with one 'name = expression' line per feature (lines starting with # are skipped), names mapped to expressions, or (name, expression) tuples
+    Outputs:
+        (list) (name, expression) tuples in order
+    '''
+    if isinstance(definitions, str):
+        pairs = []
+        with open(definitions) as fo:
+            for line in fo:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if '=' not in line:
+                    raise ValueError('Derived feature line without a name: ' + line)
+                name, expression = line.split('=', 1)
+                pairs.append((name.strip(), expression.strip()))
+        return pairs
+    if hasattr(definitions, 'items'):
+        return list(definitions.items())
+    return [tuple(pair) for pair in definitions]
+
+def divide(numerator, denominator):
+    # a protien with nothing to divide by gets 0, like a feature it does not have
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=np.asarray(denominator) != 0)
+
+def compile_node(node, columns):
+    '''
+    Turns a parsed expression into a function of the feature columns
+    Inputs:
+        node (ast node): part of the parsed expression
+        columns (list): collects the feature labels the expression uses
+    Outputs:
+        (function) takes a function giving the values of a feature label and returns the values of node
+    '''
+    if isinstance(node, ast.Expression):
+        return compile_node(node.body, columns)
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        # quoted text is a feature label
+        if node.value not in header[1:] and node.value not in headeralpha:
+            raise ValueError(node.value + ' is not a structural feature')
+        columns.append(node.value)
+        return lambda column: column(node.value)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return lambda column: float(node.value)
+    if isinstance(node, ast.BinOp):
+        operations = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: divide}
+        if type(node.op) not in operations:
+            raise ValueError('Only + - * / can be used in derived features')
+        operation = operations[type(node.op)]
+        left = compile_node(node.left, columns)
+        right = compile_node(node.right, columns)
+        return lambda column: operation(left(column), right(column))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.Not)):
+        operand = compile_node(node.operand, columns)
+        if isinstance(node.op, ast.Not):
+            return lambda column: (np.asarray(operand(column)) == 0).astype(float)
+        return lambda column: -operand(column)
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        # thresholds give 1 for the proteins that pass and 0 for the others
+        operations = {ast.Gt: np.greater, ast.GtE: np.greater_equal, ast.Lt: np.less, ast.LtE: np.less_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal}
+        if type(node.ops[0]) not in operations:
+            raise ValueError('Only > >= < <= == != can be used in derived features')
+        operation = operations[type(node.ops[0])]
+        left = compile_node(node.left, columns)
+        right = compile_node(node.comparators[0], columns)
+        return lambda column: operation(left(column), right(column)).astype(float)
+    if isinstance(node, ast.BoolOp):
+        operation = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        values = [compile_node(value, columns) for value in node.values]
+        def combine(column):
+            out = np.asarray(values[0](column)) != 0
+            for value in values[1:]:
+                out = operation(out, np.asarray(value(column)) != 0)
+            return out.astype(float)
+        return combine
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in expression_functions and not node.keywords:
+        function = expression_functions[node.func.id]
+        arguments = [compile_node(argument, columns) for argument in node.args]
+        if len(arguments) != (1 if node.func.id == 'abs' else 2):
+            raise ValueError(node.func.id + ' takes ' + ('1 argument' if node.func.id == 'abs' else '2 arguments'))
+        return lambda column: function(*[argument(column) for argument in arguments])
+    raise ValueError('Cannot use ' + ast.dump(node) + ' in a derived feature, see derived_features.py for what can be')
+
+def compile_expression(expression):
+    '''
+    Compiles a derived feature expression once into column operations
+    Feature labels are written in quotes, like "Length of protein", and can be combined with numbers, + - * /, thresholds (> >= < <= == !=), and, or, not, min(a, b), max(a, b) and abs(a)
+    Inputs:
+        expression (str): expression, like "Length of disordered regions" / "Length of protein"
+    Outputs:
+        function (function): takes a function giving the values of a feature label and returns the values of the expression
+        columns (list): feature labels used
+    '''
+    if expression not in compiled_expressions:
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as error:
+            raise ValueError('Cannot read derived feature expression ' + expression + ': ' + str(error.msg))
+        columns = []
+        compiled_expressions[expression] = (compile_node(tree, columns), list(dict.fromkeys(columns)))
+    return compiled_expressions[expression]
+
+class DerivedFeatures:
+    '''
+    Per protien features computed from the columns of the precounted human genome or alpha fold features, each over whole columns at once
+    Like the built in features, a derived feature whose name starts with Number or Y/n is a count feature, the others are continous
+    '''
+    def __init__(self, definitions):
+        '''
+        Inputs:
+            definitions (str, dict or list): see read_definitions
+        '''
+        self.labels = []
+        self.expressions = {}
+        self.functions = {}
+        self.tables = {}
+        for name, expression in read_definitions(definitions):
+            if not name or ',' in name:
+                raise ValueError('Derived feature names cannot be empty or have commas: ' + name)
+            if name in header or name in headeralpha or name in self.expressions:
+                raise ValueError(name + ' is already a feature')
+            function, columns = compile_expression(expression)
+            tables = set('human' if label in header else 'alpha' for label in columns)
+            if len(tables) != 1:
+                # the two tables have different proteins
+                raise ValueError(name + ' has to use the features of exactly one of the precounted human genome or alpha fold features')
+            self.labels.append(name)
+            self.expressions[name] = expression
+            self.functions[name] = function
+            self.tables[name] = tables.pop()
+        self.frequency_labels = [label for label in self.labels if label.split(' ')[0] == 'Number' or label.split(' ')[0] == 'Y/n']
+        self.average_labels = [label for label in self.labels if label not in self.frequency_labels]
+
+    def table_labels(self, table):
+        '''
+        Derived features of one table, 'human' or 'alpha'
+        '''
+        return [label for label in self.labels if self.tables[label] == table]
+
+    def evaluate(self, table, values):
+        '''
+        Computes the derived features of one table for every protien
+        Inputs:
+            table (str): 'human' or 'alpha'
+            values (numpy array): proteins x features of that table, like StructuralFeatures.human_values
+        Outputs:
+            (numpy array) proteins x table_labels(table)
+        '''
+        labels = header[1:] if table == 'human' else headeralpha
+        def column(label):
+            return np.asarray(values[:, labels.index(label)], dtype=float)
+        table_labels = self.table_labels(table)
+        out = np.zeros((len(values), len(table_labels)))
+        for index in range(len(table_labels)):
+            out[:, index] = self.functions[table_labels[index]](column)
+        return out
+
+def derived_background_lines(labels, averages, sds, expressions):
+    '''
+    'label,average,standard deviation,expression' lines of a derived background, count features have no standard deviation
+    The expression is kept so values computed from another definition of the same name are not used
+    '''
+    return [labels[index] + ',' + str(averages[index]) + ',' + str(sds.get(labels[index], 'nan')) + ',' + expressions[labels[index]] for index in range(len(labels))]
+
+def write_derived_background(sf, background=None, genes=None, use_weight=None):
+    '''
+    Writes the derived features of a background to its derived_background.csv, needed before testing derived features against it
+    Inputs:
+        sf (StructuralFeatures): databases loaded with derived features
+        background (str): name of the background folder, default the one given when loading
+        genes (list, dict or pandas Series): the background's gene list, default every protien in the precounted human genome like human_background
+        use_weight (bool): weigh the averages by the weights, by default True when weights are given
+    Outputs:
+        path (str): file written
+    '''
+    if sf.derived is None:
+        raise ValueError('The databases were loaded without derived features')
+    background = background or sf.background
+    summary = sf.aggregate(list(sf.human_ids) if genes is None else genes, use_weight)
+    path = sf.database_root + background + '/' + derived_background_name
+    with open(path, 'w') as fo:
+        fo.write(''.join(line + '\n' for line in derived_background_lines(sf.derived.labels, [summary['average'][label] for label in sf.derived.labels], summary['sd'], sf.derived.expressions)))
+    return path
+
+def member_derived_lines(sf, members, use_weight):
+    '''
+    Derived background lines of the proteins of a background, averaged like aggregate does from the weights kept per protien
+    Inputs:
+        sf (StructuralFeatures): databases loaded with derived features
+        members (dict): 'human' mapped to {protien: [sets, weight, first weight]} and 'alpha' mapped to {protien: [sets, weight]}, see make_background.set_members
+        use_weight (bool): if the standard deviations are weighted
+    Outputs:
+        (list) lines of derived_background.csv
+    '''
+    averages = {}
+    sds = {}
+    for table, values, rows, sd_columns in (('human', sf.human_derived, sf.human_rows, sf.human_derived_sd_columns), ('alpha', sf.alpha_derived, sf.alpha_rows, sf.alpha_derived_sd_columns)):
+        weights = members[table]
+        labels = sf.derived.table_labels(table)
+        # the first weight of each protien is what the human averages are divided by, like tot_weight
+        total = sum(weights[gnuid][2] for gnuid in weights) if table == 'human' else None
+        table_values = np.asarray(values)[[rows[gnuid] for gnuid in weights]].reshape(len(weights), len(labels))
+        average, sd = weighted_profile(table_values, np.array([weights[gnuid][1] for gnuid in weights], dtype=float), sd_columns, use_weight, total)
+        averages.update(zip(labels, average))
+        sds.update(zip([labels[index] for index in sd_columns], sd))
+    return derived_background_lines(sf.derived.labels, [averages[label] for label in sf.derived.labels], sds, sf.derived.expressions)
+
+def add_derived_background(path_to_background, background, derived):
+    '''
+    Adds the derived features of a background folder to a loaded background
+    Inputs:
+        path_to_background (str): background folder, ending in /
+        background (dict): output of load_background, changed in place
+        derived (DerivedFeatures): derived features tested
+    Outputs:
+        background (dict)
+    '''
+    values = {}
+    expressions = {}
+    if os.path.exists(path_to_background + derived_background_name):
+        with open(path_to_background + derived_background_name) as fo:
+            for line in fo:
+                # names have no commas, expressions can
+                split_line = line.rstrip('\n').split(',', 3)
+                values[split_line[0]] = (float(split_line[1]), float(split_line[2]))
+                expressions[split_line[0]] = split_line[3] if len(split_line) > 3 else None
+    missing = [label for label in derived.labels if label not in values]
+    if missing:
+        raise ValueError(path_to_background + ' has no background values of the derived features ' + ', '.join(missing) + ', see write_derived_background')
+    changed = [label for label in derived.labels if expressions[label] != derived.expressions[label]]
+    if changed:
+        raise ValueError(path_to_background + ' has background values of the derived features ' + ', '.join(changed) + ' computed from other expressions, see write_derived_background')
+    for label in derived.frequency_labels:
+        background['frequency'][label] = values[label][0]
+    for label in derived.average_labels:
+        background['average'][label] = values[label]
+    return background
+
+if __name__ == '__main__':
+    # python derived_features.py derived_features.txt [databases/] [background_name] [gene_file] [use_weight]
+    from generate_structural_features import StructuralFeatures, read_sample_file, parse_bool
+    database_root = sys.argv[2] if len(sys.argv) > 2 else './databases/'
+    background = sys.argv[3] if len(sys.argv) > 3 else 'human_background'
+    use_weight = parse_bool(sys.argv[5]) if len(sys.argv) > 5 else False
+    sf = StructuralFeatures(database_root, background, derived=sys.argv[1])
+    genes = read_sample_file(sys.argv[4], use_weight) if len(sys.argv) > 4 else None
+    print(write_derived_background(sf, background, genes, use_weight))
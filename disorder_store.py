@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Disorder Cutoffs           ###
+#######################################################
+
+# import statements
+import sys
+import os
+import numpy as np
+from residue_store import ResidueStoreWriter, ResidueStore
+from predictor_archive import open_input
+
+# tracks of the iupred residue store and their types
+iupred_tracks = {'residue': 'S1', 'iupred': 'float32', 'anchor': 'float32'}
+iupred_store_name = 'iupred_residues'
+# amino acids counted by get_disorder, and the ones written to the precounted features
+counted_aa = ['R', 'H', 'K', 'D', 'E', 'S', 'T', 'N', 'Q', 'C', 'U', 'G', 'P', 'A', 'V', 'I', 'L', 'M', 'F', 'Y', 'W']
+aa_list = ['A', 'R', 'N', 'D', 'C', 'E', 'Q', 'G', 'H', 'I', 'L', 'K', 'M', 'F', 'P', 'S', 'T', 'W', 'Y', 'V']
+# score track and feature label word of the disordered and anchor regions
+region_kinds = {'disordered': 'iupred', 'anchor': 'anchor'}
+
+# functions
+def read_iupred_file(iupred_file_name):
+    '''
+    Reads the per residue scores of an iupred2a long output file, the same way get_disorder does
+    Inputs:
+        iupred_file_name (str): path to the iupred file, can be inside a predictor output archive
+    Outputs:
+        values (dict): residue, iupred and anchor tracks
+    '''
+    values = {'residue': [], 'iupred': [], 'anchor': []}
+    with open_input(iupred_file_name) as fileobject:
+        for line in fileobject:
+            if line[0] == '#':
+                continue
+            row = line.split('\t')
+            values['residue'].append(row[1][:1].encode())
+            values['iupred'].append(float(row[2]))
+            # get_disorder drops the last character (the end of line) of the anchor score
+            values['anchor'].append(float(row[3][:-1]))
+    return values
+
+def build_iupred_store(database_root='./databases/'):
+    '''
+    Reads every iupred2a long output once and keeps the per residue iupred and anchor scores in databases/iupred_residues/, so disorder and anchor features can be counted for any cutoff without reading the outputs again
+    Inputs:
+        database_root (str): default './databases/', folder with iupred2a_long (extracted or as an archive)
+    Outputs:
+        (int) number of iupred files in the store
+    '''
+    from update_databases import make_file_dict
+    from build_progress import ProgressReporter
+    file_dict = make_file_dict(database_root + 'iupred2a_long/', '.fas.txt')
+    names_per_file = {}
+    for name in file_dict:
+        names_per_file.setdefault(file_dict[name], []).append(name)
+    progress = ProgressReporter(len(names_per_file), 'iupred files')
+    with ResidueStoreWriter(database_root + iupred_store_name + '/', iupred_tracks) as store:
+        for iupred_file in sorted(names_per_file):
+            try:
+                values = read_iupred_file(iupred_file)
+            except (OSError, IndexError, ValueError):
+                # get_disorder fails on these too, their features stay as built
+                progress.update()
+                continue
+            names = names_per_file[iupred_file]
+            store.add(names[0], values, names[1:])
+            progress.update()
+    progress.finish()
+    return len(names_per_file)
+
+def segment_counts(scores, residues, offsets, cutoff):
+    '''
+    Counts the regions at or above a cutoff in many proteins at once, with run length encoding over all residues together
+    Like get_disorder, a region still open at the last residue of a protien is not counted as a region and its length is not added to the region lengths, but its residues are counted in the composition
+    Inputs:
+        scores (numpy array): per residue scores of all proteins one after the other
+        residues (numpy array): one letter per residue, same order as scores
+        offsets (numpy array): start of each protien in scores, and the total number of residues last
+        cutoff (float): residues with a score at or above it are in a region
+    Outputs:
+        number (numpy array): regions per protien
+        closed_length (numpy array): total length of the counted regions per protien
+        composition (numpy array): proteins x counted_aa, residues of each amino acid in regions
+    '''
+    num_proteins = len(offsets) - 1
+    lengths = np.diff(offsets)
+    protein = np.repeat(np.arange(num_proteins), lengths)
+    # scores are float32, the cutoff is rounded the same way so the comparison matches the one on the text scores
+    above = np.asarray(scores) >= np.float32(cutoff)
+    first_residue = np.zeros(len(above), dtype=bool)
+    last_residue = np.zeros(len(above), dtype=bool)
+    first_residue[offsets[:-1][lengths > 0]] = True
+    last_residue[offsets[1:][lengths > 0] - 1] = True
+    previous_above = np.zeros(len(above), dtype=bool)
+    previous_above[1:] = above[:-1]
+    previous_above &= ~first_residue
+    next_above = np.zeros(len(above), dtype=bool)
+    next_above[:-1] = above[1:]
+    next_above &= ~last_residue
+    starts = np.flatnonzero(above & ~previous_above)
+    ends = np.flatnonzero(above & ~next_above)
+    closed = ~last_residue[ends]
+    region_protein = protein[starts[closed]]
+    number = np.bincount(region_protein, minlength=num_proteins)
+    closed_length = np.bincount(region_protein, weights=(ends - starts + 1)[closed], minlength=num_proteins)
+    codes = np.full(256, -1, dtype=np.int64)
+    for index, aa in enumerate(counted_aa):
+        codes[ord(aa)] = index
+    residue_codes = codes[np.asarray(residues).view(np.uint8)]
+    counted = above & (residue_codes >= 0)
+    composition = np.bincount(protein[counted]*len(counted_aa) + residue_codes[counted], minlength=num_proteins*len(counted_aa)).reshape(num_proteins, len(counted_aa))
+    return number, closed_length, composition
+
+def region_columns(number, closed_length, composition, protein_length, kind):
+    '''
+    Turns region counts into the precounted feature columns the way write_outputs does, all zeros when the regions are longer than the protien
+    Inputs:
+        number, closed_length, composition (numpy arrays): from segment_counts
+        protein_length (numpy array): length of each protien
+        kind (str): 'disordered' or 'anchor'
+    Outputs:
+        columns (dict): feature label mapped to one value per protien
+        too_long (numpy array): True for proteins whose features were set to zero
+    '''
+    total_length = np.maximum(closed_length, composition.sum(axis=1))
+    fits = total_length <= protein_length
+    columns = {
+        'Y/n ' + kind + ' regions': np.where(fits, number > 0, 0).astype(float),
+        'Number of ' + kind + ' regions': np.where(fits, number, 0).astype(float),
+        'Total length of ' + kind + ' regions': np.where(fits, total_length, 0).astype(float),
+    }
+    for aa in aa_list:
+        columns['Number amino acid in ' + kind + ' region ' + aa] = np.where(fits, composition[:, counted_aa.index(aa)], 0).astype(float)
+    return columns, ~fits
+
+def disorder_features(store, gnuid, cutoff=0.5, protein_length=None):
+    '''
+    Disorder and anchor features of one protien for any cutoff
+    Inputs:
+        store (ResidueStore): iupred residue store
+        gnuid (str): gene or protien name
+        cutoff (float): default 0.5, the cutoff write_outputs builds the database with
+        protein_length (int): default no limit, length of the protien, features of regions longer than it are set to zero like in write_outputs
+    Outputs:
+        out_dict (dict): feature label mapped to value, same labels as the precounted human genome
+    '''
+    residues = store.track('residue', gnuid)
+    offsets = np.array([0, len(residues)])
+    out_dict = {}
+    for kind in region_kinds:
+        number, closed_length, composition = segment_counts(store.track(region_kinds[kind], gnuid), residues, offsets, cutoff)
+        columns, too_long = region_columns(number, closed_length, composition, np.inf if protein_length is None else protein_length, kind)
+        for label in columns:
+            out_dict[label] = int(columns[label][0])
+    return out_dict
+
+def apply_disorder_cutoff(ids, values, store, cutoff, header):
+    '''
+    Recounts the disorder and anchor columns of the precounted human genome for a new cutoff
+    Proteins without iupred scores in the store keep their values
+    Inputs:
+        ids (list): gene or protien names of the rows of values
+        values (numpy array): precounted human genome features
+        store (ResidueStore): iupred residue store
+        cutoff (float): residues with a score at or above it are in a disordered or anchor region
+        header (list): the precounted human genome header, starting with 'Name'
+    Outputs:
+        values (numpy array): copy of values with the disorder and anchor columns recounted
+    '''
+    values = np.array(values, dtype=float)
+    store_rows = np.array([store.rows.get(gnuid, -1) for gnuid in ids], dtype=np.int64)
+    in_store = store_rows >= 0
+    protein_length = values[in_store, header.index('Length of protein') - 1]
+    for kind in region_kinds:
+        number, closed_length, composition = segment_counts(store.data[region_kinds[kind]], store.data['residue'], store.offsets['residue'], cutoff)
+        rows = store_rows[in_store]
+        columns, too_long = region_columns(number[rows], closed_length[rows], composition[rows], protein_length, kind)
+        for label in columns:
+            values[in_store, header.index(label) - 1] = columns[label]
+    return values
+
+def open_iupred_store(database_root='./databases/'):
+    '''
+    Opens databases/iupred_residues/, with a message on how to make it when it is missing
+    '''
+    store_dir = os.path.join(database_root, iupred_store_name, '')
+    if not os.path.exists(store_dir + 'tracks.json'):
+        raise FileNotFoundError('No iupred residue store in ' + database_root + ', make it with python disorder_store.py ' + database_root)
+    return ResidueStore(store_dir)
+
+if __name__ == '__main__':
+    # python disorder_store.py [databases/]
+    print(build_iupred_store(*sys.argv[1:]))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Precounted Feature Store   ###
+#######################################################
+
+# import statements
+import os
+import sqlite3
+import numpy as np
+
+# one sqlite file holding a table per precounted folder, rows keyed by gene or protien name
+store_name = 'precounted_features.db'
+
+# functions
+def quote_column(label):
+    '''
+    Quotes a feature label so it can be used as a sqlite column name
+    '''
+    return '"' + label.replace('"', '""') + '"'
+
+class FeatureStoreWriter:
+    '''
+    Writes precounted feature rows into a table of the feature store, committing in batches
+    Writing a name again replaces its row
+    Example:
+        with FeatureStoreWriter('databases/precounted_features.db', 'precounted_human_genome', output_keys) as store:
+            store.add('TP53', values)
+    '''
+    def __init__(self, store_path, table, columns, column_type='INTEGER', batch_size=1000, replace_table=False):
+        '''
+        Inputs:
+            store_path (str): path of the sqlite feature store, created if needed
+            table (str): table name, like precounted_human_genome or precounted_alpha_fold
+            columns (list): feature labels in the order values are given
+            column_type (str): default 'INTEGER', sqlite type of the feature columns, 'REAL' for features with decimals
+            batch_size (int): default 1000, rows written per transaction
+            replace_table (bool): default False, drop any earlier version of the table first
+        '''
+        self.con = sqlite3.connect(store_path)
+        self.table = table
+        self.columns = columns
+        self.batch_size = int(batch_size)
+        self.rows = []
+        if replace_table:
+            self.con.execute('DROP TABLE IF EXISTS ' + quote_column(table))
+        self.con.execute('CREATE TABLE IF NOT EXISTS ' + quote_column(table) + ' (name TEXT PRIMARY KEY, ' + ', '.join(quote_column(label) + ' ' + column_type for label in columns) + ')')
+        self.con.commit()
+        self.insert = 'INSERT OR REPLACE INTO ' + quote_column(table) + ' VALUES (' + ','.join('?'*(len(columns) + 1)) + ')'
+
+    def add(self, name, values):
+        '''
+        Adds the row of one gene or protien
+        Inputs:
+            name (str): gene or protien name
+            values (list): feature values in columns order
+        '''
+        if len(values) != len(self.columns):
+            raise ValueError(name + ' has ' + str(len(values)) + ' values, expected ' + str(len(self.columns)))
+        self.rows.append((name,) + tuple(values))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Writes the rows added so far in one transaction
+        '''
+        if self.rows:
+            with self.con:
+                self.con.executemany(self.insert, self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def store_tables(store_path):
+    '''
+    Names of the tables in a feature store, empty when there is no store
+    '''
+    if not os.path.exists(store_path):
+        return []
+    con = sqlite3.connect(store_path)
+    tables = [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    con.close()
+    return tables
+
+def load_feature_table(store_path, table, num_features):
+    '''
+    Loads a whole table of the feature store into one matrix, same output as load_precounted_folder on the matching folder
+    Inputs:
+        store_path (str): path of the sqlite feature store
+        table (str): table name
+        num_features (int): number of feature columns expected after the name
+    Outputs:
+        ids (list): gene or protien names, sorted like the files of a precounted folder
+        values (numpy array): one row of feature values per name
+    '''
+    con = sqlite3.connect(store_path)
+    cursor = con.execute('SELECT * FROM ' + quote_column(table))
+    if len(cursor.description) - 1 != num_features:
+        con.close()
+        raise ValueError(table + ' in ' + store_path + ' has ' + str(len(cursor.description) - 1) + ' features, expected ' + str(num_features))
+    rows = cursor.fetchall()
+    con.close()
+    # same order as sorting the <name>.txt file paths of a folder
+    rows.sort(key=lambda row: row[0] + '.txt')
+    ids = [row[0] for row in rows]
+    values = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), num_features)
+    return ids, values
+
+def load_feature_names(store_path, table):
+    '''
+    Names in a table of the feature store without their feature values, in the order load_feature_table gives them
+    '''
+    con = sqlite3.connect(store_path)
+    names = [row[0] for row in con.execute('SELECT name FROM ' + quote_column(table))]
+    con.close()
+    return sorted(names, key=lambda name: name + '.txt')
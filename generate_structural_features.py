@@ -7,16 +7,19 @@
 ####################################
 
 # import statements
-from itertools import filterfalse
+# scipy and statsmodels are imported inside the functions that use them so importing this module stays fast
 import sys
+import os
 import glob
 import sqlite3
 import math
-from scipy.stats import fisher_exact
-from statsmodels.stats.multitest import fdrcorrection
-from statsmodels.stats.weightstats import DescrStatsW
-from numpy import std
-import scipy.stats
+import bisect
+import numpy as np
+
+# feature labels, in the column order of the precounted_human_genome and precounted_alpha_fold files
+header = ['Name','Crowd predictions', 'Length of protein', 'NHTM Best from query.phdPred', 'Negative region lengths', 'Number amino acid in anchor region A', 'Number amino acid in anchor region C', 'Number amino acid in anchor region D', 'Number amino acid in anchor region E', 'Number amino acid in anchor region F', 'Number amino acid in anchor region G', 'Number amino acid in anchor region H', 'Number amino acid in anchor region I', 'Number amino acid in anchor region K', 'Number amino acid in anchor region L', 'Number amino acid in anchor region M', 'Number amino acid in anchor region N', 'Number amino acid in anchor region P', 'Number amino acid in anchor region Q', 'Number amino acid in anchor region R', 'Number amino acid in anchor region S', 'Number amino acid in anchor region T', 'Number amino acid in anchor region V', 'Number amino acid in anchor region W', 'Number amino acid in anchor region Y', 'Number amino acid in coil region A', 'Number amino acid in coil region C', 'Number amino acid in coil region D', 'Number amino acid in coil region E', 'Number amino acid in coil region F', 'Number amino acid in coil region G', 'Number amino acid in coil region H', 'Number amino acid in coil region I', 'Number amino acid in coil region K', 'Number amino acid in coil region L', 'Number amino acid in coil region M', 'Number amino acid in coil region N', 'Number amino acid in coil region P', 'Number amino acid in coil region Q', 'Number amino acid in coil region R', 'Number amino acid in coil region S', 'Number amino acid in coil region T', 'Number amino acid in coil region V', 'Number amino acid in coil region W', 'Number amino acid in coil region Y', 'Number amino acid in conserved region A', 'Number amino acid in conserved region C', 'Number amino acid in conserved region D', 'Number amino acid in conserved region E', 'Number amino acid in conserved region F', 'Number amino acid in conserved region G', 'Number amino acid in conserved region H', 'Number amino acid in conserved region I', 'Number amino acid in conserved region K', 'Number amino acid in conserved region L', 'Number amino acid in conserved region M', 'Number amino acid in conserved region N', 'Number amino acid in conserved region P', 'Number amino acid in conserved region Q', 'Number amino acid in conserved region R', 'Number amino acid in conserved region S', 'Number amino acid in conserved region T', 'Number amino acid in conserved region V', 'Number amino acid in conserved region W', 'Number amino acid in conserved region Y', 'Number amino acid in disordered region A', 'Number amino acid in disordered region C', 'Number amino acid in disordered region D', 'Number amino acid in disordered region E', 'Number amino acid in disordered region F', 'Number amino acid in disordered region G', 'Number amino acid in disordered region H', 'Number amino acid in disordered region I', 'Number amino acid in disordered region K', 'Number amino acid in disordered region L', 'Number amino acid in disordered region M', 'Number amino acid in disordered region N', 'Number amino acid in disordered region P', 'Number amino acid in disordered region Q', 'Number amino acid in disordered region R', 'Number amino acid in disordered region S', 'Number amino acid in disordered region T', 'Number amino acid in disordered region V', 'Number amino acid in disordered region W', 'Number amino acid in disordered region Y', 'Number amino acid in globular region A', 'Number amino acid in globular region C', 'Number amino acid in globular region D', 'Number amino acid in globular region E', 'Number amino acid in globular region F', 'Number amino acid in globular region G', 'Number amino acid in globular region H', 'Number amino acid in globular region I', 'Number amino acid in globular region K', 'Number amino acid in globular region L', 'Number amino acid in globular region M', 'Number amino acid in globular region N', 'Number amino acid in globular region P', 'Number amino acid in globular region Q', 'Number amino acid in globular region R', 'Number amino acid in globular region S', 'Number amino acid in globular region T', 'Number amino acid in globular region V', 'Number amino acid in globular region W', 'Number amino acid in globular region Y', 'Number amino acid in helix region A', 'Number amino acid in helix region C', 'Number amino acid in helix region D', 'Number amino acid in helix region E', 'Number amino acid in helix region F', 'Number amino acid in helix region G', 'Number amino acid in helix region H', 'Number amino acid in helix region I', 'Number amino acid in helix region K', 'Number amino acid in helix region L', 'Number amino acid in helix region M', 'Number amino acid in helix region N', 'Number amino acid in helix region P', 'Number amino acid in helix region Q', 'Number amino acid in helix region R', 'Number amino acid in helix region S', 'Number amino acid in helix region T', 'Number amino acid in helix region V', 'Number amino acid in helix region W', 'Number amino acid in helix region Y', 'Number amino acid in loop region A', 'Number amino acid in loop region C', 'Number amino acid in loop region D', 'Number amino acid in loop region E', 'Number amino acid in loop region F', 'Number amino acid in loop region G', 'Number amino acid in loop region H', 'Number amino acid in loop region I', 'Number amino acid in loop region K', 'Number amino acid in loop region L', 'Number amino acid in loop region M', 'Number amino acid in loop region N', 'Number amino acid in loop region P', 'Number amino acid in loop region Q', 'Number amino acid in loop region R', 'Number amino acid in loop region S', 'Number amino acid in loop region T', 'Number amino acid in loop region V', 'Number amino acid in loop region W', 'Number amino acid in loop region Y', 'Number amino acid in nonconserved region A', 'Number amino acid in nonconserved region C', 'Number amino acid in nonconserved region D', 'Number amino acid in nonconserved region E', 'Number amino acid in nonconserved region F', 'Number amino acid in nonconserved region G', 'Number amino acid in nonconserved region H', 'Number amino acid in nonconserved region I', 'Number amino acid in nonconserved region K', 'Number amino acid in nonconserved region L', 'Number amino acid in nonconserved region M', 'Number amino acid in nonconserved region N', 'Number amino acid in nonconserved region P', 'Number amino acid in nonconserved region Q', 'Number amino acid in nonconserved region R', 'Number amino acid in nonconserved region S', 'Number amino acid in nonconserved region T', 'Number amino acid in nonconserved region V', 'Number amino acid in nonconserved region W', 'Number amino acid in nonconserved region Y', 'Number amino acid in protein A', 'Number amino acid in protein C', 'Number amino acid in protein D', 'Number amino acid in protein E', 'Number amino acid in protein F', 'Number amino acid in protein G', 'Number amino acid in protein H', 'Number amino acid in protein I', 'Number amino acid in protein K', 'Number amino acid in protein L', 'Number amino acid in protein M', 'Number amino acid in protein N', 'Number amino acid in protein P', 'Number amino acid in protein Q', 'Number amino acid in protein R', 'Number amino acid in protein S', 'Number amino acid in protein T', 'Number amino acid in protein V', 'Number amino acid in protein W', 'Number amino acid in protein Y', 'Number amino acid in sheet region A', 'Number amino acid in sheet region C', 'Number amino acid in sheet region D', 'Number amino acid in sheet region E', 'Number amino acid in sheet region F', 'Number amino acid in sheet region G', 'Number amino acid in sheet region H', 'Number amino acid in sheet region I', 'Number amino acid in sheet region K', 'Number amino acid in sheet region L', 'Number amino acid in sheet region M', 'Number amino acid in sheet region N', 'Number amino acid in sheet region P', 'Number amino acid in sheet region Q', 'Number amino acid in sheet region R', 'Number amino acid in sheet region S', 'Number amino acid in sheet region T', 'Number amino acid in sheet region V', 'Number amino acid in sheet region W', 'Number amino acid in sheet region Y', 'Number of anchor regions', 'Number of coils', 'Number of conserved regions', 'Number of disordered regions', 'Number of globular regions', 'Number of helix', 'Number of loops', 'Number of negative regions', 'Number of negative regions with length >=30', 'Number of nonconserved regions', 'Number of positive regions', 'Number of positive regions with length >=30', 'Number of predictions', 'Number of sheets', 'Number of transmembrane helices', 'Positive region lengths', 'Stretch', 'Total length of anchor regions', 'Total length of coil regions', 'Total length of conserved regions', 'Total length of disordered regions', 'Total length of globular regions', 'Total length of helix regions', 'Total length of loop regions', 'Total length of nonconserved regions', 'Total length of sheet regions', 'Total length tmh regions', 'Y/n anchor regions', 'Y/n disordered regions', 'Y/n globular regions', 'Y/n tmh regions']
+headeralpha = ['Length of S Regions', 'Number of S Regions', 'Number of Amino Acids A in S Regions', 'Number of Amino Acids R in S Regions', 'Number of Amino Acids N in S Regions', 'Number of Amino Acids D in S Regions', 'Number of Amino Acids C in S Regions', 'Number of Amino Acids E in S Regions', 'Number of Amino Acids Q in S Regions', 'Number of Amino Acids G in S Regions', 'Number of Amino Acids H in S Regions', 'Number of Amino Acids I in S Regions', 'Number of Amino Acids L in S Regions', 'Number of Amino Acids K in S Regions', 'Number of Amino Acids M in S Regions', 'Number of Amino Acids F in S Regions', 'Number of Amino Acids P in S Regions', 'Number of Amino Acids S in S Regions', 'Number of Amino Acids T in S Regions', 'Number of Amino Acids W in S Regions', 'Number of Amino Acids Y in S Regions', 'Number of Amino Acids V in S Regions', 'Length of E Regions', 'Number of E Regions', 'Number of Amino Acids A in E Regions', 'Number of Amino Acids R in E Regions', 'Number of Amino Acids N in E Regions', 'Number of Amino Acids D in E Regions', 'Number of Amino Acids C in E Regions', 'Number of Amino Acids E in E Regions', 'Number of Amino Acids Q in E Regions', 'Number of Amino Acids G in E Regions', 'Number of Amino Acids H in E Regions', 'Number of Amino Acids I in E Regions', 'Number of Amino Acids L in E Regions', 'Number of Amino Acids K in E Regions', 'Number of Amino Acids M in E Regions', 'Number of Amino Acids F in E Regions', 'Number of Amino Acids P in E Regions', 'Number of Amino Acids S in E Regions', 'Number of Amino Acids T in E Regions', 'Number of Amino Acids W in E Regions', 'Number of Amino Acids Y in E Regions', 'Number of Amino Acids V in E Regions', 'Length of T Regions', 'Number of T Regions', 'Number of Amino Acids A in T Regions', 'Number of Amino Acids R in T Regions', 'Number of Amino Acids N in T Regions', 'Number of Amino Acids D in T Regions', 'Number of Amino Acids C in T Regions', 'Number of Amino Acids E in T Regions', 'Number of Amino Acids Q in T Regions', 'Number of Amino Acids G in T Regions', 'Number of Amino Acids H in T Regions', 'Number of Amino Acids I in T Regions', 'Number of Amino Acids L in T Regions', 'Number of Amino Acids K in T Regions', 'Number of Amino Acids M in T Regions', 'Number of Amino Acids F in T Regions', 'Number of Amino Acids P in T Regions', 'Number of Amino Acids S in T Regions', 'Number of Amino Acids T in T Regions', 'Number of Amino Acids W in T Regions', 'Number of Amino Acids Y in T Regions', 'Number of Amino Acids V in T Regions', 'Length of B Regions', 'Number of B Regions', 'Number of Amino Acids A in B Regions', 'Number of Amino Acids R in B Regions', 'Number of Amino Acids N in B Regions', 'Number of Amino Acids D in B Regions', 'Number of Amino Acids C in B Regions', 'Number of Amino Acids E in B Regions', 'Number of Amino Acids Q in B Regions', 'Number of Amino Acids G in B Regions', 'Number of Amino Acids H in B Regions', 'Number of Amino Acids I in B Regions', 'Number of Amino Acids L in B Regions', 'Number of Amino Acids K in B Regions', 'Number of Amino Acids M in B Regions', 'Number of Amino Acids F in B Regions', 'Number of Amino Acids P in B Regions', 'Number of Amino Acids S in B Regions', 'Number of Amino Acids T in B Regions', 'Number of Amino Acids W in B Regions', 'Number of Amino Acids Y in B Regions', 'Number of Amino Acids V in B Regions', 'Length of G Regions', 'Number of G Regions', 'Number of Amino Acids A in G Regions', 'Number of Amino Acids R in G Regions', 'Number of Amino Acids N in G Regions', 'Number of Amino Acids D in G Regions', 'Number of Amino Acids C in G Regions', 'Number of Amino Acids E in G Regions', 'Number of Amino Acids Q in G Regions', 'Number of Amino Acids G in G Regions', 'Number of Amino Acids H in G Regions', 'Number of Amino Acids I in G Regions', 'Number of Amino Acids L in G Regions', 'Number of Amino Acids K in G Regions', 'Number of Amino Acids M in G Regions', 'Number of Amino Acids F in G Regions', 'Number of Amino Acids P in G Regions', 'Number of Amino Acids S in G Regions', 'Number of Amino Acids T in G Regions', 'Number of Amino Acids W in G Regions', 'Number of Amino Acids Y in G Regions', 'Number of Amino Acids V in G Regions', 'Length of H Regions', 'Number of H Regions', 'Number of Amino Acids A in H Regions', 'Number of Amino Acids R in H Regions', 'Number of Amino Acids N in H Regions', 'Number of Amino Acids D in H Regions', 'Number of Amino Acids C in H Regions', 'Number of Amino Acids E in H Regions', 'Number of Amino Acids Q in H Regions', 'Number of Amino Acids G in H Regions', 'Number of Amino Acids H in H Regions', 'Number of Amino Acids I in H Regions', 'Number of Amino Acids L in H Regions', 'Number of Amino Acids K in H Regions', 'Number of Amino Acids M in H Regions', 'Number of Amino Acids F in H Regions', 'Number of Amino Acids P in H Regions', 'Number of Amino Acids S in H Regions', 'Number of Amino Acids T in H Regions', 'Number of Amino Acids W in H Regions', 'Number of Amino Acids Y in H Regions', 'Number of Amino Acids V in H Regions', 'Length of Aggregation Prone Regions', 'Number of Aggregation Prone Regions', 'Number of Amino Acids A in Aggregation Prone Regions', 'Number of Amino Acids R in Aggregation Prone Regions', 'Number of Amino Acids N in Aggregation Prone Regions', 'Number of Amino Acids D in Aggregation Prone Regions', 'Number of Amino Acids C in Aggregation Prone Regions', 'Number of Amino Acids E in Aggregation Prone Regions', 'Number of Amino Acids Q in Aggregation Prone Regions', 'Number of Amino Acids G in Aggregation Prone Regions', 'Number of Amino Acids H in Aggregation Prone Regions', 'Number of Amino Acids I in Aggregation Prone Regions', 'Number of Amino Acids L in Aggregation Prone Regions', 'Number of Amino Acids K in Aggregation Prone Regions', 'Number of Amino Acids M in Aggregation Prone Regions', 'Number of Amino Acids F in Aggregation Prone Regions', 'Number of Amino Acids P in Aggregation Prone Regions', 'Number of Amino Acids S in Aggregation Prone Regions', 'Number of Amino Acids T in Aggregation Prone Regions', 'Number of Amino Acids W in Aggregation Prone Regions', 'Number of Amino Acids Y in Aggregation Prone Regions', 'Number of Amino Acids V in Aggregation Prone Regions', 'Minimum Distance to Center of Mass', 'Maximum Distance to Center of Mass', 'Average Distance to Center of Mass', 'Number of Contacts']
+all_headers = header[1:] + headeralpha
 
 # functions
 def check_if_thresholds_met(sample_info,prob,evalue,pvalue,coverage,percent_identity,len_template):
@@ -97,20 +100,38 @@ def get_substructs_from_oneid(id, path_to_db,prob,evalue,pvalue,coverage,percent
         uid = id
     domain_info = cursor.execute("SELECT * from domain WHERE uid like ?", ('%' + uid + '%',))
     r_domain = domain_info.fetchall()
+    fold_info = cursor.execute("SELECT * from fold WHERE uid like ?", ('%' + uid + '%',))
+    r_fold = fold_info.fetchall()
+    con.close()
+    return add_substructs(r_domain, r_fold, prob,evalue,pvalue,coverage,percent_identity,len_template, out_dict)
+
+def add_substructs(r_domain, r_fold, prob,evalue,pvalue,coverage,percent_identity,len_template, out_dict):
+    '''
+    Counts the scope and interproscan classes in the domain and fold table rows of one protien
+    Inputs:
+        r_domain (list): rows of the domain table for the protien
+        r_fold (list): rows of the fold table for the protien
+        prob (int): between 0-100 cutoff value
+        evalue (float): e value cutoff value
+        pvalue (float): p value cutoff value
+        coverage (float): sequence coverage cutoff value
+        percent_identity (int): between 0-100 cutoff value
+        len_template (int): length in amino acid of sequence to compare
+        out_dict (dict): collecting variable for sub structures of all proteins 
+    Outputs:
+        out_dict (dict): collecting variable for sub structures of all proteins 
+    '''
     for list_index in range(len(r_domain)):
         ips_list = r_domain[list_index][5].split(';')
         descript_list = r_domain[list_index][7].split(';')
         for i in range(len(ips_list)):
             key = (ips_list[i],descript_list[i])
             out_dict['domain'] = add_to_freq_dict(out_dict['domain'], key)
-    fold_info = cursor.execute("SELECT * from fold WHERE uid like ?", ('%' + uid + '%',))
-    r_fold = fold_info.fetchall()
     for i in r_fold:
         if check_if_thresholds_met(i,prob,evalue,pvalue,coverage,percent_identity,len_template):
             out_dict['fold'] = add_to_freq_dict(out_dict['fold'], (i[4], i[5]))
             out_dict['superfamily'] = add_to_freq_dict(out_dict['superfamily'], (i[6], i[7]))
             out_dict['family'] = add_to_freq_dict(out_dict['family'], (i[8], i[9]))
-    con.close()
     return out_dict
 
 
@@ -249,12 +270,13 @@ def num_find_sig_for_one_file(sample_file, database_dir, header, unfound, found,
                     if index in sd_index:
                         sd_dict[sd_index[index]] = sd_dict[sd_index[index]] + [float(split_line[index])]
                     track_dict[header[index]] = track_dict[header[index]] + (float(split_line[index])*found_dict[gnuid]/tot_weight)
+    from statsmodels.stats.weightstats import DescrStatsW
     sd_out = {}
     for sd in sd_dict:
         if use_weight:
             sd_out[sd]=DescrStatsW(sd_dict[sd], weights=weight_list, ddof=1).std
         else:
-            sd_out[sd] = std(sd_dict[sd])
+            sd_out[sd] = np.std(sd_dict[sd])
     return sd_out,track_dict, out_dict,found, unfound
 
 def write_output(out_name, out_str):
@@ -319,6 +341,7 @@ def compare_frequency_to_background(len_out_dict_sub_dict, feature_name, sample_
         corrected_p (float): bonferroni corrected p value
         fc (float): logfold change of sample/background
     '''
+    from scipy.stats import fisher_exact
     sample_wo = proteins_found_in_sample - sample_sf_frequency
     if feature_name in background_dict:
         background_sf_frequency = background_dict[feature_name]
@@ -327,6 +350,21 @@ def compare_frequency_to_background(len_out_dict_sub_dict, feature_name, sample_
     background_wo = proteins_in_proteome - background_sf_frequency
     oddsratio,p_value = fisher_exact([[abs(sample_sf_frequency),abs(sample_wo)],[abs(background_sf_frequency),abs(background_wo)]], alternative='greater')
     corrected_p = 0.05/len_out_dict_sub_dict
+    fc = log_fold_change(feature_name, sample_sf_frequency, proteins_found_in_sample, background_sf_frequency, proteins_in_proteome)
+    return sample_sf_frequency, background_sf_frequency, p_value, corrected_p, fc
+
+def log_fold_change(feature_name, sample_sf_frequency, proteins_found_in_sample, background_sf_frequency, proteins_in_proteome):
+    '''
+    Log fold change of how often a feature appears in the sample compared to the background
+    Inputs:
+        feature_name (str): feature being compared between sample and background
+        sample_sf_frequency (int): number of times the feature appears in the experimental signature
+        proteins_found_in_sample (int): number of proteins found in the sample
+        background_sf_frequency (int): number of times the feature appears in the background signature
+        proteins_in_proteome (int): number of proteins found in the background
+    Outputs:
+        fc (float or str): logfold change of sample/background, or an error message
+    '''
     if proteins_found_in_sample != 0:
         sample_freq_percent = sample_sf_frequency/proteins_found_in_sample 
     else:
@@ -339,7 +377,7 @@ def compare_frequency_to_background(len_out_dict_sub_dict, feature_name, sample_
             fc = 'Divide by zero error: ' + feature_name + ' not in background'
         else:
             fc = 'Error'
-    return sample_sf_frequency, background_sf_frequency, p_value, corrected_p, fc
+    return fc
 
 
 def compare_quant_to_background(len_out_dict_sub_dict, feature_name, sample_sf_frequency, proteins_found_in_sample, background_dict, proteins_in_proteome):
@@ -357,6 +395,7 @@ def compare_quant_to_background(len_out_dict_sub_dict, feature_name, sample_sf_f
         p_value (float): from t-test between the sample and background
         corrected_p (float): bonferroni corrected p value
     '''
+    import scipy.stats
     if feature_name in background_dict:
         background_sf_frequency = background_dict[feature_name]
     else:
@@ -439,92 +478,1154 @@ def find_alpha_features_for_one(sample_file, header, use_weight):
             out_dict[head] = out_dict[head] + (float(vals[index])*sample_id_dict[gnuid]/tot_weight)
             if index in sd_index:
                     sd_dict[sd_index[index]] = sd_dict[sd_index[index]] + [float(vals[index])]
+    from statsmodels.stats.weightstats import DescrStatsW
     sd_out = {}
     for sd in sd_dict:
         if use_weight:
             sd_out[sd]=DescrStatsW(sd_dict[sd], weights=weight_list, ddof=1).std
         else:
-            sd_out[sd] = std(sd_dict[sd])
+            sd_out[sd] = np.std(sd_dict[sd])
     return sd_out, out_dict
 
-def run_for_all_files_in_folder(input_dir, folder_out, use_weight=False, background_folder_name='human_background'):
+
+# labels tested with fisher exact tests and labels tested with t-tests, in output order
+frequency_features = [label for label in all_headers if label.split(' ')[0] == 'Number' or label.split(' ')[0] == 'Y/n']
+average_features = [label for label in all_headers if label not in frequency_features and label != 'Crowd predictions' and label != 'Stretch' and label != 'NHTM Best from query.phdPred']
+substructure_types = ['domain', 'fold', 'superfamily', 'family']
+# iupred cutoff of the disorder and anchor features in the databases, and the file a background keeps the cutoff it was built at in
+built_disorder_cutoff = 0.5
+disorder_cutoff_file = 'disorder_cutoff.csv'
+background_files = {'domain': 'ipr.domain.csv', 'family': 'scop.family.csv', 'fold': 'scop.fold.csv', 'superfamily': 'scop.superfam.csv'}
+# feature groups a run can be limited to, and the structure types of the interproscan and scope groups
+feature_groups = ['human', 'alphafold', 'domain', 'scop']
+group_substructure_types = {'domain': ['domain'], 'scop': ['fold', 'superfamily', 'family']}
+frequency_columns = ['structure_id', 'structure', 'structure_type', 'counts_observed', 'background_counts', 'pvalue', 'bonforroni_cutoff', 'log_fold_change', 'fdr']
+average_columns = ['label', 'average_observed', 'observed_standard_deviation', 'background_average', 'background_standard_deviation', 'pvalue', 'bonforroni_cutoff', 'fdr']
+
+def parse_bool(value):
+    '''
+    Interprets a True or False argument that may have been given as text on the command line
+    Inputs:
+        value (bool or str): True, False or text such as 'True', 'false', '1' or '0'
+    Outputs:
+        (bool)
+    '''
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ('true', 't', 'yes', 'y', '1'):
+        return True
+    if text in ('false', 'f', 'no', 'n', '0', 'none', ''):
+        return False
+    raise ValueError('Could not interpret ' + repr(value) + ' as True or False')
+
+def parse_feature_groups(features):
+    '''
+    Reads a selection of feature groups
+    Inputs:
+        features (str or list): groups like 'human,domain' or ['alphafold'], None for all of feature_groups
+            human: the precounted human genome features (predictprotein and iupred), alphafold: the precounted alpha fold features,
+            domain: interproscan classes, scop: scope folds, superfamilies and families
+    Outputs:
+        (list) the selected groups, in feature_groups order
+    '''
+    if features is None:
+        return list(feature_groups)
+    if isinstance(features, str):
+        features = features.split(',')
+    features = [group.strip() for group in features if group.strip()]
+    unknown = [group for group in features if group not in feature_groups]
+    if unknown or not features:
+        raise ValueError('feature groups ' + ','.join(unknown) + ' are not valid, choose from ' + ','.join(feature_groups))
+    return [group for group in feature_groups if group in features]
+
+def selected_substructure_types(groups):
+    '''
+    The structure types of selected feature groups, in substructure_types order
+    '''
+    return [sub_dict for sub_dict in substructure_types if any(sub_dict in group_substructure_types.get(group, []) for group in groups)]
+
+def read_sample_file(sample_file, use_weight):
+    '''
+    Reads an input file of line separated gene or protien names with or without weights
+    Inputs:
+        sample_file (str): name of file to read
+        use_weight (bool): keep the weights in the file, otherwise every weight is 1
+    Outputs:
+        pairs (list): (gene or protien name, weight) tuples in file order
+    '''
+    pairs = []
+    with open(sample_file) as sample:
+        for line in sample:
+            split_line = line.rstrip('\r\n').split(',')
+            if use_weight and len(split_line) == 2:
+                weight = float(split_line[1])
+            else:
+                weight = 1.0
+            pairs.append((split_line[0], weight))
+    return pairs
+
+def gene_weight_pairs(genes):
+    '''
+    Converts the ways a gene list can be given to (name, weight) tuples
+    Inputs:
+        genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to weights
+    Outputs:
+        pairs (list): (gene or protien name, weight) tuples
+        has_weights (bool): True if weights were given
+    '''
+    if isinstance(genes, str):
+        return [(genes, 1.0)], False
+    if hasattr(genes, 'items'):
+        return [(str(gnuid), float(weight)) for gnuid, weight in genes.items()], True
+    pairs = []
+    has_weights = False
+    for elt in genes:
+        if isinstance(elt, (tuple, list)) and len(elt) == 2:
+            pairs.append((str(elt[0]), float(elt[1])))
+            has_weights = True
+        else:
+            pairs.append((str(elt), 1.0))
+    return pairs, has_weights
+
+def load_precounted_folder(database_dir, num_features):
+    '''
+    Loads every precounted feature file in a folder into one matrix
+    Inputs:
+        database_dir (str): folder with one <name>.txt file per gene or protien
+        num_features (int): number of feature values following the name in each file
+    Outputs:
+        ids (list): gene or protien names, the file names without .txt
+        values (numpy array): one row of feature values per name
+    '''
+    paths = sorted(glob.glob(database_dir + '*.txt'))
+    ids = []
+    values = np.zeros((len(paths), num_features))
+    for index in range(len(paths)):
+        with open(paths[index]) as fo:
+            split_line = fo.readline().rstrip('\r\n').split(',')
+        if len(split_line) - 1 != num_features:
+            raise ValueError(paths[index] + ' has ' + str(len(split_line) - 1) + ' values, expected ' + str(num_features))
+        ids.append(os.path.basename(paths[index])[:-len('.txt')])
+        values[index] = split_line[1:]
+    return ids, values
+
+def load_precounted(database_root, table, num_features):
+    '''
+    Loads a precounted table from the feature store update_databases.py writes, or from its folder of files when the store does not have it
+    Inputs:
+        database_root (str): folder with the structural features databases, ending in /
+        table (str): 'precounted_human_genome' or 'precounted_alpha_fold'
+        num_features (int): number of feature values following the name
+    Outputs:
+        ids (list): gene or protien names
+        values (numpy array): one row of feature values per name
+    '''
+    from feature_store import store_name, store_tables, load_feature_table
+    if table in store_tables(database_root + store_name):
+        return load_feature_table(database_root + store_name, table, num_features)
+    return load_precounted_folder(database_root + table + '/', num_features)
+
+def load_precounted_names(database_root, table):
+    '''
+    Names in a precounted table without reading their feature values, from the feature store or the file names of its folder
+    Inputs:
+        database_root (str): folder with the structural features databases, ending in /
+        table (str): 'precounted_human_genome' or 'precounted_alpha_fold'
+    Outputs:
+        ids (list): gene or protien names, in the order load_precounted gives them
+    '''
+    from feature_store import store_name, store_tables, load_feature_names
+    if table in store_tables(database_root + store_name):
+        return load_feature_names(database_root + store_name, table)
+    return [os.path.basename(path)[:-len('.txt')] for path in sorted(glob.glob(database_root + table + '/*.txt'))]
+
+def weighted_profile(values, weights, sd_columns, use_weight, tot_weight=None):
+    '''
+    Weighted averages of all features and standard deviations of the continous features for a set of proteins
+    Inputs:
+        values (numpy array): one row of feature values per protien
+        weights (numpy array): weight of each protien
+        sd_columns (list): column indices of the continous features
+        use_weight (bool): weigh the standard deviations by the weights
+        tot_weight (float): default the sum of weights, what the weights are divided by when averaging
+    Outputs:
+        averages (numpy array): weighted average of every column
+        sds (numpy array): standard deviation of every sd_columns column
+    '''
+    if len(weights) == 0:
+        return np.zeros(values.shape[1]), np.full(len(sd_columns), np.nan)
+    if tot_weight is None:
+        tot_weight = weights.sum()
+    averages = (weights/tot_weight) @ values
+    continous = values[:, sd_columns]
+    if use_weight:
+        from statsmodels.stats.weightstats import DescrStatsW
+        sds = np.atleast_1d(DescrStatsW(continous, weights=weights, ddof=1).std)
+    else:
+        sds = np.std(continous, axis=0)
+    return averages, sds
+
+def batch_profile(weight_matrix, values, sd_columns, tot_weights, weighted_rows, membership_matrix=None):
+    '''
+    weighted_profile for many sets of proteins at once
+    Inputs:
+        weight_matrix (scipy sparse matrix): one row per set, one column per row of values, the protien weight or 0 if it is not in the set
+        values (numpy array): one row of feature values per protien
+        sd_columns (list): column indices of the continous features
+        tot_weights (numpy array): what each set's weights are divided by when averaging, default the sum of its weights
+        weighted_rows (numpy array): True for the sets whose standard deviations are weighted
+        membership_matrix (scipy sparse matrix): same shape as weight_matrix, 1 where the protien is in the set, default where the weight is not 0, needed for proteins listed with a weight of 0
+    Outputs:
+        averages (numpy array): weighted averages, one row per set
+        sds (numpy array): standard deviations of the sd_columns columns, one row per set
+    '''
+    weight_sums = np.asarray(weight_matrix.sum(axis=1)).ravel()
+    if tot_weights is None:
+        tot_weights = weight_sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        averages = np.asarray(weight_matrix @ values)/tot_weights[:, None]
+    if membership_matrix is None:
+        membership_matrix = weight_matrix != 0
+    # only the rows used by some set are needed for the standard deviations
+    used = np.unique(membership_matrix.tocsr().indices)
+    weight_matrix = weight_matrix.tocsc()[:, used]
+    present = membership_matrix.tocsc()[:, used].astype(float)
+    counts = np.asarray(present.sum(axis=1)).ravel()
+    continous = values[np.ix_(used, sd_columns)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.asarray(present @ continous)/counts[:, None]
+        variance = np.asarray(present @ continous**2)/counts[:, None] - mean**2
+        if weighted_rows.any():
+            weighted_mean = np.asarray(weight_matrix @ continous)/weight_sums[:, None]
+            weighted_variance = (np.asarray(weight_matrix @ continous**2) - weight_sums[:, None]*weighted_mean**2)/(weight_sums[:, None] - 1)
+            variance = np.where(weighted_rows[:, None], weighted_variance, variance)
+    return averages, np.sqrt(np.maximum(variance, 0))
+
+def fisher_exact_greater(a, b, c, d):
+    '''
+    One sided (greater) fisher exact tests of many [[a, b], [c, d]] tables at once, matching scipy's fisher_exact on each table
+    Inputs:
+        a, b, c, d (numpy arrays): table cells, made positive and truncated to integers like fisher_exact does
+    Outputs:
+        p_values (numpy array): one p value per table
+    '''
+    from scipy.stats import hypergeom
+    a, b, c, d = [np.abs(np.asarray(cell, dtype=float)).astype(np.int64) for cell in (a, b, c, d)]
+    inverse = None
+    if a.ndim == 1 and len(a) > 1000:
+        # large batches repeat many tables, each distinct table is only tested once
+        tables, inverse = np.unique(np.stack([a, b, c, d], axis=1), axis=0, return_inverse=True)
+        a, b, c, d = tables.T
+    n1 = a + b
+    n2 = c + d
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_values = np.minimum(hypergeom.cdf(b, n1 + n2, n1, b + d), 1.0)
+    degenerate = (n1 == 0) | (n2 == 0) | (a + c == 0) | (b + d == 0)
+    p_values = np.where(degenerate, 1.0, p_values)
+    if inverse is not None:
+        return p_values[np.ravel(inverse)]
+    return p_values
+
+def t_test_sf(sample_average, sample_sd, proteins_found_in_sample, background_average, background_sd, proteins_in_proteome):
+    '''
+    The t-tests of compare_quant_to_background for many features at once
+    Inputs:
+        sample_average, sample_sd (numpy arrays): feature averages and standard deviations in the sample
+        proteins_found_in_sample (int): number of proteins found in the sample
+        background_average, background_sd (numpy arrays): feature averages and standard deviations in the background
+        proteins_in_proteome (int): number of proteins found in the background
+    Outputs:
+        p_values (numpy array): one p value per feature
+    '''
+    import scipy.stats
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_value = (background_average-sample_average)/np.sqrt((background_sd**2)/proteins_in_proteome + (sample_sd**2)/proteins_found_in_sample)
+    return scipy.stats.t.sf(np.abs(t_value), df=proteins_found_in_sample-2)
+
+def format_term_key(elt):
+    '''
+    Turns a (structure id, structure name) key into the 'id,name' text written in the frequency output
+    Inputs:
+        elt (tuple): scope or interproscan class id and description
+    Outputs:
+        key_temp (str): id and description separated by the only comma
+    '''
+    key_temp = str(elt)[1:-1].replace(',', '-')
+    key_temp = key_temp.replace('-', ',',1)
+    key_temp = key_temp.replace("'", '')
+    return key_temp
+
+def format_rows(rows):
+    '''
+    Turns output rows into csv text
+    Inputs:
+        rows (list): tuples of values
+    Outputs:
+        (str) one line per row
+    '''
+    return ''.join(','.join([str(value) for value in row]) + '\n' for row in rows)
+
+def background_disorder_cutoff(path_to_background):
+    '''
+    Iupred cutoff of the disorder and anchor features a background folder was built with, the cutoff of the databases for backgrounds without disorder_cutoff.csv
+    '''
+    if not os.path.exists(path_to_background + disorder_cutoff_file):
+        return built_disorder_cutoff
+    with open(path_to_background + disorder_cutoff_file) as fo:
+        return float(fo.readline())
+
+def load_background(path_to_background, features=None):
+    '''
+    Loads the files of a background folder
+    Inputs:
+        path_to_background (str): background folder, ending in /
+        features (str or list): default None for all, feature groups the files are read for, see parse_feature_groups
+    Outputs:
+        background (dict): number of proteins in the background, disorder cutoff it was built at, scope and interproscan class counts, feature frequencies and feature averages, empty for groups not read
+    '''
+    groups = parse_feature_groups(features)
+    with open(path_to_background+'number_proteins_found.csv') as fo:
+        for line in fo:
+            background_found = int(line)
+    background_dict = {}
+    read_types = selected_substructure_types(groups)
+    for sub_dict in background_files:
+        if sub_dict in read_types:
+            background_dict = make_background_dict(path_to_background, background_files[sub_dict], background_dict)
+    # the human genome and alpha fold features share the frequency and average files
+    read_features = 'human' in groups or 'alphafold' in groups
+    return {
+        'found': background_found,
+        'disorder_cutoff': background_disorder_cutoff(path_to_background),
+        'substructures': background_dict,
+        'frequency': make_background_dict(path_to_background, 'frequency_background.csv', {}) if read_features else {},
+        'average': make_average_background_dict(path_to_background, 'average_background.csv', {}) if read_features else {},
+    }
+
+def make_frames(average_rows, frequency_rows, extra_columns, proteins_found, average_extra_columns=[]):
+    '''
+    Turns output rows into DataFrames with the columns of the output files
+    Inputs:
+        average_rows (list): rows in average_columns order
+        frequency_rows (list): rows in frequency_columns order
+        extra_columns (list): names of any columns added after the usual ones
+        proteins_found (int): number of proteins found, kept in the attrs of both DataFrames
+        average_extra_columns (list): names of any columns added after those to the average rows only
+    Outputs:
+        average (pandas DataFrame)
+        frequency (pandas DataFrame)
+    '''
+    import pandas as pd
+    average = pd.DataFrame(average_rows, columns=average_columns + extra_columns + average_extra_columns)
+    frequency = pd.DataFrame(frequency_rows, columns=frequency_columns + extra_columns)
+    average.attrs['proteins_found'] = frequency.attrs['proteins_found'] = proteins_found
+    return average, frequency
+
+class SubstringSearch:
+    '''
+    Finds the rows of a text column that contain a query, ignoring case like sqlite's like operator
+    '''
+    def __init__(self, values):
+        self.starts = []
+        pieces = []
+        position = 0
+        for value in values:
+            text = '' if value is None else str(value).lower()
+            self.starts.append(position)
+            pieces.append(text)
+            position += len(text) + 1
+        self.text = '\x00'.join(pieces)
+
+    def row_at(self, position):
+        return bisect.bisect_right(self.starts, position) - 1
+
+    def first(self, query):
+        '''
+        Index of the first row containing query, None if there is none
+        '''
+        position = self.text.find(query.lower())
+        if position == -1:
+            return None
+        return self.row_at(position)
+
+    def all(self, query):
+        '''
+        Indices of every row containing query
+        '''
+        query = query.lower()
+        rows = []
+        position = self.text.find(query)
+        while position != -1:
+            row = self.row_at(position)
+            rows.append(row)
+            if row + 1 == len(self.starts):
+                break
+            position = self.text.find(query, self.starts[row + 1])
+        return rows
+
+class SubstructureIndex:
+    '''
+    In memory copy of the uniprot_info, domain and fold tables of the structure database
+    Lookups return the same rows as the like '%id%' queries in get_substructs_from_oneid without scanning the database for every protien
+    '''
+    def __init__(self, path_to_db, tables=('domain', 'fold')):
+        '''
+        Inputs:
+            path_to_db (str): path of structure_database.db
+            tables (tuple): default both, 'domain' and or 'fold', tables not loaded give no rows
+        '''
+        self.path_to_db = path_to_db
+        self.tables = tuple(tables)
+        con = sqlite3.connect(path_to_db)
+        cursor = con.cursor()
+        self.uniprot_rows, self.uniprot_search = self.load_table(cursor, 'uniprot_info', 'gname')
+        if 'domain' in self.tables:
+            self.domain_rows, self.domain_search = self.load_table(cursor, 'domain', 'uid')
+        if 'fold' in self.tables:
+            self.fold_rows, self.fold_search = self.load_table(cursor, 'fold', 'uid')
+        con.close()
+
+    @staticmethod
+    def load_table(cursor, table, column):
+        rows = cursor.execute('SELECT * from ' + table).fetchall()
+        column_index = [description[0] for description in cursor.description].index(column)
+        return rows, SubstringSearch([row[column_index] for row in rows])
+
+    def query_database(self, id):
+        '''
+        Runs the original sql queries, used for ids containing the like wildcards % or _
+        '''
+        con = sqlite3.connect(self.path_to_db)
+        cursor = con.cursor()
+        r_uid = cursor.execute('SELECT * from uniprot_info WHERE gname like ?', ('%' + id + '%',)).fetchall()
+        if r_uid != []:
+            uid = r_uid[0][0]
+        else:
+            uid = id
+        r_domain = cursor.execute("SELECT * from domain WHERE uid like ?", ('%' + uid + '%',)).fetchall() if 'domain' in self.tables else []
+        r_fold = cursor.execute("SELECT * from fold WHERE uid like ?", ('%' + uid + '%',)).fetchall() if 'fold' in self.tables else []
+        con.close()
+        return r_domain, r_fold
+
+    def rows_for(self, id):
+        '''
+        Gets the domain and fold table rows of a protien
+        Inputs:
+            id (str): gene or protien name
+        Outputs:
+            r_domain (list): rows of the domain table
+            r_fold (list): rows of the fold table
+        '''
+        if '%' in id or '_' in id:
+            return self.query_database(id)
+        row = self.uniprot_search.first(id)
+        if row is not None:
+            uid = self.uniprot_rows[row][0]
+        else:
+            uid = id
+        if '%' in uid or '_' in uid:
+            return self.query_database(id)
+        r_domain = [self.domain_rows[index] for index in self.domain_search.all(uid)] if 'domain' in self.tables else []
+        r_fold = [self.fold_rows[index] for index in self.fold_search.all(uid)] if 'fold' in self.tables else []
+        return r_domain, r_fold
+
+class StructuralFeatures:
+    '''
+    Loads the structural features databases and a background once so that many gene lists can be scored in memory
+    Example:
+        sf = StructuralFeatures('./databases/')
+        average, frequency = sf.score(['TP53', 'MDM2'])
+        average, frequency = sf.score(pd.Series({'TP53': 2.5, 'MDM2': 0.4}))
+    '''
+    # set by add_derived
+    derived = None
+
+    def __init__(self, database_root='./databases/', background='human_background', prob=50, evalue=1e-5, pvalue=1e-5, coverage=0.3, percent_identity=30, len_template=30, disorder_cutoff=None, features=None, derived=None):
+        '''
+        Inputs:
+            database_root (str): folder with the unzipped structural features databases, the precounted folders can be replaced by a structural_features.sfb bundle or the precounted_features.db feature store
+            background (str): default 'human_background', name of the background folder in database_root
+            prob, evalue, pvalue, coverage, percent_identity, len_template: scope class cutoffs, see check_if_thresholds_met
+            disorder_cutoff (float): default None, the 0.5 the databases were built with, otherwise the disorder and anchor features are recounted for this cutoff from the iupred residue store (see disorder_store.py), backgrounds have to be built at the same cutoff
+            features (str or list): default None for all, feature groups to load and test, like 'human,domain', see parse_feature_groups
+            derived (str, dict or list): default None, derived per protien features tested like the built in ones, a file of 'name = expression' lines or names mapped to expressions, see derived_features.py
+        '''
+        self.database_root = os.path.join(database_root, '')
+        self.thresholds = (prob, evalue, pvalue, coverage, percent_identity, len_template)
+        self.select_features(features)
+        load_human = 'human' in self.feature_groups
+        load_alpha = 'alphafold' in self.feature_groups
+        from feature_store import store_name, store_tables
+        if not os.path.isdir(self.database_root + 'precounted_human_genome/') and 'precounted_human_genome' not in store_tables(self.database_root + store_name) and os.path.exists(self.database_root + 'structural_features.sfb'):
+            # single file bundle from database_bundle.py instead of the unzipped folders
+            from database_bundle import DatabaseBundle
+            bundle = DatabaseBundle(self.database_root + 'structural_features.sfb')
+            if load_human:
+                self.human_ids, self.human_values = bundle.load('precounted_human_genome')
+            else:
+                self.human_ids = list(bundle.name_rows('precounted_human_genome')[0])
+            if load_alpha:
+                self.alpha_ids, self.alpha_values = bundle.load('precounted_alpha_fold')
+        else:
+            if load_human:
+                self.human_ids, self.human_values = load_precounted(self.database_root, 'precounted_human_genome', len(header) - 1)
+            else:
+                self.human_ids = load_precounted_names(self.database_root, 'precounted_human_genome')
+            if load_alpha:
+                self.alpha_ids, self.alpha_values = load_precounted(self.database_root, 'precounted_alpha_fold', len(headeralpha))
+        if not load_human:
+            # the names still decide which proteins are found, the values of a group that is not tested stay zero and are never read from disk
+            self.human_values = np.zeros((len(self.human_ids), len(header) - 1))
+        if not load_alpha:
+            self.alpha_ids, self.alpha_values = [], np.zeros((0, len(headeralpha)))
+        self.disorder_cutoff = built_disorder_cutoff if disorder_cutoff is None else float(disorder_cutoff)
+        if disorder_cutoff is not None and load_human:
+            from disorder_store import open_iupred_store, apply_disorder_cutoff
+            self.human_values = apply_disorder_cutoff(self.human_ids, self.human_values, open_iupred_store(self.database_root), float(disorder_cutoff), header)
+        self.human_rows = {gnuid: index for index, gnuid in enumerate(self.human_ids)}
+        self.alpha_rows = {gnuid: index for index, gnuid in enumerate(self.alpha_ids)}
+        self.human_sd_columns = [header.index(label) - 1 for label in average_features if label in header]
+        self.alpha_sd_columns = [headeralpha.index(label) for label in average_features if label in headeralpha]
+        if derived is not None:
+            self.add_derived(derived)
+        self.substructure_index = SubstructureIndex(self.database_root + 'structure_database.db', self.substructure_tables) if self.substructure_tables else None
+        self.substructure_cache = {}
+        self.backgrounds = {}
+        self.background = background
+        self.permutation_nulls = {}
+
+    def select_features(self, features):
+        '''
+        Sets the feature groups that are tested, with the count and continous feature labels and structure types they cover
+        Inputs:
+            features (str or list): None for all, see parse_feature_groups
+        '''
+        self.feature_groups = parse_feature_groups(features)
+        labels = (header[1:] if 'human' in self.feature_groups else []) + (headeralpha if 'alphafold' in self.feature_groups else [])
+        self.frequency_labels = [label for label in frequency_features if label in labels]
+        self.average_labels = [label for label in average_features if label in labels]
+        self.substructure_types = selected_substructure_types(self.feature_groups)
+        # interproscan classes come from the domain table, scope classes from the fold table
+        self.substructure_tables = tuple(table for table, group in (('domain', 'domain'), ('fold', 'scop')) if group in self.feature_groups)
+
+    def add_derived(self, derived, derived_values=None):
+        '''
+        Computes derived features for every protien once and adds the ones of the selected feature groups to the tested features
+        Inputs:
+            derived (str, dict, list or DerivedFeatures): see derived_features.py
+            derived_values (tuple): default None, (human, alpha) derived feature matrices already computed, like published ones, instead of evaluating them
+        '''
+        from derived_features import DerivedFeatures
+        self.derived = derived if isinstance(derived, DerivedFeatures) else DerivedFeatures(derived)
+        if derived_values is None:
+            derived_values = (self.derived.evaluate('human', self.human_values), self.derived.evaluate('alpha', self.alpha_values))
+        self.human_derived, self.alpha_derived = derived_values
+        tested = [label for label in self.derived.labels if ('human' if self.derived.tables[label] == 'human' else 'alphafold') in self.feature_groups]
+        self.frequency_labels = self.frequency_labels + [label for label in self.derived.frequency_labels if label in tested]
+        self.average_labels = self.average_labels + [label for label in self.derived.average_labels if label in tested]
+        self.human_derived_sd_columns = [index for index, label in enumerate(self.derived.table_labels('human')) if label in self.derived.average_labels]
+        self.alpha_derived_sd_columns = [index for index, label in enumerate(self.derived.table_labels('alpha')) if label in self.derived.average_labels]
+        # random set nulls made before have no derived columns
+        self.permutation_nulls = {}
+
+    def load_background(self, background=None):
+        '''
+        Loads a background folder of database_root, once, only the files of the selected feature groups
+        Inputs:
+            background (str): name of the background folder, default the one given when loading
+        Outputs:
+            (dict) see load_background
+        '''
+        background = background or self.background
+        if background not in self.backgrounds:
+            loaded = load_background(self.database_root + background + '/', self.feature_groups)
+            if 'human' in self.feature_groups and loaded['disorder_cutoff'] != self.disorder_cutoff:
+                # the disorder and anchor features of the sample and background would be counted differently
+                raise ValueError(background + ' was built with a disorder cutoff of ' + str(loaded['disorder_cutoff']) + ', not ' + str(self.disorder_cutoff) + ', build a background at this cutoff with make_backgrounds_from_ids on databases loaded with disorder_cutoff=' + str(self.disorder_cutoff))
+            self.backgrounds[background] = loaded
+            if self.derived is not None:
+                from derived_features import add_derived_background
+                add_derived_background(self.database_root + background + '/', self.backgrounds[background], self.derived)
+        return self.backgrounds[background]
+
+    def substructures(self, gnuid):
+        '''
+        Scope and interproscan class counts of one protien, cached, empty for structure types not selected
+        Inputs:
+            gnuid (str): gene or protien name
+        Outputs:
+            (dict) class counts by structure type
+        '''
+        if gnuid not in self.substructure_cache:
+            out_dict = {sub_dict: {} for sub_dict in substructure_types}
+            if self.substructure_tables:
+                r_domain, r_fold = self.substructure_index.rows_for(gnuid)
+                out_dict = add_substructs(r_domain, r_fold, *self.thresholds, out_dict)
+            self.substructure_cache[gnuid] = out_dict
+        return self.substructure_cache[gnuid]
+
+    def substructure_matrices(self, ids):
+        '''
+        Scope and interproscan class counts of many proteins as sparse matrices
+        Inputs:
+            ids (list): gene or protien names found in the database
+        Outputs:
+            matrices (dict): structure type mapped to (matrix, keys), matrix a scipy sparse matrix with one row per id and one column per (class id, description) in keys
+        '''
+        from scipy.sparse import csr_matrix
+        matrices = {}
+        for sub_dict in substructure_types:
+            columns = {}
+            row_index = []
+            column_index = []
+            counts = []
+            for index in range(len(ids)):
+                protein_dict = self.substructures(ids[index])[sub_dict]
+                for key in protein_dict:
+                    row_index.append(index)
+                    column_index.append(columns.setdefault(key, len(columns)))
+                    counts.append(protein_dict[key])
+            matrix = csr_matrix((np.array(counts, dtype=np.int64), (row_index, column_index)), shape=(len(ids), len(columns)))
+            matrices[sub_dict] = (matrix, list(columns))
+        return matrices
+
+    def find_proteins(self, genes, use_weight=None):
+        '''
+        Looks up the genes or protiens of a list in the precounted human genome and alpha fold features
+        Inputs:
+            genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to expression values
+            use_weight (bool): keep the expression values as weights, by default True when weights are given
+        Outputs:
+            human_weights (dict): weight of each name found in the precounted human genome, repeated names are added up
+            tot_weight (float): sum of the weights of the first time each name was found
+            alpha_weights (dict): weight of each name found in the precounted alpha fold features, repeated names are averaged
+            unfound (list): names not found in the precounted human genome
+            use_weight (bool): if the weights were kept
+        '''
+        pairs, has_weights = gene_weight_pairs(genes)
+        use_weight = has_weights if use_weight is None else parse_bool(use_weight)
+        human_weights = {}
+        alpha_weights = {}
+        unfound = []
+        tot_weight = 0
+        for gnuid, weight in pairs:
+            if not use_weight:
+                weight = 1.0
+            if gnuid in self.human_rows:
+                # like check_if_found, repeated names add to the protien weight but not to the total weight
+                if gnuid not in human_weights:
+                    tot_weight += weight
+                human_weights[gnuid] = human_weights.get(gnuid, 0) + weight
+            else:
+                unfound.append(gnuid)
+            if gnuid in self.alpha_rows:
+                alpha_weights.setdefault(gnuid, []).append(weight)
+        alpha_weights = {gnuid: sum(alpha_weights[gnuid])/len(alpha_weights[gnuid]) for gnuid in alpha_weights}
+        return human_weights, tot_weight, alpha_weights, unfound, use_weight
+
+    def aggregate(self, genes, use_weight=None):
+        '''
+        Averages the structural features and counts the scope and interproscan classes of one gene list
+        Inputs:
+            genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to expression values
+            use_weight (bool): weigh the averages by the expression values, by default True when weights are given
+        Outputs:
+            summary (dict): proteins found and not found, their weights, feature averages and standard deviations and class counts
+        '''
+        human_weights, tot_weight, alpha_weights, unfound, use_weight = self.find_proteins(genes, use_weight)
+        human_average, human_sd = weighted_profile(self.human_values[[self.human_rows[gnuid] for gnuid in human_weights]], np.array(list(human_weights.values())), self.human_sd_columns, use_weight, tot_weight)
+        alpha_average, alpha_sd = weighted_profile(self.alpha_values[[self.alpha_rows[gnuid] for gnuid in alpha_weights]], np.array(list(alpha_weights.values())), self.alpha_sd_columns, use_weight)
+        average = dict(zip(header[1:], human_average))
+        average.update(zip(headeralpha, alpha_average))
+        sd = dict(zip([header[index + 1] for index in self.human_sd_columns], human_sd))
+        sd.update(zip([headeralpha[index] for index in self.alpha_sd_columns], alpha_sd))
+        if self.derived is not None:
+            for table, values, weights, sd_columns, total in (('human', self.human_derived, human_weights, self.human_derived_sd_columns, tot_weight), ('alpha', self.alpha_derived, alpha_weights, self.alpha_derived_sd_columns, None)):
+                rows = self.human_rows if table == 'human' else self.alpha_rows
+                labels = self.derived.table_labels(table)
+                derived_average, derived_sd = weighted_profile(values[[rows[gnuid] for gnuid in weights]], np.array(list(weights.values())), sd_columns, use_weight, total)
+                average.update(zip(labels, derived_average))
+                sd.update(zip([labels[index] for index in sd_columns], derived_sd))
+
+        out_dict = {sub_dict: {} for sub_dict in substructure_types}
+        for gnuid in human_weights if self.substructure_types else []:
+            protein_dict = self.substructures(gnuid)
+            for sub_dict in self.substructure_types:
+                for key in protein_dict[sub_dict]:
+                    out_dict[sub_dict][key] = out_dict[sub_dict].get(key, 0) + protein_dict[sub_dict][key]
+        return {
+            'found': len(human_weights),
+            'unfound': unfound,
+            'weights': human_weights,
+            'tot_weight': tot_weight,
+            'alpha_weights': alpha_weights,
+            'average': average,
+            'sd': sd,
+            'substructures': out_dict,
+        }
+
+    def aggregate_many(self, gene_lists, use_weight=None):
+        '''
+        Aggregates many gene lists in one pass, as sparse list x protien matrix products against the feature matrices
+        Inputs:
+            gene_lists (list): gene lists, each in any form accepted by aggregate
+            use_weight (bool): weigh the averages by the expression values, by default True for lists given with weights
+        Outputs:
+            batch (dict): 'found' (array) and 'unfound' (list) per gene list, 'average' (gene lists x all_headers array), 'sd' (gene lists x average_features array), 'substructures' (structure type mapped to (gene lists x classes sparse count matrix, keys)), 'human_weights' and 'alpha_weights' (gene lists x rows of human_values or alpha_values sparse weight matrices), 'human_members' and 'alpha_members' (the same with 1 for each listed protien), 'tot_weight' and 'use_weight' (arrays, what the human averages are divided by and if the weights were kept)
+        '''
+        from scipy.sparse import csr_matrix
+        # matrix columns are rows of the loaded feature matrices so no rows are copied
+        human_columns = {}
+        alpha_columns = {}
+        human_entries = ([], [], [])
+        alpha_entries = ([], [], [])
+        tot_weights = []
+        weighted_rows = []
+        unfound_lists = []
+        for list_index in range(len(gene_lists)):
+            human_weights, tot_weight, alpha_weights, unfound, weighted = self.find_proteins(gene_lists[list_index], use_weight)
+            for weights, columns, entries, rows in ((human_weights, human_columns, human_entries, self.human_rows), (alpha_weights, alpha_columns, alpha_entries, self.alpha_rows)):
+                for gnuid in weights:
+                    entries[0].append(list_index)
+                    entries[1].append(columns.setdefault(gnuid, rows[gnuid]))
+                    entries[2].append(weights[gnuid])
+            tot_weights.append(tot_weight)
+            weighted_rows.append(weighted)
+            unfound_lists.append(unfound)
+        human_ids = list(human_columns)
+        human_matrix = csr_matrix((human_entries[2], (human_entries[0], human_entries[1])), shape=(len(gene_lists), len(self.human_ids)))
+        alpha_matrix = csr_matrix((alpha_entries[2], (alpha_entries[0], alpha_entries[1])), shape=(len(gene_lists), len(self.alpha_ids)))
+        # which proteins each list has, whatever their weights, for found, class counts and unweighted standard deviations
+        human_membership = csr_matrix((np.ones(len(human_entries[0])), (human_entries[0], human_entries[1])), shape=human_matrix.shape)
+        alpha_membership = csr_matrix((np.ones(len(alpha_entries[0])), (alpha_entries[0], alpha_entries[1])), shape=alpha_matrix.shape)
+        weighted_rows = np.array(weighted_rows, dtype=bool)
+        human_average, human_sd = batch_profile(human_matrix, self.human_values, self.human_sd_columns, np.array(tot_weights, dtype=float), weighted_rows, human_membership)
+        alpha_average, alpha_sd = batch_profile(alpha_matrix, self.alpha_values, self.alpha_sd_columns, None, weighted_rows, alpha_membership)
+        alpha_average[np.asarray(alpha_membership.getnnz(axis=1)) == 0] = 0
+
+        present = human_membership.astype(np.int64)
+        union_present = present[:, [human_columns[gnuid] for gnuid in human_ids]]
+        substructures = {}
+        matrices = self.substructure_matrices(human_ids)
+        for sub_dict in substructure_types:
+            matrix, keys = matrices[sub_dict]
+            substructures[sub_dict] = ((union_present @ matrix).tocsr(), keys)
+        sd_order = [header[index + 1] for index in self.human_sd_columns] + [headeralpha[index] for index in self.alpha_sd_columns]
+        sd_columns = [sd_order.index(label) for label in average_features]
+        batch = {
+            'found': np.asarray(present.sum(axis=1)).ravel(),
+            'unfound': unfound_lists,
+            'average': np.hstack([human_average, alpha_average]),
+            'sd': np.hstack([human_sd, alpha_sd])[:, sd_columns],
+            'substructures': substructures,
+            'human_weights': human_matrix,
+            'alpha_weights': alpha_matrix,
+            'human_members': human_membership,
+            'alpha_members': alpha_membership,
+            'tot_weight': np.array(tot_weights, dtype=float),
+            'use_weight': weighted_rows,
+        }
+        if self.derived is not None:
+            # derived features in derived_labels order, standard deviations only of the continous ones
+            human_average, human_sd = batch_profile(human_matrix, self.human_derived, self.human_derived_sd_columns, np.array(tot_weights, dtype=float), weighted_rows, human_membership)
+            alpha_average, alpha_sd = batch_profile(alpha_matrix, self.alpha_derived, self.alpha_derived_sd_columns, None, weighted_rows, alpha_membership)
+            alpha_average[np.asarray(alpha_membership.getnnz(axis=1)) == 0] = 0
+            batch['derived_labels'] = self.derived.table_labels('human') + self.derived.table_labels('alpha')
+            batch['derived_sd_labels'] = [self.derived.table_labels('human')[index] for index in self.human_derived_sd_columns] + [self.derived.table_labels('alpha')[index] for index in self.alpha_derived_sd_columns]
+            batch['derived_average'] = np.hstack([human_average, alpha_average])
+            batch['derived_sd'] = np.hstack([human_sd, alpha_sd])
+        return batch
+
+    def permutation_null(self, universe=None):
+        '''
+        Loads the matrices random protien sets are drawn from for empirical p values, once per universe
+        Inputs:
+            universe (list): gene or protien names to draw from, default every protien in the precounted human genome
+        Outputs:
+            (PermutationNull) see permutation_test.py
+        '''
+        from permutation_test import PermutationNull
+        key = None if universe is None else tuple(universe)
+        if key not in self.permutation_nulls:
+            self.permutation_nulls[key] = PermutationNull(self, universe)
+        return self.permutation_nulls[key]
+
+    def test_inputs(self, summary, background=None):
+        '''
+        The counts and averages compare tests one aggregated gene list against a background
+        Inputs:
+            summary (dict): output of aggregate
+            background (str or dict): name of the background folder, default the one given when loading, or a background dict like background_from_summary makes
+        Outputs:
+            inputs (dict): proteins found in the sample and background, the tested feature labels, feature counts, averages and standard deviations of both, and per structure type with classes the (structure type, class keys, counts, background counts)
+        '''
+        if not isinstance(background, dict):
+            background = self.load_background(background)
+        found = summary['found']
+        if found == 0:
+            raise ValueError('None of the genes or protiens were found in the structural features database')
+        background_averages = [background['average'].get(label, (0,0)) for label in self.average_labels]
+        terms = []
+        for sub_dict in self.substructure_types:
+            sub_counts = summary['substructures'][sub_dict]
+            keys = [elt for elt in sub_counts if elt[0] != 'NULL']
+            if len(keys) == 0:
+                continue
+            terms.append((sub_dict, keys, np.array([sub_counts[elt] for elt in keys]), [background['substructures'].get(elt[0], 0) for elt in keys]))
+        return {
+            'found': found,
+            'background_found': background['found'],
+            'frequency_labels': self.frequency_labels,
+            'average_labels': self.average_labels,
+            'counts': np.array([summary['average'][label] for label in self.frequency_labels], dtype=float),
+            'background_counts': [background['frequency'].get(label, 0) for label in self.frequency_labels],
+            'averages': np.array([summary['average'][label] for label in self.average_labels], dtype=float),
+            'sds': np.array([summary['sd'][label] for label in self.average_labels], dtype=float),
+            'background_averages': background_averages,
+            'terms': terms,
+            'substructures': summary['substructures'],
+        }
+
+    @staticmethod
+    def fisher_tables(inputs):
+        '''
+        The [[a, b], [c, d]] tables of the count features and then each structure type's classes, as four arrays
+        '''
+        counts = [inputs['counts']] + [term[2] for term in inputs['terms']]
+        background_counts = [np.array(inputs['background_counts'], dtype=float)] + [np.array(term[3], dtype=float) for term in inputs['terms']]
+        a = np.concatenate(counts)
+        c = np.concatenate(background_counts)
+        return a, inputs['found'] - a, c, inputs['background_found'] - c
+
+    @staticmethod
+    def t_test_arrays(inputs):
+        '''
+        The t_test_sf arguments of the continous features
+        '''
+        background_averages = inputs['background_averages']
+        return inputs['averages'], inputs['sds'], inputs['found'], np.array([value[0] for value in background_averages]), np.array([value[1] for value in background_averages]), inputs['background_found']
+
+    def rows_from_pvalues(self, inputs, fisher_p, t_p, empirical=None):
+        '''
+        Builds the output rows of one gene list from its test p values
+        Inputs:
+            inputs (dict): output of test_inputs
+            fisher_p (numpy array): p values of the fisher_tables tables, in order
+            t_p (numpy array): p values of the continous features
+            empirical (dict): empirical p values from PermutationNull.pvalues, added as a last empirical_pvalue value to every row when given
+        Outputs:
+            average_rows (list): one tuple per continous feature, in average_columns order
+            frequency_rows (list): one tuple per count feature and per scope or interproscan class, in frequency_columns order
+        '''
+        from statsmodels.stats.multitest import fdrcorrection
+        found = inputs['found']
+        background_found = inputs['background_found']
+
+        frequency_labels = inputs['frequency_labels']
+        average_labels = inputs['average_labels']
+        counts = inputs['counts']
+        background_counts = inputs['background_counts']
+        p_values = fisher_p[:len(frequency_labels)]
+        rejected, fdr_list = fdrcorrection(p_values)
+        # bonferroni over the features tested, all of them unless feature groups were left out
+        corrected_p = 0.05/max(len(frequency_labels), 1)
+        frequency_rows = []
+        for index in range(len(frequency_labels)):
+            label = frequency_labels[index]
+            fc = log_fold_change(label, counts[index], found, background_counts[index], background_found)
+            frequency_rows.append(('N/A', label, 'N/A', counts[index], background_counts[index], p_values[index], corrected_p, fc, fdr_list[index]))
+            if empirical is not None:
+                frequency_rows[-1] = frequency_rows[-1] + (empirical['frequency'][label],)
+
+        averages = inputs['averages']
+        sds = inputs['sds']
+        background_averages = inputs['background_averages']
+        rejected, fdr_list = fdrcorrection(t_p)
+        corrected_p = 0.05/max(len(average_labels), 1)
+        average_rows = []
+        for index in range(len(average_labels)):
+            average_rows.append((average_labels[index], averages[index], sds[index], background_averages[index][0], background_averages[index][1], t_p[index], corrected_p, fdr_list[index]))
+            if empirical is not None:
+                average_rows[-1] = average_rows[-1] + (empirical['average'][average_labels[index]],)
+
+        position = len(frequency_labels)
+        for sub_dict, keys, counts, background_counts in inputs['terms']:
+            sub_counts = inputs['substructures'][sub_dict]
+            p_values = fisher_p[position:position + len(keys)]
+            position += len(keys)
+            rejected, fdr_list = fdrcorrection(p_values)
+            corrected_p = 0.05/len(sub_counts)
+            for index in range(len(keys)):
+                structure_id, structure = format_term_key(keys[index]).split(',', 1)
+                fc = log_fold_change(keys[index][0], sub_counts[keys[index]], found, background_counts[index], background_found)
+                frequency_rows.append((structure_id, structure, sub_dict, sub_counts[keys[index]], background_counts[index], p_values[index], corrected_p, fc, fdr_list[index]))
+                if empirical is not None:
+                    frequency_rows[-1] = frequency_rows[-1] + (empirical['substructures'][sub_dict][keys[index]],)
+        return average_rows, frequency_rows
+
+    def compare(self, summary, background=None, empirical=None):
+        '''
+        Statistical tests of an aggregated gene list against a background
+        Inputs:
+            summary (dict): output of aggregate
+            background (str or dict): name of the background folder, default the one given when loading, or a background dict like background_from_summary makes
+            empirical (dict): empirical p values from PermutationNull.pvalues, added as a last empirical_pvalue value to every row when given
+        Outputs:
+            average_rows (list): one tuple per continous feature, in average_columns order
+            frequency_rows (list): one tuple per count feature and per scope or interproscan class, in frequency_columns order
+        '''
+        inputs = self.test_inputs(summary, background)
+        return self.rows_from_pvalues(inputs, fisher_exact_greater(*self.fisher_tables(inputs)), t_test_sf(*self.t_test_arrays(inputs)), empirical)
+
+    def compare_many(self, batch, background=None):
+        '''
+        compare for every gene list of an aggregate_many batch, with the fisher and t-tests of all lists run together
+        Inputs:
+            batch (dict): output of aggregate_many
+            background (str or dict): name of the background folder, default the one given when loading, or a background dict
+        Outputs:
+            results (list): (average_rows, frequency_rows) per gene list, or the exception raised for gene lists that could not be compared (like when no protien was found)
+        '''
+        if not isinstance(background, dict):
+            background = self.load_background(background)
+        all_inputs = []
+        for row in range(len(batch['found'])):
+            try:
+                all_inputs.append(self.test_inputs(self.summary_from_batch(batch, row), background))
+            except Exception as error:
+                all_inputs.append(error)
+        compared = [inputs for inputs in all_inputs if not isinstance(inputs, Exception)]
+        if len(compared) == 0:
+            return all_inputs
+        tables = [self.fisher_tables(inputs) for inputs in compared]
+        fisher_p = fisher_exact_greater(*[np.concatenate([table[cell] for table in tables]) for cell in range(4)])
+        t_arrays = [self.t_test_arrays(inputs) for inputs in compared]
+        t_p = t_test_sf(*[np.concatenate([np.broadcast_to(arrays[argument], len(self.average_labels)) for arrays in t_arrays]) for argument in range(6)])
+        results = []
+        fisher_position = 0
+        t_position = 0
+        for inputs in all_inputs:
+            if isinstance(inputs, Exception):
+                results.append(inputs)
+                continue
+            size = len(inputs['frequency_labels']) + sum(len(term[1]) for term in inputs['terms'])
+            results.append(self.rows_from_pvalues(inputs, fisher_p[fisher_position:fisher_position + size], t_p[t_position:t_position + len(inputs['average_labels'])]))
+            fisher_position += size
+            t_position += len(inputs['average_labels'])
+        return results
+
+    def summary_from_batch(self, batch, row):
+        '''
+        Turns one gene list of an aggregate_many batch into the summary dict aggregate makes
+        Inputs:
+            batch (dict): output of aggregate_many
+            row (int): index of the gene list in the batch
+        Outputs:
+            summary (dict): found and unfound proteins, feature averages and standard deviations and class counts
+        '''
+        out_dict = {}
+        for sub_dict in substructure_types:
+            matrix, keys = batch['substructures'][sub_dict]
+            matrix = matrix.tocsr()
+            matrix.sort_indices()
+            start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+            out_dict[sub_dict] = {keys[column]: int(count) for column, count in zip(matrix.indices[start:stop], matrix.data[start:stop]) if count != 0}
+        summary = {
+            'found': int(batch['found'][row]),
+            'unfound': batch['unfound'][row],
+            'average': dict(zip(all_headers, batch['average'][row])),
+            'sd': dict(zip(average_features, batch['sd'][row])),
+            'substructures': out_dict,
+        }
+        if 'derived_labels' in batch:
+            summary['average'].update(zip(batch['derived_labels'], batch['derived_average'][row]))
+            summary['sd'].update(zip(batch['derived_sd_labels'], batch['derived_sd'][row]))
+        return summary
+
+    def background_from_summary(self, summary):
+        '''
+        Uses an aggregated gene list as a background, the same as running make_background.py on its outputs
+        Inputs:
+            summary (dict): output of aggregate or summary_from_batch
+        Outputs:
+            background (dict): see load_background
+        '''
+        substructures = {}
+        for sub_dict in background_files:
+            for elt in summary['substructures'][sub_dict]:
+                if elt[0] != 'NULL':
+                    substructures[elt[0]] = substructures.get(elt[0], 0) + summary['substructures'][sub_dict][elt]
+        derived_frequency = self.derived.frequency_labels if self.derived is not None else []
+        derived_average = self.derived.average_labels if self.derived is not None else []
+        return {
+            'found': summary['found'],
+            'substructures': substructures,
+            'frequency': {label: summary['average'][label] for label in frequency_features + derived_frequency},
+            'average': {label: (summary['average'][label], summary['sd'][label]) for label in average_features + derived_average},
+        }
+
+    def compare_groups(self, genes, reference_genes, use_weight=None):
+        '''
+        Compares two gene lists directly, for example up against down regulated genes, with the same tests as against a background
+        Both lists are aggregated together in one pass and reference_genes takes the place of the background
+        Inputs:
+            genes (list, dict or pandas Series): gene list tested for enrichment, in any form accepted by aggregate
+            reference_genes (list, dict or pandas Series): gene list it is compared to
+            use_weight (bool): weigh the averages by the expression values, by default True for lists given with weights
+        Outputs:
+            average (pandas DataFrame): same columns as the average_ output files, background_ columns describe reference_genes
+            frequency (pandas DataFrame): same columns as the frequency_ output files, background_ columns describe reference_genes
+        '''
+        average_rows, frequency_rows, found = self.compare_groups_rows(genes, reference_genes, use_weight)
+        return make_frames(average_rows, frequency_rows, [], found)
+
+    def compare_groups_rows(self, genes, reference_genes, use_weight=None):
+        '''
+        compare_groups returning output rows instead of DataFrames
+        Outputs:
+            average_rows (list): one tuple per continous feature, in average_columns order
+            frequency_rows (list): one tuple per count feature and per scope or interproscan class, in frequency_columns order
+            found (int): number of proteins of genes found
+        '''
+        batch = self.aggregate_many([genes, reference_genes], use_weight)
+        summary = self.summary_from_batch(batch, 0)
+        reference = self.background_from_summary(self.summary_from_batch(batch, 1))
+        if reference['found'] == 0:
+            raise ValueError('None of the reference genes or protiens were found in the structural features database')
+        average_rows, frequency_rows = self.compare(summary, reference)
+        return average_rows, frequency_rows, summary['found']
+
+    def score(self, genes, use_weight=None, background=None, permutations=0, universe=None, processes=1, seed=None, bootstrap=0, confidence=0.95):
+        '''
+        Generates structural features for one gene list
+        Inputs:
+            genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to expression values
+            use_weight (bool): weigh the averages by the expression values, by default True when weights are given
+            background (str): name of the background folder, default the one given when loading
+            permutations (int): default 0, number of random protien sets of the same size used for an empirical_pvalue column
+            universe (list): gene or protien names the random sets are drawn from, default the whole precounted human genome
+            processes (int): default 1, number of processes the random sets are spread over
+            seed (int): seed for reproducible random sets and resamples
+            bootstrap (int): default 0, number of resamples of the gene list for bootstrap_ci_low and bootstrap_ci_high columns of the averages, see bootstrap_ci.py
+            confidence (float): default 0.95, confidence level of the bootstrap intervals
+        Outputs:
+            average (pandas DataFrame): same columns as the average_ output files
+            frequency (pandas DataFrame): same columns as the frequency_ output files
+        '''
+        summary = self.aggregate(genes, use_weight)
+        empirical = None
+        if permutations:
+            empirical = self.permutation_null(universe).pvalues(summary, permutations, processes, seed)
+        average_rows, frequency_rows = self.compare(summary, background, empirical)
+        extra_columns = ['empirical_pvalue'] if empirical is not None else []
+        average_extra_columns = []
+        if bootstrap:
+            from bootstrap_ci import bootstrap_intervals, add_intervals, interval_columns
+            average_rows = add_intervals(average_rows, bootstrap_intervals(self, summary, bootstrap, confidence, seed))
+            average_extra_columns = interval_columns
+        return make_frames(average_rows, frequency_rows, extra_columns, summary['found'], average_extra_columns)
+
+def run_for_all_files_in_folder(input_dir, folder_out, use_weight=False, background_folder_name='human_background', database_root='./databases/', permutations=0, processes=1, shard=None, features=None, bootstrap=0, derived=None):
     '''
     Generates structural features for all files in a directory
+    With a shard like '2/8' only the files of that shard are run, into folder_out/shard_2_of_8/ with a manifest.json, and python shards.py folder_out combines the shards once all are done
+    With features like 'human,domain' only those feature groups are loaded and tested, the output files then only have their rows
     Inputs:
         input_dir (str): directory containing all input files
         folder_out (str): directory containing all output files
-        use_weight (bool): default False, weigh structural feature output by corresponding input expression levels
+        use_weight (bool or str): default False, weigh structural feature output by corresponding input expression levels
         background_folder_name (str): default 'human_backgrounds', file name of background to use
+        database_root (str): default './databases/', folder with the unzipped structural features databases
+        permutations (int): default 0, number of random protien sets per sample for an empirical_pvalue column
+        processes (int): default 1, number of processes the random protien sets are spread over
+        shard (str): default None, 'i/N' to run shard i of N (from 1 to N), input files are split by a hash of their name so every machine agrees on the split
+        features (str): default None for all, comma separated feature groups from human (predictprotein and iupred), alphafold, domain (interproscan) and scop
+        bootstrap (int): default 0, number of resamples of each sample's proteins for 95% bootstrap_ci_low and bootstrap_ci_high columns in the average_ files
+        derived (str): default None, file of derived feature definitions tested along with the built in features, see derived_features.py
     Outputs:
         (float) percentage of gene names and proteins found in the structural features database
     '''
-    database_dir = './databases/precounted_human_genome/'
-    header = ['Name','Crowd predictions', 'Length of protein', 'NHTM Best from query.phdPred', 'Negative region lengths', 'Number amino acid in anchor region A', 'Number amino acid in anchor region C', 'Number amino acid in anchor region D', 'Number amino acid in anchor region E', 'Number amino acid in anchor region F', 'Number amino acid in anchor region G', 'Number amino acid in anchor region H', 'Number amino acid in anchor region I', 'Number amino acid in anchor region K', 'Number amino acid in anchor region L', 'Number amino acid in anchor region M', 'Number amino acid in anchor region N', 'Number amino acid in anchor region P', 'Number amino acid in anchor region Q', 'Number amino acid in anchor region R', 'Number amino acid in anchor region S', 'Number amino acid in anchor region T', 'Number amino acid in anchor region V', 'Number amino acid in anchor region W', 'Number amino acid in anchor region Y', 'Number amino acid in coil region A', 'Number amino acid in coil region C', 'Number amino acid in coil region D', 'Number amino acid in coil region E', 'Number amino acid in coil region F', 'Number amino acid in coil region G', 'Number amino acid in coil region H', 'Number amino acid in coil region I', 'Number amino acid in coil region K', 'Number amino acid in coil region L', 'Number amino acid in coil region M', 'Number amino acid in coil region N', 'Number amino acid in coil region P', 'Number amino acid in coil region Q', 'Number amino acid in coil region R', 'Number amino acid in coil region S', 'Number amino acid in coil region T', 'Number amino acid in coil region V', 'Number amino acid in coil region W', 'Number amino acid in coil region Y', 'Number amino acid in conserved region A', 'Number amino acid in conserved region C', 'Number amino acid in conserved region D', 'Number amino acid in conserved region E', 'Number amino acid in conserved region F', 'Number amino acid in conserved region G', 'Number amino acid in conserved region H', 'Number amino acid in conserved region I', 'Number amino acid in conserved region K', 'Number amino acid in conserved region L', 'Number amino acid in conserved region M', 'Number amino acid in conserved region N', 'Number amino acid in conserved region P', 'Number amino acid in conserved region Q', 'Number amino acid in conserved region R', 'Number amino acid in conserved region S', 'Number amino acid in conserved region T', 'Number amino acid in conserved region V', 'Number amino acid in conserved region W', 'Number amino acid in conserved region Y', 'Number amino acid in disordered region A', 'Number amino acid in disordered region C', 'Number amino acid in disordered region D', 'Number amino acid in disordered region E', 'Number amino acid in disordered region F', 'Number amino acid in disordered region G', 'Number amino acid in disordered region H', 'Number amino acid in disordered region I', 'Number amino acid in disordered region K', 'Number amino acid in disordered region L', 'Number amino acid in disordered region M', 'Number amino acid in disordered region N', 'Number amino acid in disordered region P', 'Number amino acid in disordered region Q', 'Number amino acid in disordered region R', 'Number amino acid in disordered region S', 'Number amino acid in disordered region T', 'Number amino acid in disordered region V', 'Number amino acid in disordered region W', 'Number amino acid in disordered region Y', 'Number amino acid in globular region A', 'Number amino acid in globular region C', 'Number amino acid in globular region D', 'Number amino acid in globular region E', 'Number amino acid in globular region F', 'Number amino acid in globular region G', 'Number amino acid in globular region H', 'Number amino acid in globular region I', 'Number amino acid in globular region K', 'Number amino acid in globular region L', 'Number amino acid in globular region M', 'Number amino acid in globular region N', 'Number amino acid in globular region P', 'Number amino acid in globular region Q', 'Number amino acid in globular region R', 'Number amino acid in globular region S', 'Number amino acid in globular region T', 'Number amino acid in globular region V', 'Number amino acid in globular region W', 'Number amino acid in globular region Y', 'Number amino acid in helix region A', 'Number amino acid in helix region C', 'Number amino acid in helix region D', 'Number amino acid in helix region E', 'Number amino acid in helix region F', 'Number amino acid in helix region G', 'Number amino acid in helix region H', 'Number amino acid in helix region I', 'Number amino acid in helix region K', 'Number amino acid in helix region L', 'Number amino acid in helix region M', 'Number amino acid in helix region N', 'Number amino acid in helix region P', 'Number amino acid in helix region Q', 'Number amino acid in helix region R', 'Number amino acid in helix region S', 'Number amino acid in helix region T', 'Number amino acid in helix region V', 'Number amino acid in helix region W', 'Number amino acid in helix region Y', 'Number amino acid in loop region A', 'Number amino acid in loop region C', 'Number amino acid in loop region D', 'Number amino acid in loop region E', 'Number amino acid in loop region F', 'Number amino acid in loop region G', 'Number amino acid in loop region H', 'Number amino acid in loop region I', 'Number amino acid in loop region K', 'Number amino acid in loop region L', 'Number amino acid in loop region M', 'Number amino acid in loop region N', 'Number amino acid in loop region P', 'Number amino acid in loop region Q', 'Number amino acid in loop region R', 'Number amino acid in loop region S', 'Number amino acid in loop region T', 'Number amino acid in loop region V', 'Number amino acid in loop region W', 'Number amino acid in loop region Y', 'Number amino acid in nonconserved region A', 'Number amino acid in nonconserved region C', 'Number amino acid in nonconserved region D', 'Number amino acid in nonconserved region E', 'Number amino acid in nonconserved region F', 'Number amino acid in nonconserved region G', 'Number amino acid in nonconserved region H', 'Number amino acid in nonconserved region I', 'Number amino acid in nonconserved region K', 'Number amino acid in nonconserved region L', 'Number amino acid in nonconserved region M', 'Number amino acid in nonconserved region N', 'Number amino acid in nonconserved region P', 'Number amino acid in nonconserved region Q', 'Number amino acid in nonconserved region R', 'Number amino acid in nonconserved region S', 'Number amino acid in nonconserved region T', 'Number amino acid in nonconserved region V', 'Number amino acid in nonconserved region W', 'Number amino acid in nonconserved region Y', 'Number amino acid in protein A', 'Number amino acid in protein C', 'Number amino acid in protein D', 'Number amino acid in protein E', 'Number amino acid in protein F', 'Number amino acid in protein G', 'Number amino acid in protein H', 'Number amino acid in protein I', 'Number amino acid in protein K', 'Number amino acid in protein L', 'Number amino acid in protein M', 'Number amino acid in protein N', 'Number amino acid in protein P', 'Number amino acid in protein Q', 'Number amino acid in protein R', 'Number amino acid in protein S', 'Number amino acid in protein T', 'Number amino acid in protein V', 'Number amino acid in protein W', 'Number amino acid in protein Y', 'Number amino acid in sheet region A', 'Number amino acid in sheet region C', 'Number amino acid in sheet region D', 'Number amino acid in sheet region E', 'Number amino acid in sheet region F', 'Number amino acid in sheet region G', 'Number amino acid in sheet region H', 'Number amino acid in sheet region I', 'Number amino acid in sheet region K', 'Number amino acid in sheet region L', 'Number amino acid in sheet region M', 'Number amino acid in sheet region N', 'Number amino acid in sheet region P', 'Number amino acid in sheet region Q', 'Number amino acid in sheet region R', 'Number amino acid in sheet region S', 'Number amino acid in sheet region T', 'Number amino acid in sheet region V', 'Number amino acid in sheet region W', 'Number amino acid in sheet region Y', 'Number of anchor regions', 'Number of coils', 'Number of conserved regions', 'Number of disordered regions', 'Number of globular regions', 'Number of helix', 'Number of loops', 'Number of negative regions', 'Number of negative regions with length >=30', 'Number of nonconserved regions', 'Number of positive regions', 'Number of positive regions with length >=30', 'Number of predictions', 'Number of sheets', 'Number of transmembrane helices', 'Positive region lengths', 'Stretch', 'Total length of anchor regions', 'Total length of coil regions', 'Total length of conserved regions', 'Total length of disordered regions', 'Total length of globular regions', 'Total length of helix regions', 'Total length of loop regions', 'Total length of nonconserved regions', 'Total length of sheet regions', 'Total length tmh regions', 'Y/n anchor regions', 'Y/n disordered regions', 'Y/n globular regions', 'Y/n tmh regions']
-    headeralpha = ['Length of S Regions', 'Number of S Regions', 'Number of Amino Acids A in S Regions', 'Number of Amino Acids R in S Regions', 'Number of Amino Acids N in S Regions', 'Number of Amino Acids D in S Regions', 'Number of Amino Acids C in S Regions', 'Number of Amino Acids E in S Regions', 'Number of Amino Acids Q in S Regions', 'Number of Amino Acids G in S Regions', 'Number of Amino Acids H in S Regions', 'Number of Amino Acids I in S Regions', 'Number of Amino Acids L in S Regions', 'Number of Amino Acids K in S Regions', 'Number of Amino Acids M in S Regions', 'Number of Amino Acids F in S Regions', 'Number of Amino Acids P in S Regions', 'Number of Amino Acids S in S Regions', 'Number of Amino Acids T in S Regions', 'Number of Amino Acids W in S Regions', 'Number of Amino Acids Y in S Regions', 'Number of Amino Acids V in S Regions', 'Length of E Regions', 'Number of E Regions', 'Number of Amino Acids A in E Regions', 'Number of Amino Acids R in E Regions', 'Number of Amino Acids N in E Regions', 'Number of Amino Acids D in E Regions', 'Number of Amino Acids C in E Regions', 'Number of Amino Acids E in E Regions', 'Number of Amino Acids Q in E Regions', 'Number of Amino Acids G in E Regions', 'Number of Amino Acids H in E Regions', 'Number of Amino Acids I in E Regions', 'Number of Amino Acids L in E Regions', 'Number of Amino Acids K in E Regions', 'Number of Amino Acids M in E Regions', 'Number of Amino Acids F in E Regions', 'Number of Amino Acids P in E Regions', 'Number of Amino Acids S in E Regions', 'Number of Amino Acids T in E Regions', 'Number of Amino Acids W in E Regions', 'Number of Amino Acids Y in E Regions', 'Number of Amino Acids V in E Regions', 'Length of T Regions', 'Number of T Regions', 'Number of Amino Acids A in T Regions', 'Number of Amino Acids R in T Regions', 'Number of Amino Acids N in T Regions', 'Number of Amino Acids D in T Regions', 'Number of Amino Acids C in T Regions', 'Number of Amino Acids E in T Regions', 'Number of Amino Acids Q in T Regions', 'Number of Amino Acids G in T Regions', 'Number of Amino Acids H in T Regions', 'Number of Amino Acids I in T Regions', 'Number of Amino Acids L in T Regions', 'Number of Amino Acids K in T Regions', 'Number of Amino Acids M in T Regions', 'Number of Amino Acids F in T Regions', 'Number of Amino Acids P in T Regions', 'Number of Amino Acids S in T Regions', 'Number of Amino Acids T in T Regions', 'Number of Amino Acids W in T Regions', 'Number of Amino Acids Y in T Regions', 'Number of Amino Acids V in T Regions', 'Length of B Regions', 'Number of B Regions', 'Number of Amino Acids A in B Regions', 'Number of Amino Acids R in B Regions', 'Number of Amino Acids N in B Regions', 'Number of Amino Acids D in B Regions', 'Number of Amino Acids C in B Regions', 'Number of Amino Acids E in B Regions', 'Number of Amino Acids Q in B Regions', 'Number of Amino Acids G in B Regions', 'Number of Amino Acids H in B Regions', 'Number of Amino Acids I in B Regions', 'Number of Amino Acids L in B Regions', 'Number of Amino Acids K in B Regions', 'Number of Amino Acids M in B Regions', 'Number of Amino Acids F in B Regions', 'Number of Amino Acids P in B Regions', 'Number of Amino Acids S in B Regions', 'Number of Amino Acids T in B Regions', 'Number of Amino Acids W in B Regions', 'Number of Amino Acids Y in B Regions', 'Number of Amino Acids V in B Regions', 'Length of G Regions', 'Number of G Regions', 'Number of Amino Acids A in G Regions', 'Number of Amino Acids R in G Regions', 'Number of Amino Acids N in G Regions', 'Number of Amino Acids D in G Regions', 'Number of Amino Acids C in G Regions', 'Number of Amino Acids E in G Regions', 'Number of Amino Acids Q in G Regions', 'Number of Amino Acids G in G Regions', 'Number of Amino Acids H in G Regions', 'Number of Amino Acids I in G Regions', 'Number of Amino Acids L in G Regions', 'Number of Amino Acids K in G Regions', 'Number of Amino Acids M in G Regions', 'Number of Amino Acids F in G Regions', 'Number of Amino Acids P in G Regions', 'Number of Amino Acids S in G Regions', 'Number of Amino Acids T in G Regions', 'Number of Amino Acids W in G Regions', 'Number of Amino Acids Y in G Regions', 'Number of Amino Acids V in G Regions', 'Length of H Regions', 'Number of H Regions', 'Number of Amino Acids A in H Regions', 'Number of Amino Acids R in H Regions', 'Number of Amino Acids N in H Regions', 'Number of Amino Acids D in H Regions', 'Number of Amino Acids C in H Regions', 'Number of Amino Acids E in H Regions', 'Number of Amino Acids Q in H Regions', 'Number of Amino Acids G in H Regions', 'Number of Amino Acids H in H Regions', 'Number of Amino Acids I in H Regions', 'Number of Amino Acids L in H Regions', 'Number of Amino Acids K in H Regions', 'Number of Amino Acids M in H Regions', 'Number of Amino Acids F in H Regions', 'Number of Amino Acids P in H Regions', 'Number of Amino Acids S in H Regions', 'Number of Amino Acids T in H Regions', 'Number of Amino Acids W in H Regions', 'Number of Amino Acids Y in H Regions', 'Number of Amino Acids V in H Regions', 'Length of Aggregation Prone Regions', 'Number of Aggregation Prone Regions', 'Number of Amino Acids A in Aggregation Prone Regions', 'Number of Amino Acids R in Aggregation Prone Regions', 'Number of Amino Acids N in Aggregation Prone Regions', 'Number of Amino Acids D in Aggregation Prone Regions', 'Number of Amino Acids C in Aggregation Prone Regions', 'Number of Amino Acids E in Aggregation Prone Regions', 'Number of Amino Acids Q in Aggregation Prone Regions', 'Number of Amino Acids G in Aggregation Prone Regions', 'Number of Amino Acids H in Aggregation Prone Regions', 'Number of Amino Acids I in Aggregation Prone Regions', 'Number of Amino Acids L in Aggregation Prone Regions', 'Number of Amino Acids K in Aggregation Prone Regions', 'Number of Amino Acids M in Aggregation Prone Regions', 'Number of Amino Acids F in Aggregation Prone Regions', 'Number of Amino Acids P in Aggregation Prone Regions', 'Number of Amino Acids S in Aggregation Prone Regions', 'Number of Amino Acids T in Aggregation Prone Regions', 'Number of Amino Acids W in Aggregation Prone Regions', 'Number of Amino Acids Y in Aggregation Prone Regions', 'Number of Amino Acids V in Aggregation Prone Regions', 'Minimum Distance to Center of Mass', 'Maximum Distance to Center of Mass', 'Average Distance to Center of Mass', 'Number of Contacts']
-    all_headers = header[1:] + headeralpha
-    unfound = []
-    current_num_files = 0
+    use_weight = parse_bool(use_weight)
+    permutations = int(permutations)
+    processes = int(processes)
+    bootstrap = int(bootstrap)
+    sf = StructuralFeatures(database_root, background_folder_name, features=features, derived=derived)
+    sf.load_background()
+    extra_columns = ['empirical_pvalue'] if permutations else []
+    average_extra_columns = []
+    if bootstrap:
+        from bootstrap_ci import bootstrap_intervals, add_intervals, interval_columns
+        average_extra_columns = interval_columns
+    found = 0
     input_files = glob.glob(input_dir + '*')
+    manifest = None
+    if shard is not None:
+        from shards import parse_shard, shard_files, shard_folder, ShardManifest
+        shard_index, num_shards = parse_shard(shard)
+        input_files = shard_files(input_files, shard_index, num_shards)
+        folder_out = shard_folder(folder_out, shard_index, num_shards)
+        manifest = ShardManifest(folder_out, shard_index, num_shards, input_dir, input_files, {'use_weight': use_weight, 'background_folder_name': background_folder_name, 'database_root': os.path.abspath(database_root), 'permutations': permutations, 'features': sf.feature_groups, 'bootstrap': bootstrap, 'derived': sf.derived.expressions if sf.derived is not None else None})
     tot_num_files = len(input_files)
-
-    for sample_file in input_files:
-
-        path_to_background = './databases/'+background_folder_name+'/'
-        with open(path_to_background+'number_proteins_found.csv') as fo:
-            for line in fo:
-                background_found = int(line)
-
-        background_dict = make_background_dict(path_to_background, 'ipr.domain.csv', {})
-        background_dict = make_background_dict(path_to_background, 'scop.family.csv', background_dict)
-        background_dict = make_background_dict(path_to_background, 'scop.fold.csv', background_dict)
-        background_dict = make_background_dict(path_to_background, 'scop.superfam.csv', background_dict)
-        frequency_background = make_background_dict(path_to_background, 'frequency_background.csv', {})
-        average_background = make_average_background_dict(path_to_background, 'average_background.csv', {})
+    from build_progress import ProgressReporter
+    progress = ProgressReporter(tot_num_files, 'files')
+    for current_num_files in range(tot_num_files):
+        sample_file = input_files[current_num_files]
         try:
-            print(str(current_num_files/tot_num_files)+'% done')
-            current_num_files +=1
-            sd_out, track_dict, out_dict, found, unfound = num_find_sig_for_one_file(sample_file, database_dir, header, unfound, 0, use_weight)
-            sd_alpha, out_dict_alpha = find_alpha_features_for_one(sample_file, headeralpha, use_weight)
-            sd_out.update(sd_alpha)
-            track_dict.update(out_dict_alpha)
-            all_p_vals1 = []
-            temp_lines1 = []
-            all_p_vals2 = []
-            temp_lines2 = []
-            write_output( folder_out + 'frequency_' +sample_file.split('/')[-1],'structure_id,structure,structure_type,counts_observed,background_counts,pvalue,bonforroni_cutoff,log_fold_change,fdr\n')
-            write_output( folder_out + 'average_' +sample_file.split('/')[-1],'label,average_observed,observed_standard_deviation,background_average,background_standard_deviation,pvalue,bonforroni_cutoff,fdr\n')
-            for index in range(len(all_headers)):
-                if all_headers[index].split(' ')[0] == "Number" or all_headers[index].split(' ')[0] == 'Y/n': 
-                    sample_sf_frequency, background_sf_frequency, p_value, corrected_p, fc = compare_frequency_to_background(367, all_headers[index], track_dict[all_headers[index]], found, frequency_background, background_found)
-                    temp_lines1.append('N/A,' + all_headers[index]+ ',N/A,' + str(sample_sf_frequency) + ',' +str(background_sf_frequency)+ ',' +str(p_value) + ',' +str(corrected_p)+ ',' +str(fc)+ ',')
-                    all_p_vals1.append(p_value)
-                elif all_headers[index] != 'Crowd predictions' and all_headers[index] != 'Stretch' and all_headers[index] != 'NHTM Best from query.phdPred':
-                    sample_sf_frequency, background_sf_frequency, p_value, corrected_p = compare_quant_to_background(23, all_headers[index], (track_dict[all_headers[index]],sd_out[all_headers[index]]), found, average_background, background_found)
-                    temp_lines2.append(all_headers[index] + ',' + str(track_dict[all_headers[index]])+ ',' +str(sd_out[all_headers[index]])+ ',' +str(background_sf_frequency[0])+ ',' +str(background_sf_frequency[1])+ ',' +str(p_value) + ',' +str(corrected_p) + ',')
-                    all_p_vals2.append(p_value)
-            rejected, fdr_list1 =fdrcorrection(all_p_vals1)
-            rejected, fdr_list2 =fdrcorrection(all_p_vals2)
-            for index in range(len(fdr_list1)):
-                write_output(folder_out + 'frequency_' +sample_file.split('/')[-1], temp_lines1[index] + str(fdr_list1[index]) + '\n')
-            for index in range(len(temp_lines2)):
-                write_output(folder_out + 'average_' +sample_file.split('/')[-1], temp_lines2[index] + str(fdr_list2[index]) +'\n')
-            for sub_dict in out_dict:
-                all_p_vals = []
-                temp_lines = []
-                for elt in out_dict[sub_dict]:
-                    if elt[0] != 'NULL':
-                        key_temp = str(elt)[1:-1].replace(',', '-')
-                        key_temp = key_temp.replace('-', ',',1)
-                        key_temp = key_temp.replace("'", '')
-                        sample_sf_frequency, background_sf_frequency, p_value, corrected_p, fc = compare_frequency_to_background(len(out_dict[sub_dict]), elt[0], out_dict[sub_dict][elt], found, background_dict, background_found)
-                        temp_lines.append(key_temp + ',' + sub_dict+ ',' + str(sample_sf_frequency) + ',' +str(background_sf_frequency)+ ',' +str(p_value) + ',' +str(corrected_p)+ ',' +str(fc)+ ',')
-                        all_p_vals.append(p_value)
-                rejected, fdr_list =fdrcorrection(all_p_vals)
-                for index in range(len(fdr_list)):   
-                    write_output( folder_out + 'frequency_' +sample_file.split('/')[-1],temp_lines[index] + str(fdr_list[index]) + '\n')
-        except:
+            summary = sf.aggregate(read_sample_file(sample_file, use_weight), use_weight)
+            empirical = None
+            if permutations:
+                empirical = sf.permutation_null().pvalues(summary, permutations, processes)
+            average_rows, frequency_rows = sf.compare(summary, empirical=empirical)
+            if bootstrap:
+                average_rows = add_intervals(average_rows, bootstrap_intervals(sf, summary, bootstrap))
+        except Exception:
             write_output(folder_out+'errors.csv', sample_file + '\n')
-    return(found/tot_num_files)
+            if manifest is not None:
+                manifest.record(sample_file, 'failed')
+            progress.update()
+            continue
+        found = summary['found']
+        write_output(folder_out + 'frequency_' +sample_file.split('/')[-1], ','.join(frequency_columns + extra_columns) + '\n' + format_rows(frequency_rows))
+        write_output(folder_out + 'average_' +sample_file.split('/')[-1], ','.join(average_columns + extra_columns + average_extra_columns) + '\n' + format_rows(average_rows))
+        if manifest is not None:
+            manifest.record(sample_file, 'done')
+        progress.update()
+    progress.finish()
+    if manifest is not None:
+        manifest.finish()
+    return(found/max(tot_num_files, 1))
+
+def compare_two_files(sample_file, reference_file, folder_out, use_weight=False, database_root='./databases/'):
+    '''
+    Compares the gene lists of two input files directly, the first tested for enrichment against the second
+    Inputs:
+        sample_file (str): input file tested for enrichment
+        reference_file (str): input file it is compared to, in place of a background
+        folder_out (str): directory the frequency_ and average_ output files are written to
+        use_weight (bool or str): default False, weigh structural feature output by corresponding input expression levels
+        database_root (str): default './databases/', folder with the unzipped structural features databases
+    Outputs:
+        (int) number of genes or proteins of sample_file found in the structural features database
+    '''
+    use_weight = parse_bool(use_weight)
+    sf = StructuralFeatures(database_root)
+    average_rows, frequency_rows, found = sf.compare_groups_rows(read_sample_file(sample_file, use_weight), read_sample_file(reference_file, use_weight), use_weight)
+    out_name = os.path.splitext(os.path.basename(sample_file))[0] + '_vs_' + os.path.basename(reference_file)
+    write_output(folder_out + 'frequency_' + out_name, ','.join(frequency_columns) + '\n' + format_rows(frequency_rows))
+    write_output(folder_out + 'average_' + out_name, ','.join(average_columns) + '\n' + format_rows(average_rows))
+    return found
 
 if __name__ == '__main__':
-    run_for_all_files_in_folder(*sys.argv[1:])
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        compare_two_files(*sys.argv[2:])
+    else:
+        # python generate_structural_features.py input_dir output_dir [...] [--shard i/N] [--features human,alphafold,domain,scop] [--bootstrap 2000] [--derived derived_features.txt]
+        arguments = sys.argv[1:]
+        options = {}
+        for flag in ('--shard', '--features', '--bootstrap', '--derived'):
+            if flag in arguments:
+                position = arguments.index(flag)
+                options[flag[2:]] = arguments[position + 1]
+                arguments = arguments[:position] + arguments[position + 2:]
+        run_for_all_files_in_folder(*arguments, **options)
@@ -10,6 +10,17 @@
 import sys
 import os
 import glob
+import numpy as np
+from generate_structural_features import StructuralFeatures, read_sample_file, parse_bool, gene_weight_pairs, frequency_features, average_features, all_headers, background_files, header, headeralpha, substructure_types, disorder_cutoff_file, background_disorder_cutoff
+
+# features of the precounted human genome and alpha fold tables, and the continous ones standard deviations are kept for
+statistics_groups = {
+    'human': (header[1:], [label for label in average_features if label in header]),
+    'alpha': (headeralpha, [label for label in average_features if label in headeralpha]),
+}
+statistics_totals = ['tot_weight', 'weight_sum', 'count']
+# kept next to background_statistics.csv, the proteins of the background, the number of added sets each is in and their weights
+members_name = 'background_members.csv'
 
 # functions
 def write_output(out_name, out_str):
@@ -25,67 +36,478 @@ def write_output(out_name, out_str):
     f.write(out_str)
     f.close()
 
-def make_background(input_folder, file_id, output_dir_name):
+def write_background(output_dir, average_lines, frequency_lines, substructure_lines, proteins_found=None, disorder_cutoff=None):
+    '''
+    Writes the files of one background folder, replacing any earlier version
+    Inputs:
+        output_dir: (str) background folder, ending in /, doesn't need to already exist but can
+        average_lines: (list) 'label,average,standard deviation' lines
+        frequency_lines: (list) 'label,frequency' lines
+        substructure_lines: (dict) structure type mapped to 'structure id,count' lines
+        proteins_found: (int) number of proteins in the background, number_proteins_found.csv is only written when given
+        disorder_cutoff: (float) iupred cutoff of the disorder and anchor features the background was built with, disorder_cutoff.csv is only written when given
+    Outputs:
+        None
+    '''
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    outputs = {'average_background.csv': average_lines, 'frequency_background.csv': frequency_lines}
+    for sub_dict in background_files:
+        outputs[background_files[sub_dict]] = substructure_lines[sub_dict]
+    if proteins_found is not None:
+        outputs['number_proteins_found.csv'] = [str(proteins_found)]
+    if disorder_cutoff is not None:
+        outputs[disorder_cutoff_file] = [str(disorder_cutoff)]
+    for file_name in outputs:
+        with open(output_dir + file_name, 'w') as fo:
+            fo.write(''.join(line + '\n' for line in outputs[file_name]))
+
+def first_weights(genes, use_weight, found):
+    '''
+    Weight of each found protien the first time it is listed, what it adds to the total weight averages are divided by, see StructuralFeatures.find_proteins
+    Inputs:
+        genes: (list, dict or pandas Series) gene or protien names, (name, weight) tuples, or names mapped to weights
+        use_weight: (bool) if the weights are kept
+        found: (dict) proteins found in the precounted human genome
+    Outputs:
+        shares: (dict) protien mapped to its first weight
+    '''
+    shares = {}
+    for gnuid, weight in gene_weight_pairs(genes)[0]:
+        if gnuid in found and gnuid not in shares:
+            shares[gnuid] = weight if use_weight else 1.0
+    return shares
+
+def set_members(sf, genes, use_weight=None):
+    '''
+    The proteins of one set with their weights, what a background keeps per protien to add or take out sets
+    Inputs:
+        sf: (StructuralFeatures) loaded databases
+        genes: (list, dict or pandas Series) gene or protien names, (name, weight) tuples, or names mapped to weights
+        use_weight: (bool) weigh the averages by the weights, by default True when weights are given
+    Outputs:
+        members: (dict) 'use_weight', 'human' mapped to {protien: [sets, weight, first weight]} and 'alpha' mapped to {protien: [sets, weight]}, sets is the number of added sets the protien is in, here 1
+    '''
+    human_weights, tot_weight, alpha_weights, unfound, use_weight = sf.find_proteins(genes, use_weight)
+    shares = first_weights(genes, use_weight, human_weights)
+    return {
+        'use_weight': use_weight,
+        'human': {gnuid: [1, human_weights[gnuid], shares[gnuid]] for gnuid in human_weights},
+        'alpha': {gnuid: [1, alpha_weights[gnuid]] for gnuid in alpha_weights},
+    }
+
+def member_statistics(sf, members, use_weight):
+    '''
+    Running sums of some proteins of a background, each protien counted once whatever the number of sets it is in
+    Inputs:
+        sf: (StructuralFeatures) loaded databases
+        members: (dict) 'human' and 'alpha' proteins with their weights, see set_members
+        use_weight: (bool) if the averages are weighted
+    Outputs:
+        stats: (dict) 'use_weight', 'proteins_found', 'members' (the members given), 'substructures' (structure type mapped to {structure id: count}), and per table ('human', 'alpha') the total weight averages are divided by, the sum and number of weights, and per feature the weighted sum and for continous features the sum, sum of squares and weighted sum of squares
+    '''
+    stats = {'use_weight': use_weight, 'proteins_found': len(members['human']), 'members': {group: members[group] for group in statistics_groups}, 'substructures': {sub_dict: {} for sub_dict in substructure_types}}
+    for group, values, rows in (('human', sf.human_values, sf.human_rows), ('alpha', sf.alpha_values, sf.alpha_rows)):
+        labels, sd_labels = statistics_groups[group]
+        sd_columns = [labels.index(label) for label in sd_labels]
+        weights = members[group]
+        weight_array = np.array([weights[gnuid][1] for gnuid in weights], dtype=float)
+        feature_values = values[[rows[gnuid] for gnuid in weights]].reshape(len(weights), len(labels))
+        continous = feature_values[:, sd_columns]
+        stats[group] = {
+            'tot_weight': sum(weights[gnuid][2] for gnuid in weights) if group == 'human' else weight_array.sum(),
+            'weight_sum': weight_array.sum(),
+            'count': len(weights),
+            'weighted_sum': weight_array @ feature_values,
+            'sum': continous.sum(axis=0),
+            'sum_squares': (continous**2).sum(axis=0),
+            'weighted_sum_squares': weight_array @ continous**2,
+        }
+    for gnuid in members['human']:
+        protein_dict = sf.substructures(gnuid)
+        for sub_dict in substructure_types:
+            for key in protein_dict[sub_dict]:
+                if key[0] != 'NULL':
+                    stats['substructures'][sub_dict][key[0]] = stats['substructures'][sub_dict].get(key[0], 0) + protein_dict[sub_dict][key]
+    return stats
+
+def set_statistics(sf, genes, use_weight=None):
+    '''
+    Running sums of one protien set that a background can be rebuilt from, see member_statistics
+    Inputs:
+        sf: (StructuralFeatures) loaded databases
+        genes: (list, dict or pandas Series) gene or protien names, (name, weight) tuples, or names mapped to weights
+        use_weight: (bool) weigh the averages by the weights, by default True when weights are given
+    Outputs:
+        stats: (dict) running sums, see member_statistics
+    '''
+    members = set_members(sf, genes, use_weight)
+    return member_statistics(sf, members, members['use_weight'])
+
+def batch_statistics(sf, batch, gene_lists):
+    '''
+    Running sums of every gene list of a batch, from its sparse weight matrices instead of looking the proteins up again
+    The structure class counts are left empty, they are in the batch's substructures
+    Inputs:
+        sf: (StructuralFeatures) databases the batch was aggregated with
+        batch: (dict) output of StructuralFeatures.aggregate_many
+        gene_lists: (list) gene lists of the batch, in order, for the weight of the first time each protien is listed
+    Outputs:
+        (list) running sums of each gene list, see member_statistics
+    '''
+    sums = {}
+    members = {}
+    for group, values, ids in (('human', sf.human_values, sf.human_ids), ('alpha', sf.alpha_values, sf.alpha_ids)):
+        labels, sd_labels = statistics_groups[group]
+        continous = np.asarray(values)[:, [labels.index(label) for label in sd_labels]]
+        weight_matrix = batch[group + '_weights'].tocsr()
+        membership = batch[group + '_members'].tocsr()
+        sums[group] = {
+            'weight_sum': np.asarray(weight_matrix.sum(axis=1)).ravel(),
+            'count': membership.getnnz(axis=1),
+            'weighted_sum': np.asarray(weight_matrix @ values),
+            'sum': np.asarray(membership @ continous),
+            'sum_squares': np.asarray(membership @ continous**2),
+            'weighted_sum_squares': np.asarray(weight_matrix @ continous**2),
+        }
+        sums[group]['tot_weight'] = batch['tot_weight'] if group == 'human' else sums[group]['weight_sum']
+        members[group] = []
+        for row in range(membership.shape[0]):
+            columns = membership.indices[membership.indptr[row]:membership.indptr[row + 1]]
+            weights = weight_matrix[row].toarray().ravel()[columns]
+            members[group].append({ids[columns[index]]: [1, float(weights[index])] for index in range(len(columns))})
+    all_statistics = []
+    for row in range(len(gene_lists)):
+        use_weight = bool(batch['use_weight'][row])
+        shares = first_weights(gene_lists[row], use_weight, members['human'][row])
+        for gnuid in members['human'][row]:
+            members['human'][row][gnuid].append(shares[gnuid])
+        stats = {'use_weight': use_weight, 'proteins_found': len(members['human'][row]), 'members': {group: members[group][row] for group in statistics_groups}, 'substructures': {sub_dict: {} for sub_dict in substructure_types}}
+        for group in statistics_groups:
+            stats[group] = {name: sums[group][name][row] for name in sums[group]}
+            stats[group]['count'] = int(stats[group]['count'])
+        all_statistics.append(stats)
+    return all_statistics
+
+def merge_statistics(sf, stats, members, sign=1):
+    '''
+    Adds a protien set to a background's running sums, or takes it away
+    A background is a set of proteins: a protien already in the background only has its number of sets raised and keeps its weight, and is taken out with the last set it is in
+    Inputs:
+        sf: (StructuralFeatures) loaded databases
+        stats: (dict) running sums, see member_statistics
+        members: (dict) proteins of the set to add or remove, see set_members
+        sign: (int) 1 to add, -1 to remove
+    Outputs:
+        merged: (dict) new running sums, the inputs are not changed
+    '''
+    if stats['use_weight'] != members['use_weight']:
+        raise ValueError('Cannot merge weighted and unweighted background statistics')
+    if sign < 0:
+        unknown = [gnuid for group in statistics_groups for gnuid in members[group] if gnuid not in stats['members'][group]]
+        if unknown:
+            raise ValueError('Cannot take out proteins that are not in the background: ' + ', '.join(sorted(set(unknown))))
+    merged_members = {}
+    changed = {}
+    for group in statistics_groups:
+        merged_members[group] = {gnuid: list(stats['members'][group][gnuid]) for gnuid in stats['members'][group]}
+        changed[group] = {}
+        for gnuid in members[group]:
+            if gnuid not in merged_members[group]:
+                merged_members[group][gnuid] = list(members[group][gnuid])
+                changed[group][gnuid] = merged_members[group][gnuid]
+                continue
+            merged_members[group][gnuid][0] += sign
+            if merged_members[group][gnuid][0] == 0:
+                changed[group][gnuid] = merged_members[group].pop(gnuid)
+    # only the proteins that came in or went out change the sums
+    change = member_statistics(sf, changed, stats['use_weight'])
+    merged = {'use_weight': stats['use_weight'], 'proteins_found': len(merged_members['human']), 'members': merged_members, 'substructures': {}}
+    for group in statistics_groups:
+        merged[group] = {name: stats[group][name] + sign*change[group][name] for name in stats[group]}
+    for sub_dict in substructure_types:
+        counts = dict(stats['substructures'][sub_dict])
+        for structure_id in change['substructures'][sub_dict]:
+            counts[structure_id] = counts.get(structure_id, 0) + sign*change['substructures'][sub_dict][structure_id]
+        merged['substructures'][sub_dict] = {structure_id: counts[structure_id] for structure_id in counts if counts[structure_id] > 0}
+    return merged
+
+def statistics_views(stats):
+    '''
+    Turns running sums into the lines of the background files
+    Inputs:
+        stats: (dict) running sums, see member_statistics
+    Outputs:
+        average_lines: (list) 'label,average,standard deviation' lines
+        frequency_lines: (list) 'label,frequency' lines
+        substructure_lines: (dict) structure type mapped to 'structure id,count' lines
+    '''
+    averages = {}
+    sds = {}
+    for group in statistics_groups:
+        labels, sd_labels = statistics_groups[group]
+        sums = stats[group]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            group_average = sums['weighted_sum']/sums['tot_weight'] if sums['tot_weight'] else np.zeros(len(labels))
+            if stats['use_weight']:
+                # like DescrStatsW with ddof=1
+                mean = sums['weighted_sum'][[labels.index(label) for label in sd_labels]]/sums['weight_sum']
+                variance = (sums['weighted_sum_squares'] - sums['weight_sum']*mean**2)/(sums['weight_sum'] - 1)
+            else:
+                # like np.std
+                mean = sums['sum']/sums['count']
+                variance = sums['sum_squares']/sums['count'] - mean**2
+        averages.update(zip(labels, group_average))
+        sds.update(zip(sd_labels, np.sqrt(np.maximum(variance, 0)) if sums['count'] else np.full(len(sd_labels), np.nan)))
+    average_lines = [label + ',' + str(averages[label]) + ',' + str(sds[label]) for label in average_features]
+    frequency_lines = [label + ',' + str(averages[label]) for label in frequency_features]
+    substructure_lines = {sub_dict: [structure_id + ',' + str(count) for structure_id, count in stats['substructures'][sub_dict].items()] for sub_dict in background_files}
+    return average_lines, frequency_lines, substructure_lines
+
+def write_statistics(output_dir, stats):
+    '''
+    Writes background_statistics.csv into a background folder, which keeps the running sums so the background can be updated later, and background_members.csv with its proteins
+    The structure class counts are kept in the usual scop and ipr background files
+    Inputs:
+        output_dir: (str) background folder, ending in /, that already exists
+        stats: (dict) running sums, see member_statistics
+    Outputs:
+        None
+    '''
+    lines = ['name,group,weighted_sum,sum,sum_squares,weighted_sum_squares', 'use_weight,,' + str(stats['use_weight']) + ',,,']
+    for group in statistics_groups:
+        labels, sd_labels = statistics_groups[group]
+        sums = stats[group]
+        for name in statistics_totals:
+            lines.append(name + ',' + group + ',' + str(sums[name]) + ',,,')
+        for index in range(len(labels)):
+            if labels[index] in sd_labels:
+                sd_index = sd_labels.index(labels[index])
+                lines.append(labels[index] + ',' + group + ',' + str(sums['weighted_sum'][index]) + ',' + str(sums['sum'][sd_index]) + ',' + str(sums['sum_squares'][sd_index]) + ',' + str(sums['weighted_sum_squares'][sd_index]))
+            else:
+                lines.append(labels[index] + ',' + group + ',' + str(sums['weighted_sum'][index]) + ',,,')
+    with open(output_dir + 'background_statistics.csv', 'w') as fo:
+        fo.write(''.join(line + '\n' for line in lines))
+    # alpha fold proteins have no first weight
+    member_lines = ['protien,group,sets,weight,first_weight']
+    for group in statistics_groups:
+        for gnuid, member in stats['members'][group].items():
+            member_lines.append(','.join([gnuid, group] + [str(value) for value in member] + ['']*(3 - len(member))))
+    with open(output_dir + members_name, 'w') as fo:
+        fo.write(''.join(line + '\n' for line in member_lines))
+
+def read_statistics(output_dir):
+    '''
+    Reads the running sums of a background folder written by write_statistics
+    Inputs:
+        output_dir: (str) background folder, ending in /
+    Outputs:
+        stats: (dict) running sums, see member_statistics
+    '''
+    for file_name in ('background_statistics.csv', members_name):
+        if not os.path.exists(output_dir + file_name):
+            raise ValueError(output_dir + ' has no ' + file_name + ', build it with make_background.py from_ids to be able to update it')
+    stats = {'substructures': {}, 'members': {group: {} for group in statistics_groups}}
+    values = {}
+    with open(output_dir + 'background_statistics.csv') as fo:
+        fo.readline()
+        for line in fo:
+            split_line = line.rstrip('\r\n').split(',')
+            values[(split_line[0], split_line[1])] = split_line[2:]
+    stats['use_weight'] = parse_bool(values[('use_weight', '')][0])
+    for group in statistics_groups:
+        labels, sd_labels = statistics_groups[group]
+        stats[group] = {name: float(values[(name, group)][0]) for name in statistics_totals}
+        stats[group]['count'] = int(stats[group]['count'])
+        stats[group]['weighted_sum'] = np.array([float(values[(label, group)][0]) for label in labels])
+        for index, name in ((1, 'sum'), (2, 'sum_squares'), (3, 'weighted_sum_squares')):
+            stats[group][name] = np.array([float(values[(label, group)][index]) for label in sd_labels])
+    with open(output_dir + 'number_proteins_found.csv') as fo:
+        stats['proteins_found'] = int(fo.readline())
+    for sub_dict in background_files:
+        counts = {}
+        with open(output_dir + background_files[sub_dict]) as fo:
+            for line in fo:
+                split_line = line.rstrip('\r\n').split(',')
+                if len(split_line) == 2:
+                    counts[split_line[0]] = counts.get(split_line[0], 0) + int(float(split_line[1]))
+        stats['substructures'][sub_dict] = counts
+    with open(output_dir + members_name) as fo:
+        fo.readline()
+        for line in fo:
+            split_line = line.rstrip('\r\n').split(',')
+            member = [int(split_line[2]), float(split_line[3])]
+            if split_line[1] == 'human':
+                member.append(float(split_line[4]))
+            stats['members'][split_line[1]][split_line[0]] = member
+    return stats
+
+def update_background(background_name, add=None, remove=None, database_root='./databases/', use_weight=None, sf=None):
+    '''
+    Adds protien sets to a background, or takes them out, from its running sums without rebuilding it
+    Inputs:
+        background_name: (str) background folder in database_root, made by make_backgrounds_from_ids
+        add: (list) gene lists to add, each in any form accepted by StructuralFeatures.aggregate, proteins already in the background are counted once
+        remove: (list) gene lists that were added before and should be taken out, a protien leaves the background with the last set it is in, ValueError for proteins not in the background
+        database_root: (str) default './databases/', folder with the structural features databases
+        use_weight: (bool) weigh by the expression values, by default how the background was built
+        sf: (StructuralFeatures) already loaded databases to use instead of loading database_root, loaded with derived features derived_background.csv is rewritten, without them it is deleted
+    Outputs:
+        proteins_found: (int) number of proteins in the updated background
+    '''
+    if sf is None:
+        sf = StructuralFeatures(database_root)
+    output_dir = os.path.join(sf.database_root, background_name, '')
+    stats = read_statistics(output_dir)
+    if background_disorder_cutoff(output_dir) != sf.disorder_cutoff:
+        raise ValueError(background_name + ' was built with a disorder cutoff of ' + str(background_disorder_cutoff(output_dir)) + ', load the databases with the same disorder_cutoff to update it')
+    if use_weight is None:
+        use_weight = stats['use_weight']
+    for genes in add or []:
+        stats = merge_statistics(sf, stats, set_members(sf, genes, use_weight))
+    for genes in remove or []:
+        stats = merge_statistics(sf, stats, set_members(sf, genes, use_weight), -1)
+    average_lines, frequency_lines, substructure_lines = statistics_views(stats)
+    write_background(output_dir, average_lines, frequency_lines, substructure_lines, stats['proteins_found'], sf.disorder_cutoff)
+    write_statistics(output_dir, stats)
+    from derived_features import member_derived_lines, derived_background_name
+    if sf.derived is not None:
+        # recomputed from the proteins now in the background
+        with open(output_dir + derived_background_name, 'w') as fo:
+            fo.write(''.join(line + '\n' for line in member_derived_lines(sf, stats['members'], stats['use_weight'])))
+    elif os.path.exists(output_dir + derived_background_name):
+        # cannot be recomputed without the definitions, taken out so derived features are not tested against the proteins before the update
+        os.remove(output_dir + derived_background_name)
+    sf.backgrounds.pop(background_name, None)
+    return stats['proteins_found']
+
+def update_background_from_files(background_name, add_dir=None, remove_dir=None, database_root='./databases/'):
+    '''
+    update_background with the gene lists of every file in a directory to add and a directory to remove
+    Inputs:
+        background_name: (str) background folder in database_root
+        add_dir: (str) directory of csv files of line separated gene or protien names, expression values to add, or '' for none
+        remove_dir: (str) directory of csv files to take out, or '' for none
+        database_root: (str) default './databases/', folder with the structural features databases
+    Outputs:
+        proteins_found: (int) number of proteins in the updated background
+    '''
+    sf = StructuralFeatures(database_root)
+    use_weight = read_statistics(os.path.join(sf.database_root, background_name, ''))['use_weight']
+    gene_lists = {}
+    for name, input_dir in (('add', add_dir), ('remove', remove_dir)):
+        gene_lists[name] = [read_sample_file(input_file, use_weight) for input_file in sorted(glob.glob(os.path.join(input_dir, '*')))] if input_dir else []
+    return update_background(background_name, gene_lists['add'], gene_lists['remove'], database_root, use_weight, sf)
+
+def make_background(input_folder, file_id, output_dir_name, proteins_found=None, database_root='./databases/'):
     '''
     Converts the output from structural features into background that structural features can use
     Inputs:
         input_folder: (str) path where to find the file the background will be generated from
         file_id: (str) name of the file the bacground will be generated from
         output_dir_name: (str) path and name of file to write to, doesn't need to already exist but can
+        proteins_found: (int) number of proteins found in the sample, written to number_proteins_found.csv when given
+        database_root: (str) default './databases/', folder the background is written into
     Outputs:
         1 (int) when complete
     '''
-    if not os.path.exists('./databases/'+output_dir_name + '/'):
-        os.makedirs('./databases/'+output_dir_name + '/')
-    output_dir = './databases/'+output_dir_name + '/'
-    out_average = ''
+    output_dir = os.path.join(database_root, output_dir_name, '')
+    out_average = []
     index = 0
     with open(input_folder + '/average_'+file_id+'.csv') as fo:
         for line in fo:
             if index != 0:
                 split_line = line[:-1].split(',')
-                out_average = out_average + split_line[0] + ',' + split_line[1] + ',' + split_line[2] + '\n'
+                out_average.append(split_line[0] + ',' + split_line[1] + ',' + split_line[2])
             index +=1
-    frequency = ''
-    domain = ''
-    fam = ''
-    superfam =''
-    fold = ''
+    frequency = []
+    substructure_lines = {sub_dict: [] for sub_dict in background_files}
     with open(input_folder + '/frequency_'+file_id+'.csv') as fo:
         for line in fo:
             split_line = line[:-1].split(',')
             if split_line[2] == 'N/A':
-                frequency = frequency + split_line[1] + ',' + split_line[3] + '\n'
-            elif split_line[2] == 'domain':
-                domain = domain + split_line[0] + ',' + split_line[3] + '\n'
-            elif split_line[2] == 'fold':
-                fold = fold + split_line[0] + ',' + split_line[3] + '\n'
-            elif split_line[2] == 'family':
-                fam = fam + split_line[0] + ',' + split_line[3] + '\n'
-            elif split_line[2] == 'superfamily':
-                superfam = superfam + split_line[0] + ',' + split_line[3] + '\n'
-    write_output(output_dir +'average_background.csv' ,out_average)
-    write_output(output_dir +'frequency_background.csv' ,frequency)
-    write_output(output_dir +'scop.fold.csv' ,fold)
-    write_output(output_dir +'ipr.domain.csv' ,domain)
-    write_output(output_dir +'scop.family.csv' ,fam)
-    write_output(output_dir +'scop.superfam.csv' ,superfam)
+                frequency.append(split_line[1] + ',' + split_line[3])
+            elif split_line[2] in substructure_lines:
+                substructure_lines[split_line[2]].append(split_line[0] + ',' + split_line[3])
+    write_background(output_dir, out_average, frequency, substructure_lines, proteins_found)
 
     return 1
 
-if __name__ == '__main__':
-    make_background('prot_backout_cmap', 'prot_over', 'prot_over')
-    make_background('prot_backout_cmap', 'prot_under', 'prot_under')
-    # make_background('norm_breast', 'gtex_breast', 'gtex_breast250')
-    # make_background(*sys.argv[1:])
-    # make_background('nonbreast_gtex_out/', 'all_ids', 'updated_human_background')
-    # files = glob.glob('rna_backout/*normal*')
-
-    # # files = glob.glob('proteomics_backout/*')
-    # for f in files:
-    #     # id = f.split('_')[-1].split('.')[0]
-    #     # make_background('proteomics_backout', id, id)
+def make_backgrounds_from_ids(id_lists, database_root='./databases/', use_weight=None, sf=None):
+    '''
+    Builds backgrounds straight from the precounted features and the scope and interproscan database, without running structural features first
+    All protein sets are aggregated together in one pass and every background folder is written at the end
+    Inputs:
+        id_lists: (dict) background folder name mapped to a gene list (list of names, (name, weight) tuples, or names mapped to weights)
+        database_root: (str) default './databases/', folder with the structural features databases, backgrounds are written into it
+        use_weight: (bool) weigh the averages by the weights, by default True for lists given with weights
+        sf: (StructuralFeatures) already loaded databases to use instead of loading database_root, loaded with derived features their derived_background.csv is written too
+    Outputs:
+        number_found: (dict) background folder name mapped to the number of proteins found
+    '''
+    if sf is None:
+        sf = StructuralFeatures(database_root)
+    names = list(id_lists)
+    batch = sf.aggregate_many([id_lists[name] for name in names], use_weight)
+    # checked before any folder is written, a background with no proteins would have no averages
+    empty = [names[row] for row in range(len(names)) if batch['found'][row] == 0]
+    if empty:
+        raise ValueError('None of the genes or protiens of the background ' + ', '.join(empty) + ' were found in the structural features database')
+    frequency_index = [all_headers.index(label) for label in frequency_features]
+    average_index = [all_headers.index(label) for label in average_features]
+    substructures = {}
+    for sub_dict in background_files:
+        matrix, keys = batch['substructures'][sub_dict]
+        substructures[sub_dict] = (matrix.tocsr(), [key[0] for key in keys])
+    all_statistics = batch_statistics(sf, batch, [id_lists[name] for name in names])
+    number_found = {}
+    for row in range(len(names)):
+        average = batch['average'][row]
+        sd = batch['sd'][row]
+        average_lines = [average_features[index] + ',' + str(average[average_index[index]]) + ',' + str(sd[index]) for index in range(len(average_features))]
+        frequency_lines = [frequency_features[index] + ',' + str(average[frequency_index[index]]) for index in range(len(frequency_features))]
+        stats = all_statistics[row]
+        for sub_dict in substructures:
+            # classes with the same structure id but different descriptions are counted together, one line per structure id
+            matrix, structure_ids = substructures[sub_dict]
+            start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+            counts = {}
+            for column, count in zip(matrix.indices[start:stop], matrix.data[start:stop]):
+                if structure_ids[column] != 'NULL' and count != 0:
+                    counts[structure_ids[column]] = counts.get(structure_ids[column], 0) + int(count)
+            stats['substructures'][sub_dict] = counts
+        substructure_lines = {sub_dict: [structure_id + ',' + str(count) for structure_id, count in stats['substructures'][sub_dict].items()] for sub_dict in background_files}
+        number_found[names[row]] = int(batch['found'][row])
+        write_background(os.path.join(sf.database_root, names[row], ''), average_lines, frequency_lines, substructure_lines, number_found[names[row]], sf.disorder_cutoff)
+        # running sums kept so the background can be updated with update_background
+        write_statistics(os.path.join(sf.database_root, names[row], ''), stats)
+        if sf.derived is not None:
+            from derived_features import derived_background_lines, derived_background_name
+            lines = derived_background_lines(batch['derived_labels'], batch['derived_average'][row], dict(zip(batch['derived_sd_labels'], batch['derived_sd'][row])), sf.derived.expressions)
+            with open(os.path.join(sf.database_root, names[row], derived_background_name), 'w') as fo:
+                fo.write(''.join(line + '\n' for line in lines))
+    return number_found
 
+def make_backgrounds_from_id_files(input_dir, use_weight=False, database_root='./databases/'):
+    '''
+    Builds one background per file of gene or protien names in a directory, named after the file without its extension
+    Inputs:
+        input_dir: (str) directory of csv files containing line separated gene or protien names, expression values
+        use_weight: (bool or str) default False, weigh the averages by the expression values
+        database_root: (str) default './databases/', folder with the structural features databases, backgrounds are written into it
+    Outputs:
+        number_found: (dict) background folder name mapped to the number of proteins found
+    '''
+    use_weight = parse_bool(use_weight)
+    id_lists = {}
+    for input_file in sorted(glob.glob(os.path.join(input_dir, '*'))):
+        id_lists[os.path.splitext(os.path.basename(input_file))[0]] = read_sample_file(input_file, use_weight)
+    return make_backgrounds_from_ids(id_lists, database_root, use_weight)
 
-    #     id = f.split('_')[-1].split('-')[0]
-    #     make_background('rna_backout', id+'-normal-tissue', id)
\ No newline at end of file
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'from_ids':
+        make_backgrounds_from_id_files(*sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'update':
+        update_background_from_files(*sys.argv[2:])
+    else:
+        make_background(*sys.argv[1:])
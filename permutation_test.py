@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Permutation Tests          ###
+#######################################################
+
+# import statements
+import multiprocessing
+import numpy as np
+from generate_structural_features import header, headeralpha, frequency_features, average_features, substructure_types
+
+# set by init_worker in each worker process
+worker_null = None
+
+# functions
+def random_index_sets(universe_size, set_size, num_sets, rng):
+    '''
+    Draws random sets of distinct indices, all at once
+    Inputs:
+        universe_size (int): indices are drawn from 0 to universe_size-1
+        set_size (int): number of indices in each set
+        num_sets (int): number of sets
+        rng (numpy Generator): random number generator
+    Outputs:
+        (numpy array) num_sets x set_size indices, distinct within each row
+    '''
+    if set_size > universe_size:
+        raise ValueError('Cannot draw ' + str(set_size) + ' proteins from a universe of ' + str(universe_size))
+    keys = rng.random((num_sets, universe_size))
+    return np.argpartition(keys, set_size - 1, axis=1)[:, :set_size] if set_size < universe_size else np.tile(np.arange(universe_size), (num_sets, 1))
+
+def init_worker(null):
+    global worker_null
+    worker_null = null
+
+def count_block_in_worker(task):
+    return worker_null.count_block(*task)
+
+class PermutationNull:
+    '''
+    Feature and class count matrices of a universe of proteins, used to score random protein sets of the same size as a sample
+    Derived features are columns of the feature matrices too, averaged like the built in features of their table
+    '''
+    def __init__(self, sf, universe=None, block_size=None):
+        '''
+        Inputs:
+            sf (StructuralFeatures): loaded databases
+            universe (list): gene or protien names random sets are drawn from, default every protien in the precounted human genome
+            block_size (int): number of random sets scored per matrix product, default keeps each block near 4 million random numbers
+        '''
+        if universe is None:
+            self.ids = list(sf.human_ids)
+        else:
+            self.ids = [gnuid for gnuid in dict.fromkeys(universe) if gnuid in sf.human_rows]
+        human_values = sf.human_values
+        alpha_values = sf.alpha_values
+        human_labels = header[1:]
+        alpha_labels = headeralpha
+        self.frequency_labels = frequency_features
+        self.average_labels = average_features
+        if sf.derived is not None:
+            human_values = np.hstack([human_values, sf.human_derived])
+            alpha_values = np.hstack([alpha_values, sf.alpha_derived])
+            human_labels = human_labels + sf.derived.table_labels('human')
+            alpha_labels = alpha_labels + sf.derived.table_labels('alpha')
+            self.frequency_labels = self.frequency_labels + sf.derived.frequency_labels
+            self.average_labels = self.average_labels + sf.derived.average_labels
+        # columns of the null averages, the human ones first
+        self.labels = human_labels + alpha_labels
+        self.human_width = len(human_labels)
+        self.human_values = np.asarray(human_values)[[sf.human_rows[gnuid] for gnuid in self.ids]]
+        has_alpha = np.array([gnuid in sf.alpha_rows for gnuid in self.ids], dtype=bool)
+        self.alpha_mask = has_alpha.astype(float)
+        self.alpha_values = np.zeros((len(self.ids), len(alpha_labels)))
+        self.alpha_values[has_alpha] = np.asarray(alpha_values)[[sf.alpha_rows[gnuid] for gnuid in self.ids if gnuid in sf.alpha_rows]]
+        self.substructures = {}
+        matrices = sf.substructure_matrices(self.ids)
+        for sub_dict in substructure_types:
+            matrix, keys = matrices[sub_dict]
+            self.substructures[sub_dict] = (matrix.tocsc(), {keys[index]: index for index in range(len(keys))})
+        self.block_size = block_size or max(1, 4000000//max(len(self.ids), 1))
+        self.frequency_index = [self.labels.index(label) for label in self.frequency_labels]
+        self.average_index = [self.labels.index(label) for label in self.average_labels]
+        self.task = None
+
+    def prepare(self, summary):
+        '''
+        Stores what random sets are compared against: the sample's weights and observed values
+        Inputs:
+            summary (dict): output of StructuralFeatures.aggregate for the sample
+        '''
+        if summary['found'] == 0:
+            raise ValueError('None of the genes or protiens were found in the structural features database')
+        weights = np.array(list(summary['weights'].values()), dtype=float)
+        observed = np.array([summary['average'][label] for label in self.labels])
+        universe_average = np.concatenate([self.human_values.mean(axis=0), self.alpha_values[self.alpha_mask > 0].mean(axis=0) if self.alpha_mask.any() else np.zeros(len(self.labels) - self.human_width)])
+        # the average of a random set is centered on the universe average scaled like the sample's weights
+        expected = universe_average.copy()
+        expected[:self.human_width] *= weights.sum()/summary['tot_weight']
+        term_columns = {}
+        term_observed = {}
+        for sub_dict in substructure_types:
+            matrix, columns = self.substructures[sub_dict]
+            keys = [elt for elt in summary['substructures'][sub_dict] if elt[0] != 'NULL']
+            term_columns[sub_dict] = (keys, np.array([columns.get(elt, -1) for elt in keys], dtype=np.int64))
+            term_observed[sub_dict] = np.array([summary['substructures'][sub_dict][elt] for elt in keys], dtype=float)
+        self.task = {
+            'weights': weights,
+            'tot_weight': summary['tot_weight'],
+            'observed': observed,
+            'expected': expected,
+            'term_columns': term_columns,
+            'term_observed': term_observed,
+        }
+
+    def count_block(self, seed, num_sets):
+        '''
+        Scores one block of random sets and counts how often they are at least as extreme as the sample
+        Inputs:
+            seed (numpy SeedSequence): seed of this block
+            num_sets (int): number of random sets in the block
+        Outputs:
+            exceed (dict): counts for the count features, the continous features and each structure type's classes
+        '''
+        from scipy.sparse import csr_matrix
+        task = self.task
+        rng = np.random.default_rng(seed)
+        set_size = len(task['weights'])
+        indices = random_index_sets(len(self.ids), set_size, num_sets, rng)
+        rows = np.repeat(np.arange(num_sets), set_size)
+        weight_matrix = csr_matrix((np.tile(task['weights'], num_sets), (rows, indices.ravel())), shape=(num_sets, len(self.ids)))
+        present = csr_matrix((np.ones(num_sets*set_size), (rows, indices.ravel())), shape=(num_sets, len(self.ids)))
+
+        human_average = np.asarray(weight_matrix @ self.human_values)/task['tot_weight']
+        alpha_weights = weight_matrix.multiply(self.alpha_mask[None, :]).tocsr()
+        alpha_sums = np.asarray(alpha_weights.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha_average = np.where(alpha_sums[:, None] > 0, np.asarray(alpha_weights @ self.alpha_values)/alpha_sums[:, None], 0)
+        null = np.hstack([human_average, alpha_average])
+
+        observed = task['observed']
+        frequency_null = null[:, self.frequency_index]
+        frequency_observed = observed[self.frequency_index]
+        exceed = {'frequency': ((frequency_null >= frequency_observed) | np.isclose(frequency_null, frequency_observed)).sum(axis=0)}
+        expected = task['expected'][self.average_index]
+        distance = np.abs(null[:, self.average_index] - expected)
+        observed_distance = np.abs(observed[self.average_index] - expected)
+        exceed['average'] = ((distance >= observed_distance) | np.isclose(distance, observed_distance)).sum(axis=0)
+        for sub_dict in substructure_types:
+            keys, columns = task['term_columns'][sub_dict]
+            matrix = self.substructures[sub_dict][0]
+            counts = np.zeros((num_sets, len(columns)))
+            known = columns >= 0
+            if known.any():
+                counts[:, known] = (present @ matrix[:, columns[known]]).toarray()
+            exceed[sub_dict] = (counts >= task['term_observed'][sub_dict]).sum(axis=0)
+        return exceed
+
+    def pvalues(self, summary, num_permutations=1000, processes=1, seed=None):
+        '''
+        Empirical p values of a sample from random protien sets of the same size drawn from the universe
+        Inputs:
+            summary (dict): output of StructuralFeatures.aggregate for the sample
+            num_permutations (int): number of random sets
+            processes (int): default 1, number of processes to spread the random sets over
+            seed (int): seed for reproducible random sets, results do not depend on processes
+        Outputs:
+            empirical (dict): 'frequency' and 'average' map feature labels to p values, 'substructures' maps structure types to {class key: p value}
+        '''
+        self.prepare(summary)
+        block_sizes = [self.block_size]*(num_permutations//self.block_size)
+        if num_permutations % self.block_size:
+            block_sizes.append(num_permutations % self.block_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(block_sizes))
+        tasks = list(zip(seeds, block_sizes))
+        if processes > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(min(processes, len(tasks)), initializer=init_worker, initargs=(self,)) as pool:
+                results = pool.map(count_block_in_worker, tasks)
+        else:
+            results = [self.count_block(*task) for task in tasks]
+        exceed = {name: sum(result[name] for result in results) for name in results[0]}
+        empirical = {
+            'frequency': dict(zip(self.frequency_labels, (1 + exceed['frequency'])/(1 + num_permutations))),
+            'average': dict(zip(self.average_labels, (1 + exceed['average'])/(1 + num_permutations))),
+            'substructures': {},
+        }
+        for sub_dict in substructure_types:
+            keys = self.task['term_columns'][sub_dict][0]
+            empirical['substructures'][sub_dict] = dict(zip(keys, (1 + exceed[sub_dict])/(1 + num_permutations)))
+        return empirical
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Predictor Output Archives  ###
+#######################################################
+
+# import statements
+import os
+import io
+import glob
+import zlib
+import tarfile
+from collections import OrderedDict
+
+# archive endings tried, in order, for a predictor output directory that was not extracted
+archive_endings = ['.tar.gz', '.tgz', '.tar.zst', '.tar']
+# open ArchiveIndex objects by archive path
+archives = {}
+
+# functions
+def open_tar_stream(archive_path):
+    '''
+    Opens a tar archive for reading its members one after the other, without seeking
+    Inputs:
+        archive_path (str): .tar.gz, .tgz, .tar.zst or .tar file
+    Outputs:
+        (tarfile.TarFile) in stream mode
+    '''
+    if archive_path.endswith('.tar.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('Reading .tar.zst archives needs the zstandard package, install it with pip install zstandard')
+        reader = zstandard.ZstdDecompressor().stream_reader(open(archive_path, 'rb'))
+        return tarfile.open(fileobj=reader, mode='r|')
+    if archive_path.endswith('.tar.gz') or archive_path.endswith('.tgz'):
+        return tarfile.open(archive_path, mode='r|gz')
+    return tarfile.open(archive_path, mode='r|')
+
+class ArchiveIndex:
+    '''
+    File index of a tar archive of predictor outputs, read front to back
+    Members are found by file name (without the folders inside the archive). Asking for a member further on reads forward and keeps the members passed over, compressed, until they are asked for, so files asked for in about the order they were archived are read in one pass
+    Asking for a member that was passed and dropped from memory starts reading the archive again from the beginning
+    '''
+    def __init__(self, archive_path, cache_limit_mb=256):
+        '''
+        Inputs:
+            archive_path (str): .tar.gz, .tgz, .tar.zst or .tar file
+            cache_limit_mb (float): default 256, memory for members read ahead of when they are asked for, in MB compressed
+        '''
+        self.archive_path = archive_path
+        self.cache_limit = float(cache_limit_mb)*1024*1024
+        self.cache = OrderedDict()
+        self.cache_size = 0
+        self.stream = None
+        self.members = None
+        self.restarts = 0
+        self.names = self.list_names()
+
+    def list_names(self):
+        '''
+        File names in the archive, from a .members file next to the archive when it is newer than the archive, otherwise from one pass over the archive which then writes the .members file
+        Outputs:
+            (list) file names in archive order
+        '''
+        members_path = self.archive_path + '.members'
+        if os.path.exists(members_path) and os.path.getmtime(members_path) >= os.path.getmtime(self.archive_path):
+            with open(members_path) as fo:
+                return [line.rstrip('\n') for line in fo]
+        names = []
+        with open_tar_stream(self.archive_path) as tar:
+            for member in tar:
+                if member.isfile():
+                    names.append(os.path.basename(member.name))
+        try:
+            with open(members_path, 'w') as fo:
+                fo.write(''.join(name + '\n' for name in names))
+        except OSError:
+            pass
+        return names
+
+    def restart(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = open_tar_stream(self.archive_path)
+        self.members = iter(self.stream)
+
+    def keep(self, name, data):
+        '''
+        Keeps a member in memory, dropping the oldest kept members past the memory limit
+        '''
+        if name in self.cache:
+            self.cache_size -= len(self.cache.pop(name))
+        compressed = zlib.compress(data, 1)
+        self.cache[name] = compressed
+        self.cache_size += len(compressed)
+        while self.cache_size > self.cache_limit and len(self.cache) > 1:
+            self.cache_size -= len(self.cache.popitem(last=False)[1])
+
+    def read(self, name):
+        '''
+        Reads one member
+        Inputs:
+            name (str): file name of the member
+        Outputs:
+            (bytes) contents
+        '''
+        if name in self.cache:
+            self.cache.move_to_end(name)
+            return zlib.decompress(self.cache[name])
+        for attempt in range(2):
+            if self.stream is None or attempt == 1:
+                if attempt == 1:
+                    self.restarts += 1
+                self.restart()
+            for member in self.members:
+                if not member.isfile():
+                    continue
+                data = self.stream.extractfile(member).read()
+                member_name = os.path.basename(member.name)
+                self.keep(member_name, data)
+                if member_name == name:
+                    return data
+        raise FileNotFoundError(name + ' is not in ' + self.archive_path)
+
+    def open(self, name):
+        '''
+        Opens one member as a text file
+        Inputs:
+            name (str): file name of the member
+        Outputs:
+            (io.TextIOWrapper) the member contents, usable like open(path)
+        '''
+        return io.TextIOWrapper(io.BytesIO(self.read(name)))
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+def archive_for_directory(directory):
+    '''
+    Finds the archive standing in for a predictor output directory that was not extracted
+    Inputs:
+        directory (str): directory, like databases/iupred2a_long/
+    Outputs:
+        (ArchiveIndex) or None when the directory exists or there is no archive of it
+    '''
+    directory = directory.rstrip('/')
+    if os.path.isdir(directory):
+        return None
+    for ending in archive_endings:
+        archive_path = directory + ending
+        if os.path.exists(archive_path):
+            if archive_path not in archives:
+                archives[archive_path] = ArchiveIndex(archive_path)
+            return archives[archive_path]
+    return None
+
+def list_input_files(directory):
+    '''
+    Lists the files of a predictor output directory, or of its archive when the directory was not extracted
+    Inputs:
+        directory (str): directory ending in /
+    Outputs:
+        (list) paths, for an archive the paths the files would have if it was extracted into directory
+    '''
+    archive = archive_for_directory(directory)
+    if archive is None:
+        return glob.glob(directory + '*')
+    return [directory + name for name in archive.names]
+
+def open_input(path):
+    '''
+    Opens a predictor output file, from its archive when its directory was not extracted
+    Inputs:
+        path (str): path of the file as if extracted
+    Outputs:
+        file object for reading text
+    '''
+    if os.path.exists(path):
+        return open(path)
+    archive = archive_for_directory(os.path.dirname(path))
+    if archive is None:
+        return open(path)
+    return archive.open(os.path.basename(path))
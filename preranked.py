@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Preranked Enrichment       ###
+#######################################################
+
+# import statements
+import sys
+import os
+import glob
+import multiprocessing
+import numpy as np
+from generate_structural_features import StructuralFeatures, read_sample_file, gene_weight_pairs, format_term_key, header, headeralpha
+
+preranked_columns = ['structure_id', 'structure', 'structure_type', 'set_size', 'enrichment_score', 'normalized_enrichment_score', 'pvalue', 'fdr', 'leading_edge_size']
+
+# set by init_worker in each worker process
+worker_enrichment = None
+
+# functions
+def running_sum_scores(positions, weights, starts, set_sizes, num_ranked):
+    '''
+    Running sum enrichment scores of many terms over one or more rankings, from the rank positions of each term's proteins only
+    The running sum goes up by a protien's weight over the term's total weight at each of its proteins and down by 1 over the number of other proteins at every other protien, so its largest and smallest values are right at and right before one of the term's proteins
+    Inputs:
+        positions (numpy array): rankings x entries rank positions of the term proteins, terms one after another and sorted within each term
+        weights (numpy array): weight of each rank position, like the absolute score
+        starts (numpy array): first entry of each term
+        set_sizes (numpy array): number of entries of each term, at least 1 and fewer than num_ranked
+        num_ranked (int): number of ranked proteins
+    Outputs:
+        scores (numpy array): rankings x terms enrichment scores, the largest distance of the running sum from 0 with its sign
+        leading_edge (numpy array): rankings x terms number of term proteins before the largest value (from the top) or after the smallest value (from the bottom)
+    '''
+    positions = np.atleast_2d(positions)
+    hit_weights = weights[positions]
+    cumulative = np.hstack([np.zeros((len(positions), 1)), np.cumsum(hit_weights, axis=1)])
+    offsets = np.repeat(cumulative[:, starts], set_sizes, axis=1)
+    totals = np.repeat(cumulative[:, starts + set_sizes] - cumulative[:, starts], set_sizes, axis=1)
+    entry = np.arange(positions.shape[1])
+    hits = entry - np.repeat(starts, set_sizes) + 1
+    misses = np.repeat(num_ranked - set_sizes, set_sizes).astype(float)
+    within = cumulative[:, 1:] - offsets
+    with np.errstate(divide='ignore', invalid='ignore'):
+        after = within/totals - (positions + 1 - hits)/misses
+        before = (within - hit_weights)/totals - (positions - hits + 1)/misses
+    highest = np.maximum.reduceat(after, starts, axis=1)
+    lowest = np.minimum.reduceat(before, starts, axis=1)
+    positive = highest >= -lowest
+    scores = np.where(positive, highest, lowest)
+    # first entry at each extreme, counted from the start of its term
+    last = positions.shape[1]
+    top = np.minimum.reduceat(np.where(after == np.repeat(highest, set_sizes, axis=1), entry, last), starts, axis=1) - starts + 1
+    bottom = np.minimum.reduceat(np.where(before == np.repeat(lowest, set_sizes, axis=1), entry, last), starts, axis=1) - starts
+    leading_edge = np.where(positive, top, set_sizes - bottom)
+    return scores, leading_edge
+
+def init_worker(enrichment):
+    global worker_enrichment
+    worker_enrichment = enrichment
+
+def null_block_in_worker(task):
+    return worker_enrichment.null_block(*task)
+
+class PrerankedEnrichment:
+    '''
+    Running sum enrichment of scope and interproscan classes and of the count features (a protien has the feature when its value is above 0) along a ranked list of genes or proteins, with no cutoff
+    Empirical p values come from shuffling the ranking, many shuffles per matrix operation
+    '''
+    def __init__(self, sf, ranked, weight_power=1.0, min_size=1, block_size=None):
+        '''
+        Inputs:
+            sf (StructuralFeatures): loaded databases, only its selected feature groups are tested
+            ranked (list, dict or pandas Series): (name, score) tuples or names mapped to scores, ranked from the highest score, or names alone already in ranked order
+            weight_power (float): default 1.0, each protien steps the running sum by its absolute score to this power, 0 for steps of the same size
+            min_size (int): default 1, fewest ranked proteins a term needs to be tested
+            block_size (int): number of shuffles per matrix operation, default keeps each block near 4 million entries
+        '''
+        pairs, has_weights = gene_weight_pairs(ranked)
+        if has_weights:
+            pairs = sorted(pairs, key=lambda pair: -pair[1])
+        scores = {}
+        for gnuid, score in pairs:
+            # like the human features, the first time a name is ranked counts
+            if gnuid in sf.human_rows and gnuid not in scores:
+                scores[gnuid] = score
+        self.ids = list(scores)
+        if len(self.ids) < 2:
+            raise ValueError('Fewer than 2 of the ranked genes or protiens were found in the structural features database')
+        self.weights = np.abs(np.array(list(scores.values()), dtype=float))**float(weight_power)
+        self.terms, matrix = self.incidence(sf)
+        set_sizes = np.diff(matrix.indptr)
+        tested = (set_sizes >= max(int(min_size), 1)) & (set_sizes < len(self.ids))
+        self.terms = [self.terms[column] for column in np.flatnonzero(tested)]
+        matrix = matrix[:, tested]
+        matrix.sort_indices()
+        # protien rows are in rank order, so the row of each entry is its rank position
+        self.members = matrix.indices.astype(np.int64)
+        self.set_sizes = np.diff(matrix.indptr).astype(np.int64)
+        self.starts = matrix.indptr[:-1].astype(np.int64)
+        # each shuffle holds a random number and a position per ranked protien, and a position per term entry
+        self.block_size = block_size or max(1, 4000000//(len(self.members) + len(self.ids)))
+
+    def incidence(self, sf):
+        '''
+        Which ranked proteins are in each term
+        Outputs:
+            terms (list): (structure id, structure, structure type) per column, ('N/A', label, 'N/A') for count features like the frequency output
+            matrix (scipy sparse csc matrix): ranked proteins x terms, 1 where the protien is in the term
+        '''
+        from scipy.sparse import csc_matrix, hstack
+        terms = []
+        blocks = []
+        if sf.frequency_labels:
+            present = np.zeros((len(self.ids), len(sf.frequency_labels)), dtype=bool)
+            human_labels = [label for label in sf.frequency_labels if label in header]
+            alpha_labels = [label for label in sf.frequency_labels if label in headeralpha]
+            human_values = sf.human_values[[sf.human_rows[gnuid] for gnuid in self.ids]]
+            present[:, :len(human_labels)] = human_values[:, [header.index(label) - 1 for label in human_labels]] > 0
+            has_alpha = [index for index in range(len(self.ids)) if self.ids[index] in sf.alpha_rows]
+            alpha_values = sf.alpha_values[[sf.alpha_rows[self.ids[index]] for index in has_alpha]]
+            present[has_alpha, len(human_labels):] = alpha_values[:, [headeralpha.index(label) for label in alpha_labels]].reshape(len(has_alpha), len(alpha_labels)) > 0
+            terms += [('N/A', label, 'N/A') for label in human_labels + alpha_labels]
+            blocks.append(csc_matrix(present, dtype=float))
+        matrices = sf.substructure_matrices(self.ids)
+        for sub_dict in sf.substructure_types:
+            matrix, keys = matrices[sub_dict]
+            known = [column for column in range(len(keys)) if keys[column][0] != 'NULL']
+            for column in known:
+                structure_id, structure = format_term_key(keys[column]).split(',', 1)
+                terms.append((structure_id, structure, sub_dict))
+            blocks.append((matrix[:, known] > 0).astype(float).tocsc())
+        if not blocks:
+            return terms, csc_matrix((len(self.ids), 0))
+        return terms, hstack(blocks, format='csc')
+
+    def observed(self):
+        '''
+        Enrichment scores and leading edge sizes of the ranking
+        '''
+        scores, leading_edge = running_sum_scores(self.members, self.weights, self.starts, self.set_sizes, len(self.ids))
+        return scores[0], leading_edge[0]
+
+    def null_block(self, seed, num_shuffles, observed):
+        '''
+        Scores one block of shuffled rankings and sums what the normalized scores and p values need
+        Inputs:
+            seed (numpy SeedSequence): seed of this block
+            num_shuffles (int): number of shuffled rankings in the block
+            observed (numpy array): enrichment scores of the ranking
+        Outputs:
+            sums (dict): per term, the number and summed size of positive and of negative shuffled scores, and how many are at least as extreme as observed with the same sign
+        '''
+        rng = np.random.default_rng(seed)
+        num_ranked = len(self.ids)
+        shuffles = rng.random((num_shuffles, num_ranked)).argsort(axis=1)
+        # sorting by term then position keeps each term's entries together
+        term_offsets = np.repeat(np.arange(len(self.set_sizes), dtype=np.int64)*num_ranked, self.set_sizes)
+        positions = np.sort(shuffles[:, self.members] + term_offsets, axis=1) - term_offsets
+        scores = running_sum_scores(positions, self.weights, self.starts, self.set_sizes, num_ranked)[0]
+        positive = scores >= 0
+        extreme = np.where(observed >= 0, positive & ((scores >= observed) | np.isclose(scores, observed)), ~positive & ((scores <= observed) | np.isclose(scores, observed)))
+        return {
+            'positive_count': positive.sum(axis=0),
+            'positive_sum': np.where(positive, scores, 0).sum(axis=0),
+            'negative_count': (~positive).sum(axis=0),
+            'negative_sum': np.where(positive, 0, -scores).sum(axis=0),
+            'extreme': extreme.sum(axis=0),
+        }
+
+    def rows(self, num_shuffles=1000, processes=1, seed=None):
+        '''
+        Tests every term
+        Inputs:
+            num_shuffles (int): default 1000, number of shuffled rankings, 0 for enrichment scores only
+            processes (int): default 1, number of processes to spread the shuffles over
+            seed (int): seed for reproducible shuffles, results do not depend on processes
+        Outputs:
+            (list) one tuple per term in preranked_columns order, the normalized score divides by the average shuffled score of the same sign and the p value counts shuffled scores of the same sign
+        '''
+        from statsmodels.stats.multitest import fdrcorrection
+        if not self.terms:
+            return []
+        observed, leading_edge = self.observed()
+        normalized = np.full(len(observed), np.nan)
+        p_values = np.full(len(observed), np.nan)
+        if num_shuffles:
+            block_sizes = [self.block_size]*(num_shuffles//self.block_size)
+            if num_shuffles % self.block_size:
+                block_sizes.append(num_shuffles % self.block_size)
+            seeds = np.random.SeedSequence(seed).spawn(len(block_sizes))
+            tasks = [(seeds[index], block_sizes[index], observed) for index in range(len(block_sizes))]
+            if processes > 1 and len(tasks) > 1:
+                with multiprocessing.Pool(min(processes, len(tasks)), initializer=init_worker, initargs=(self,)) as pool:
+                    results = pool.map(null_block_in_worker, tasks)
+            else:
+                results = [self.null_block(*task) for task in tasks]
+            sums = {name: sum(result[name] for result in results) for name in results[0]}
+            same_count = np.where(observed >= 0, sums['positive_count'], sums['negative_count'])
+            same_average = np.where(observed >= 0, sums['positive_sum'], sums['negative_sum'])/np.maximum(same_count, 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                normalized = np.where(same_count > 0, observed/same_average, np.nan)
+            p_values = (1 + sums['extreme'])/(1 + same_count)
+        fdr_list = np.full(len(observed), np.nan)
+        if num_shuffles:
+            # like the frequency output, the count features and each structure type are corrected separately
+            structure_types = np.array([term[2] for term in self.terms])
+            for structure_type in dict.fromkeys(structure_types):
+                columns = np.flatnonzero(structure_types == structure_type)
+                fdr_list[columns] = fdrcorrection(p_values[columns])[1]
+        return [self.terms[index] + (int(self.set_sizes[index]), observed[index], normalized[index], p_values[index], fdr_list[index], int(leading_edge[index])) for index in range(len(self.terms))]
+
+def preranked_enrichment(sf, ranked, num_shuffles=1000, processes=1, seed=None, weight_power=1.0, min_size=1):
+    '''
+    Running sum enrichment of every scope and interproscan class and count feature along a ranked gene list
+    Inputs:
+        sf (StructuralFeatures): loaded databases
+        ranked (list, dict or pandas Series): (name, score) tuples or names mapped to scores like fold changes, or names alone already in ranked order
+        num_shuffles (int): default 1000, number of shuffled rankings for the p values
+        processes (int): default 1, number of processes to spread the shuffles over
+        seed (int): seed for reproducible shuffles
+        weight_power (float): default 1.0, see PrerankedEnrichment
+        min_size (int): default 1, fewest ranked proteins a term needs to be tested
+    Outputs:
+        (pandas DataFrame) preranked_columns, one row per term
+    '''
+    import pandas as pd
+    enrichment = PrerankedEnrichment(sf, ranked, weight_power, min_size)
+    return pd.DataFrame(enrichment.rows(num_shuffles, processes, seed), columns=preranked_columns)
+
+def preranked_for_all_files_in_folder(input_dir, folder_out, num_shuffles=1000, processes=1, database_root='./databases/', features=None, weight_power=1.0, min_size=1):
+    '''
+    Runs the preranked enrichment of every input file of a directory, each file has one gene or protien name and score per line
+    Inputs:
+        input_dir (str): directory containing all input files
+        folder_out (str): directory the preranked_ output files are written to
+        num_shuffles (int): default 1000, number of shuffled rankings for the p values
+        processes (int): default 1, number of processes to spread the shuffles over
+        database_root (str): default './databases/', folder with the unzipped structural features databases
+        features (str): default None for all, comma separated feature groups, see parse_feature_groups
+        weight_power (float): default 1.0, see PrerankedEnrichment
+        min_size (int): default 1, fewest ranked proteins a term needs to be tested
+    Outputs:
+        (int) number of files run
+    '''
+    from generate_structural_features import write_output, format_rows
+    sf = StructuralFeatures(database_root, features=features)
+    if not os.path.exists(folder_out):
+        os.makedirs(folder_out)
+    input_files = sorted(glob.glob(input_dir + '*'))
+    run = 0
+    for sample_file in input_files:
+        try:
+            enrichment = PrerankedEnrichment(sf, read_sample_file(sample_file, True), float(weight_power), int(min_size))
+            rows = enrichment.rows(int(num_shuffles), int(processes))
+        except ValueError:
+            write_output(folder_out + 'errors.csv', sample_file + '\n')
+            continue
+        with open(folder_out + 'preranked_' + sample_file.split('/')[-1], 'w') as fo:
+            fo.write(','.join(preranked_columns) + '\n' + format_rows(rows))
+        run += 1
+    return run
+
+if __name__ == '__main__':
+    # python preranked.py input_dir/ output_dir/ [num_shuffles] [processes] [databases/] [features] [weight_power] [min_size]
+    print(preranked_for_all_files_in_folder(*sys.argv[1:]))
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Per Residue Store          ###
+#######################################################
+
+# import statements
+import sys
+import os
+import json
+import numpy as np
+from predictor_archive import list_input_files, open_input
+
+# tracks of the alpha fold residue store and their types
+alphafold_tracks = {'dssp_residue': 'S1', 'dssp_state': 'S1', 'a3d_residue': 'S1', 'a3d_score': 'float32', 'com_distance': 'float32'}
+alphafold_store_name = 'alphafold_residues'
+# dssp states counted by get_afdssp, in its order
+dssp_states = ['S', 'E', 'T', 'B', 'G', 'H']
+
+# functions
+class ResidueStoreWriter:
+    '''
+    Writes per residue tracks of many proteins into a residue store folder: one flat binary file per track, and for each track the offset of every protien in it
+    Proteins are added one at a time and written straight to disk, so memory use does not grow with the number of proteins
+    Example:
+        with ResidueStoreWriter('databases/alphafold_residues/', alphafold_tracks) as store:
+            store.add('P04637', {'dssp_state': states, 'a3d_score': scores})
+    '''
+    def __init__(self, store_dir, tracks):
+        '''
+        Inputs:
+            store_dir (str): folder of the store, created if needed, an earlier store in it is replaced
+            tracks (dict): track name mapped to a numpy type, like 'float32' or 'S1' for one letter per residue
+        '''
+        self.store_dir = os.path.join(store_dir, '')
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+        self.tracks = dict(tracks)
+        self.names = []
+        self.aliases = []
+        self.offsets = {track: [0] for track in self.tracks}
+        self.files = {track: open(self.store_dir + track + '.bin', 'wb') for track in self.tracks}
+
+    def add(self, name, values, aliases=None):
+        '''
+        Adds the tracks of one protien
+        Inputs:
+            name (str): gene or protien name
+            values (dict): track name mapped to one value per residue, tracks not given are left empty for this protien
+            aliases (list): other names the protien can be looked up by
+        '''
+        for track in values:
+            if track not in self.tracks:
+                raise ValueError(track + ' is not a track of this store, expected one of ' + ', '.join(self.tracks))
+        self.names.append(name)
+        self.aliases += [(alias, name) for alias in aliases or [] if alias != name]
+        for track in self.tracks:
+            array = np.asarray(values.get(track, []), dtype=self.tracks[track])
+            self.files[track].write(array.tobytes())
+            self.offsets[track].append(self.offsets[track][-1] + len(array))
+
+    def close(self):
+        for track in self.tracks:
+            self.files[track].close()
+            np.save(self.store_dir + track + '.offsets.npy', np.array(self.offsets[track], dtype=np.int64))
+        with open(self.store_dir + 'proteins.txt', 'w') as fo:
+            fo.write(''.join(name + '\n' for name in self.names))
+        with open(self.store_dir + 'aliases.txt', 'w') as fo:
+            fo.write(''.join(alias + '\t' + name + '\n' for alias, name in self.aliases))
+        # written last, a store without it was not finished
+        with open(self.store_dir + 'tracks.json', 'w') as fo:
+            json.dump(self.tracks, fo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class ResidueStore:
+    '''
+    Reads a residue store written by ResidueStoreWriter
+    The track files are memory mapped, so opening the store reads only the offsets and names, and a protien's residues are read from disk when they are asked for
+    '''
+    def __init__(self, store_dir):
+        '''
+        Inputs:
+            store_dir (str): folder of the store
+        '''
+        self.store_dir = os.path.join(store_dir, '')
+        if not os.path.exists(self.store_dir + 'tracks.json'):
+            raise FileNotFoundError(self.store_dir + ' is not a finished residue store')
+        with open(self.store_dir + 'tracks.json') as fo:
+            self.tracks = json.load(fo)
+        with open(self.store_dir + 'proteins.txt') as fo:
+            self.names = [line.rstrip('\n') for line in fo]
+        self.rows = {name: index for index, name in enumerate(self.names)}
+        if os.path.exists(self.store_dir + 'aliases.txt'):
+            with open(self.store_dir + 'aliases.txt') as fo:
+                for line in fo:
+                    alias, name = line.rstrip('\n').split('\t')
+                    self.rows.setdefault(alias, self.rows[name])
+        self.offsets = {track: np.load(self.store_dir + track + '.offsets.npy') for track in self.tracks}
+        self.data = {}
+        for track in self.tracks:
+            if self.offsets[track][-1] == 0:
+                self.data[track] = np.zeros(0, dtype=self.tracks[track])
+            else:
+                self.data[track] = np.memmap(self.store_dir + track + '.bin', dtype=self.tracks[track], mode='r')
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def has(self, track, name):
+        '''
+        True when the protien is in the store with at least one residue in the track
+        '''
+        if name not in self.rows:
+            return False
+        row = self.rows[name]
+        return self.offsets[track][row + 1] > self.offsets[track][row]
+
+    def track(self, track, name, start=None, stop=None):
+        '''
+        Values of one track of one protien, without copying them
+        Inputs:
+            track (str): track name
+            name (str): gene or protien name
+            start, stop (int): default the whole protien, first and last residue wanted, counting from 1 like sequence positions
+        Outputs:
+            (numpy array) one value per residue
+        '''
+        if name not in self.rows:
+            raise KeyError(name + ' is not in ' + self.store_dir)
+        row = self.rows[name]
+        first, last = self.offsets[track][row], self.offsets[track][row + 1]
+        if start is not None or stop is not None:
+            length = last - first
+            begin = 0 if start is None else min(max(int(start) - 1, 0), length)
+            end = length if stop is None else min(max(int(stop), begin), length)
+            first, last = first + begin, first + end
+        return self.data[track][first:last]
+
+def region_mask(length, regions):
+    '''
+    Marks the residues inside any of some regions
+    Inputs:
+        length (int): number of residues
+        regions (list): (start, stop) pairs of residue positions counting from 1, both ends included, like interproscan domain or disordered segment boundaries, None for the whole protien
+    Outputs:
+        mask (numpy array): True for residues inside a region
+    '''
+    if regions is None:
+        return np.ones(length, dtype=bool)
+    change = np.zeros(length + 1, dtype=np.int64)
+    for start, stop in regions:
+        begin = min(max(int(start) - 1, 0), length)
+        end = min(max(int(stop), begin), length)
+        change[begin] += 1
+        change[end] -= 1
+    return np.cumsum(change[:-1]) > 0
+
+def letter_counts(letters, out_dict):
+    '''
+    Adds the number of times each letter is seen to out_dict, in the order the letters first appear
+    '''
+    if len(letters) == 0:
+        return out_dict
+    values, first, counts = np.unique(letters, return_index=True, return_counts=True)
+    for position in np.argsort(first, kind='stable'):
+        out_dict[values[position].decode()] = int(counts[position])
+    return out_dict
+
+def dssp_counts(states, residues):
+    '''
+    The get_afdssp counts of per residue dssp states
+    Inputs:
+        states (numpy array): one dssp state letter per residue, as bytes
+        residues (numpy array): one amino acid letter per residue, as bytes
+    Outputs:
+        all_feats (dict of dicts): DSSP feature dictionary
+    '''
+    counted = np.isin(states, [state.encode() for state in dssp_states])
+    states = states[counted]
+    residues = residues[counted]
+    # a new region starts whenever the counted state differs from the last counted state, residues of other states in between do not end a region
+    starts = np.ones(len(states), dtype=bool)
+    starts[1:] = states[1:] != states[:-1]
+    all_feats = {}
+    for state in dssp_states:
+        in_state = states == state.encode()
+        all_feats[state] = letter_counts(residues[in_state], {'length': int(in_state.sum()), 'number': int((starts & in_state).sum())})
+    return all_feats
+
+def dssp_features(store, gnuid, regions=None):
+    '''
+    The get_afdssp features of a protien counted only over some regions
+    The selected residues are counted as if they were one protien, so with regions=None the output is the same as get_afdssp
+    Inputs:
+        store (ResidueStore): alpha fold residue store
+        gnuid (str): gene or uniprot ID
+        regions (list): (start, stop) residue ranges counted, see region_mask, default the whole protien
+    Outputs:
+        all_feats (dict of dicts): DSSP feature dictionary
+    '''
+    states = store.track('dssp_state', gnuid)
+    residues = store.track('dssp_residue', gnuid)
+    selected = region_mask(len(states), regions)
+    return dssp_counts(states[selected], residues[selected])
+
+def a3d_counts(scores, residues):
+    '''
+    The get_a3d counts of per residue A3D scores, residues scoring above 0 are aggregation prone
+    Inputs:
+        scores (numpy array): A3D score per residue
+        residues (numpy array): one amino acid letter per residue, as bytes
+    Outputs:
+        out_dict (dict): feature dictionary
+    '''
+    scores = np.asarray(scores, dtype=float)
+    prone = scores > 0
+    previous = np.empty(len(scores))
+    previous[:1] = -1
+    previous[1:] = scores[:-1]
+    out_dict = {'length': int(prone.sum()), 'number': int((prone & (previous <= 0)).sum())}
+    return letter_counts(residues[prone], out_dict)
+
+def a3d_features(store, gnuid, regions=None):
+    '''
+    The get_a3d features of a protien counted only over some regions
+    The selected residues are counted as if they were one protien, so with regions=None the output is the same as get_a3d
+    Inputs:
+        store (ResidueStore): alpha fold residue store
+        gnuid (str): gene or uniprot ID
+        regions (list): (start, stop) residue ranges counted, see region_mask, default the whole protien
+    Outputs:
+        out_dict (dict): feature dictionary
+    '''
+    scores = store.track('a3d_score', gnuid)
+    residues = store.track('a3d_residue', gnuid)
+    selected = region_mask(len(scores), regions)
+    return a3d_counts(scores[selected], residues[selected])
+
+def com_features(store, gnuid, regions=None):
+    '''
+    The get_com distances of a protien over some regions
+    Inputs:
+        store (ResidueStore): alpha fold residue store
+        gnuid (str): gene or uniprot ID
+        regions (list): (start, stop) residue ranges used, see region_mask, default the whole protien
+    Outputs:
+        min, max, average (float): minimum, maximum and average distance of a residue to the center of mass, nan when no residue is selected
+    '''
+    distances = store.track('com_distance', gnuid)
+    distances = np.asarray(distances[region_mask(len(distances), regions)], dtype=float)
+    if len(distances) == 0:
+        return np.nan, np.nan, np.nan
+    return float(distances.min()), float(max(distances.max(), 0)), float(distances.mean())
+
+def read_csv_columns(path, columns):
+    '''
+    Reads some columns of a per residue csv file, skipping the header line
+    Inputs:
+        path (str): csv file, can be inside a predictor output archive
+        columns (list): column numbers
+    Outputs:
+        (list) one list of text values per column
+    '''
+    with open_input(path) as fo:
+        fo.readline()
+        lines = fo.read().split('\n')
+    # each line loses its last character like line[:-1], so a last line without an end of line loses one of its own
+    if lines[-1] == '':
+        lines.pop()
+    else:
+        lines[-1] = lines[-1][:-1]
+    rows = [line.split(',') for line in lines]
+    return [[row[column] for row in rows] for column in columns]
+
+def alphafold_residue_tracks(gnuid, database_root='./databases/'):
+    '''
+    Reads the per residue alpha fold outputs of one protien, from the same files as get_afdssp, get_a3d and get_com
+    Inputs:
+        gnuid (str): gene or uniprot ID
+        database_root (str): default './databases/', folder with af_dssp, A3D_scores and centerofmass
+    Outputs:
+        values (dict): track name mapped to one value per residue, tracks without a file are left out
+    '''
+    values = {}
+    paths = {'dssp': database_root + 'af_dssp/' + gnuid + '-F1.csv', 'a3d': database_root + 'A3D_scores/AF-' + gnuid + '-F1_A3D.csv', 'com': database_root + 'centerofmass/' + gnuid + '_dcom.csv'}
+    try:
+        residues, states = read_csv_columns(paths['dssp'], [1, 2])
+        values['dssp_residue'] = [residue[:1].encode() for residue in residues]
+        values['dssp_state'] = [state[:1].encode() for state in states]
+    except (OSError, IndexError):
+        pass
+    try:
+        residues, scores = read_csv_columns(paths['a3d'], [1, 3])
+        values['a3d_residue'] = [residue[-1:].encode() for residue in residues]
+        values['a3d_score'] = [float(score) for score in scores]
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        values['com_distance'] = [float(distance) for distance in read_csv_columns(paths['com'], [1])[0]]
+    except (OSError, IndexError, ValueError):
+        pass
+    return values
+
+def build_alphafold_store(database_root='./databases/', ids=None):
+    '''
+    Reads the per residue dssp states, A3D scores and center of mass distances of every protien once and keeps them in databases/alphafold_residues/
+    Inputs:
+        database_root (str): default './databases/', folder with af_dssp, A3D_scores and centerofmass (extracted or as archives)
+        ids (list): gene or uniprot IDs, default every protien in af_dssp
+    Outputs:
+        (int) number of proteins in the store
+    '''
+    from build_progress import ProgressReporter
+    if ids is None:
+        ids = sorted(os.path.basename(path)[:-len('-F1.csv')] for path in list_input_files(database_root + 'af_dssp/') if path.endswith('-F1.csv'))
+    progress = ProgressReporter(len(ids), 'proteins')
+    with ResidueStoreWriter(database_root + alphafold_store_name + '/', alphafold_tracks) as store:
+        for gnuid in ids:
+            store.add(gnuid, alphafold_residue_tracks(gnuid, database_root))
+            progress.update()
+    progress.finish()
+    return len(ids)
+
+if __name__ == '__main__':
+    # python residue_store.py [databases/]
+    print(build_alphafold_store(*sys.argv[1:]))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Columnar Result Tables     ###
+#######################################################
+
+# import statements
+import os
+import math
+import shutil
+
+# columns of the long format result table
+result_columns = ['sample', 'structure_type', 'structure_id', 'feature', 'observed', 'observed_standard_deviation', 'background', 'background_standard_deviation', 'pvalue', 'bonforroni_cutoff', 'fdr', 'log_fold_change']
+
+# functions
+def import_pyarrow():
+    '''
+    Imports pyarrow, which is only needed for parquet and feather output
+    '''
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        return pyarrow
+    except ImportError:
+        raise ImportError('Parquet and feather output need the pyarrow package, install it with pip install pyarrow')
+
+def as_float(value):
+    '''
+    Converts a result value to a float, None for values that are not numbers like the log fold change error messages
+    '''
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value):
+        return None
+    return value
+
+class ColumnarResultWriter:
+    '''
+    Writes the results of a whole run as one long format table (one row per sample and feature or class), partitioned by structure_type and compressed
+    Rows are buffered and written as one file per partition each time flush is called, so only one block of samples is held in memory
+    Structure types are 'feature' for count features, 'average' for continous features and domain, fold, superfamily or family for classes
+    '''
+    def __init__(self, folder_out, file_format='parquet', compression='zstd'):
+        '''
+        Inputs:
+            folder_out (str): directory the results/ table and samples table are written into, a results/ table of an earlier run is deleted
+            file_format (str): default 'parquet', or 'feather'
+            compression (str): default 'zstd', compression codec of the files
+        '''
+        self.pa = import_pyarrow()
+        if file_format not in ('parquet', 'feather'):
+            raise ValueError('file_format must be parquet or feather, not ' + repr(file_format))
+        self.folder_out = folder_out
+        self.file_format = file_format
+        if file_format == 'parquet':
+            dataset_format = self.pa.dataset.ParquetFileFormat()
+        else:
+            dataset_format = self.pa.dataset.IpcFileFormat()
+        self.dataset_format = dataset_format
+        self.file_options = dataset_format.make_write_options(compression=compression)
+        self.schema = self.pa.schema([
+            ('sample', self.pa.string()),
+            ('structure_type', self.pa.string()),
+            ('structure_id', self.pa.string()),
+            ('feature', self.pa.string()),
+            ('observed', self.pa.float64()),
+            ('observed_standard_deviation', self.pa.float64()),
+            ('background', self.pa.float64()),
+            ('background_standard_deviation', self.pa.float64()),
+            ('pvalue', self.pa.float64()),
+            ('bonforroni_cutoff', self.pa.float64()),
+            ('fdr', self.pa.float64()),
+            ('log_fold_change', self.pa.float64()),
+        ])
+        self.columns = {name: [] for name in result_columns}
+        self.samples = {'sample': [], 'proteins_found': []}
+        self.block = 0
+        # part files are numbered from 0 each run, left over files of an earlier run would be read back with this one
+        if os.path.exists(os.path.join(folder_out, 'results')):
+            shutil.rmtree(os.path.join(folder_out, 'results'))
+
+    def add_row(self, values):
+        for name, value in zip(result_columns, values):
+            self.columns[name].append(value)
+
+    def write(self, sample_name, average_rows, frequency_rows, found):
+        '''
+        Adds the output rows of one sample
+        Inputs:
+            sample_name (str): name of the sample
+            average_rows (list): rows in average_columns order
+            frequency_rows (list): rows in frequency_columns order
+            found (int): number of proteins found in the sample
+        '''
+        for row in frequency_rows:
+            if row[2] == 'N/A':
+                self.add_row((sample_name, 'feature', None, row[1], as_float(row[3]), None, as_float(row[4]), None, as_float(row[5]), as_float(row[6]), as_float(row[8]), as_float(row[7])))
+            else:
+                self.add_row((sample_name, row[2], row[0], row[1].strip(), as_float(row[3]), None, as_float(row[4]), None, as_float(row[5]), as_float(row[6]), as_float(row[8]), as_float(row[7])))
+        for row in average_rows:
+            self.add_row((sample_name, 'average', None, row[0], as_float(row[1]), as_float(row[2]), as_float(row[3]), as_float(row[4]), as_float(row[5]), as_float(row[6]), as_float(row[7]), None))
+        self.samples['sample'].append(sample_name)
+        self.samples['proteins_found'].append(int(found))
+
+    def flush(self):
+        '''
+        Writes the buffered rows as one compressed file per structure_type partition
+        '''
+        if len(self.columns['sample']) == 0:
+            return
+        table = self.pa.table(self.columns, schema=self.schema)
+        extension = 'parquet' if self.file_format == 'parquet' else 'feather'
+        self.pa.dataset.write_dataset(
+            table,
+            os.path.join(self.folder_out, 'results'),
+            format=self.dataset_format,
+            file_options=self.file_options,
+            partitioning=['structure_type'],
+            partitioning_flavor='hive',
+            basename_template='part-' + str(self.block).zfill(5) + '-{i}.' + extension,
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        self.block += 1
+        self.columns = {name: [] for name in result_columns}
+
+    def close(self):
+        '''
+        Writes any rows left and the table of proteins found per sample
+        '''
+        self.flush()
+        table = self.pa.table({'sample': self.pa.array(self.samples['sample'], self.pa.string()), 'proteins_found': self.pa.array(self.samples['proteins_found'], self.pa.int64())})
+        if self.file_format == 'parquet':
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(table, os.path.join(self.folder_out, 'samples.parquet'))
+        else:
+            import pyarrow.feather
+            pyarrow.feather.write_feather(table, os.path.join(self.folder_out, 'samples.feather'))
+
+def read_results(folder_out, file_format='parquet', samples=None, structure_types=None, max_fdr=None, columns=None):
+    '''
+    Reads the results table of a run, only loading the rows and columns asked for
+    Inputs:
+        folder_out (str): directory given to ColumnarResultWriter
+        file_format (str): default 'parquet', or 'feather'
+        samples (list): only these samples, default all
+        structure_types (list): only these structure types (partitions), default all
+        max_fdr (float): only rows with an fdr at or below this value
+        columns (list): only these columns, default all
+    Outputs:
+        (pandas DataFrame) matching rows
+    '''
+    pa = import_pyarrow()
+    import pyarrow.compute as pc
+    dataset = pa.dataset.dataset(os.path.join(folder_out, 'results'), format='parquet' if file_format == 'parquet' else 'ipc', partitioning='hive')
+    condition = None
+    for expression in (
+            pc.field('sample').isin(samples) if samples is not None else None,
+            pc.field('structure_type').isin(structure_types) if structure_types is not None else None,
+            pc.field('fdr') <= max_fdr if max_fdr is not None else None):
+        if expression is not None:
+            condition = expression if condition is None else condition & expression
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Sharded Runs               ###
+#######################################################
+
+# import statements
+import sys
+import os
+import glob
+import json
+import time
+import shutil
+import socket
+import hashlib
+
+manifest_name = 'manifest.json'
+
+# functions
+def parse_shard(shard):
+    '''
+    Reads a shard given as 'i/N', shards counting from 1
+    Inputs:
+        shard (str or tuple): like '2/8', or (2, 8)
+    Outputs:
+        shard_index, num_shards (int)
+    '''
+    if isinstance(shard, str):
+        shard = shard.split('/')
+    shard_index, num_shards = int(shard[0]), int(shard[1])
+    if num_shards < 1 or not 1 <= shard_index <= num_shards:
+        raise ValueError('shard ' + str(shard_index) + '/' + str(num_shards) + ' is not valid, use i/N with i from 1 to N')
+    return shard_index, num_shards
+
+def shard_of(sample_name, num_shards):
+    '''
+    The shard a sample belongs to, from a hash of its file name so every machine splits a cohort the same way whatever order it lists the files in
+    Inputs:
+        sample_name (str): input file name without the folder
+        num_shards (int): number of shards
+    Outputs:
+        (int) shard from 1 to num_shards
+    '''
+    return int(hashlib.md5(sample_name.encode()).hexdigest(), 16) % num_shards + 1
+
+def shard_files(input_files, shard_index, num_shards):
+    '''
+    Keeps the input files of one shard
+    '''
+    return sorted(path for path in input_files if shard_of(os.path.basename(path), num_shards) == shard_index)
+
+def shard_folder(folder_out, shard_index, num_shards):
+    '''
+    Folder a shard writes its outputs and manifest into, inside the output folder of the whole run
+    '''
+    return os.path.join(folder_out, 'shard_' + str(shard_index) + '_of_' + str(num_shards), '')
+
+def write_manifest(folder, manifest):
+    '''
+    Writes a manifest in one step, so a manifest that can be read is never half written
+    '''
+    temp_path = os.path.join(folder, manifest_name + '.tmp')
+    with open(temp_path, 'w') as fo:
+        json.dump(manifest, fo, indent=1, sort_keys=True)
+    os.replace(temp_path, os.path.join(folder, manifest_name))
+
+class ShardManifest:
+    '''
+    Describes what one shard was run on and what happened to each of its samples, kept in manifest.json of the shard folder
+    The manifest says complete only once every sample of the shard was written or failed
+    '''
+    def __init__(self, folder, shard_index, num_shards, input_dir, input_files, settings):
+        '''
+        Inputs:
+            folder (str): shard folder, emptied of earlier outputs
+            shard_index, num_shards (int): the shard
+            input_dir (str): input directory of the whole run
+            input_files (list): input files of this shard
+            settings (dict): run options, merge checks every shard used the same
+        '''
+        self.folder = folder
+        if os.path.exists(folder):
+            # outputs are appended to, so a shard that is run again starts empty
+            shutil.rmtree(folder)
+        os.makedirs(folder)
+        self.manifest = {
+            'shard': shard_index,
+            'num_shards': num_shards,
+            'partition': 'md5 of the input file name modulo num_shards',
+            'input_dir': os.path.abspath(input_dir),
+            'settings': settings,
+            'host': socket.gethostname(),
+            'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'finished': None,
+            'complete': False,
+            'samples': {os.path.basename(path): 'pending' for path in input_files},
+        }
+        write_manifest(folder, self.manifest)
+
+    def record(self, sample_file, status):
+        '''
+        Inputs:
+            sample_file (str): input file
+            status (str): 'done' or 'failed'
+        '''
+        self.manifest['samples'][os.path.basename(sample_file)] = status
+
+    def finish(self):
+        self.manifest['finished'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.manifest['complete'] = 'pending' not in self.manifest['samples'].values()
+        write_manifest(self.folder, self.manifest)
+
+def read_manifests(folder_out):
+    '''
+    Finds the shard manifests of a run
+    Outputs:
+        manifests (dict): shard folder mapped to its manifest
+        problems (list): shard folders whose manifest is missing or cannot be read
+    '''
+    manifests = {}
+    problems = []
+    for folder in sorted(glob.glob(os.path.join(folder_out, 'shard_*_of_*'))):
+        try:
+            with open(os.path.join(folder, manifest_name)) as fo:
+                manifests[folder] = json.load(fo)
+        except (OSError, ValueError):
+            problems.append(os.path.basename(folder) + ' has no readable ' + manifest_name)
+    return manifests, problems
+
+def merge_shards(folder_out, input_dir=None):
+    '''
+    Checks that every shard of a run finished and combines their outputs into folder_out, as if the run was not sharded
+    Frequency and average files are copied from the shard folders, errors.csv gets the failed samples of every shard, and merge_report.csv has one line per sample with its shard and status (done, failed or missing)
+    Inputs:
+        folder_out (str): output folder given to every shard
+        input_dir (str): default the input directory in the manifests, used to find samples no shard has
+    Outputs:
+        report (dict): 'done' (number), 'failed' and 'missing' (sample names), 'problems' (lines describing shards that are missing, incomplete or do not match) and 'complete' (True when nothing is missing and there are no problems)
+    '''
+    manifests, problems = read_manifests(folder_out)
+    if not manifests:
+        return {'done': 0, 'failed': [], 'missing': [], 'problems': problems + ['no shards in ' + folder_out], 'complete': False}
+    first = manifests[sorted(manifests)[0]]
+    num_shards = first['num_shards']
+    input_dir = input_dir or first['input_dir']
+    seen = {}
+    for folder in sorted(manifests):
+        manifest = manifests[folder]
+        name = os.path.basename(folder)
+        if manifest['num_shards'] != num_shards:
+            problems.append(name + ' is one of ' + str(manifest['num_shards']) + ' shards, not ' + str(num_shards))
+            continue
+        if manifest['settings'] != first['settings'] or manifest['input_dir'] != first['input_dir']:
+            problems.append(name + ' was run with other settings or input than ' + os.path.basename(sorted(manifests)[0]))
+        if manifest['shard'] in seen:
+            problems.append(name + ' is shard ' + str(manifest['shard']) + ' again')
+            continue
+        seen[manifest['shard']] = folder
+        if not manifest['complete']:
+            problems.append(name + ' did not finish (started ' + str(manifest['started']) + ' on ' + str(manifest['host']) + ')')
+    for shard_index in range(1, num_shards + 1):
+        if shard_index not in seen:
+            problems.append('shard ' + str(shard_index) + ' of ' + str(num_shards) + ' has no output')
+    status = {}
+    failed_lines = []
+    for shard_index in sorted(seen):
+        folder = seen[shard_index]
+        for sample_name, sample_status in sorted(manifests[folder]['samples'].items()):
+            if shard_of(sample_name, num_shards) != shard_index:
+                problems.append(sample_name + ' is in shard ' + str(shard_index) + ' but belongs to shard ' + str(shard_of(sample_name, num_shards)))
+            if sample_status == 'done':
+                outputs = [os.path.join(folder, prefix + sample_name) for prefix in ('frequency_', 'average_')]
+                if not all(os.path.exists(path) for path in outputs):
+                    problems.append(sample_name + ' is done in shard ' + str(shard_index) + ' but its outputs are missing')
+                    status[sample_name] = (shard_index, 'missing')
+                    continue
+                for path in outputs:
+                    shutil.copyfile(path, os.path.join(folder_out, os.path.basename(path)))
+            status[sample_name] = (shard_index, sample_status if sample_status in ('done', 'failed') else 'missing')
+        if os.path.exists(os.path.join(folder, 'errors.csv')):
+            with open(os.path.join(folder, 'errors.csv')) as fo:
+                failed_lines += [line for line in fo if line.strip()]
+    if os.path.isdir(input_dir):
+        for path in glob.glob(os.path.join(input_dir, '*')):
+            sample_name = os.path.basename(path)
+            if sample_name not in status:
+                status[sample_name] = (shard_of(sample_name, num_shards), 'missing')
+    with open(os.path.join(folder_out, 'errors.csv'), 'w') as fo:
+        fo.write(''.join(sorted(failed_lines)))
+    with open(os.path.join(folder_out, 'merge_report.csv'), 'w') as fo:
+        fo.write('sample,shard,status\n')
+        for sample_name in sorted(status):
+            fo.write(sample_name + ',' + str(status[sample_name][0]) + ',' + status[sample_name][1] + '\n')
+    report = {
+        'done': sum(1 for value in status.values() if value[1] == 'done'),
+        'failed': sorted(name for name in status if status[name][1] == 'failed'),
+        'missing': sorted(name for name in status if status[name][1] == 'missing'),
+        'problems': problems,
+    }
+    report['complete'] = not report['missing'] and not report['problems']
+    return report
+
+if __name__ == '__main__':
+    # python shards.py output_dir [input_dir]
+    report = merge_shards(*sys.argv[1:])
+    for line in report['problems']:
+        print(line)
+    print(str(report['done']) + ' samples done, ' + str(len(report['failed'])) + ' failed, ' + str(len(report['missing'])) + ' missing')
+    sys.exit(0 if report['complete'] else 1)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Shared Between Processes   ###
+#######################################################
+
+# import statements
+import os
+import json
+import numpy as np
+from collections.abc import Mapping
+from generate_structural_features import StructuralFeatures, SubstructureIndex, header, headeralpha, average_features, substructure_types, built_disorder_cutoff
+
+# StructuralFeatures attached to by this process, by folder
+attached = {}
+
+# functions
+def save_names(folder, prefix, ids):
+    '''
+    Saves gene or protien names as fixed width arrays: in row order, sorted, and the row of each sorted name
+    '''
+    names = np.array([str(gnuid) for gnuid in ids], dtype=str) if len(ids) else np.zeros(0, dtype='U1')
+    order = np.argsort(names, kind='stable')
+    np.save(folder + prefix + '_ids.npy', names)
+    np.save(folder + prefix + '_sorted_ids.npy', names[order])
+    np.save(folder + prefix + '_sorted_rows.npy', order.astype(np.int64))
+
+def publish_features(sf, folder=None):
+    '''
+    Writes the feature matrices, derived feature matrices and definitions, name indexes and scope and interproscan class counts of loaded databases to a folder of numpy files, so worker processes can attach to them with attach_features instead of each loading their own copy
+    Inputs:
+        sf (StructuralFeatures): loaded databases
+        folder (str): default shared_features/ in the databases folder, a folder on /dev/shm keeps the files in memory only
+    Outputs:
+        folder (str): folder to give attach_features
+    '''
+    folder = os.path.join(folder or sf.database_root + 'shared_features/', '')
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    if os.path.exists(folder + 'shared.json'):
+        # attaching is only possible once everything is written again
+        os.remove(folder + 'shared.json')
+    np.save(folder + 'human_values.npy', np.ascontiguousarray(sf.human_values, dtype=float))
+    np.save(folder + 'alpha_values.npy', np.ascontiguousarray(sf.alpha_values, dtype=float))
+    save_names(folder, 'human', sf.human_ids)
+    save_names(folder, 'alpha', sf.alpha_ids)
+    keys = {}
+    for sub_dict in substructure_types:
+        # one entry per class of each protien in the order substructures gives them, so counts add up in the same order as when not shared
+        columns = {}
+        indptr = [0]
+        indices = []
+        counts = []
+        for gnuid in sf.human_ids:
+            protein_dict = sf.substructures(gnuid)[sub_dict]
+            for key in protein_dict:
+                indices.append(columns.setdefault(key, len(columns)))
+                counts.append(protein_dict[key])
+            indptr.append(len(indices))
+        np.save(folder + sub_dict + '_indptr.npy', np.array(indptr, dtype=np.int64))
+        np.save(folder + sub_dict + '_indices.npy', np.array(indices, dtype=np.int64))
+        np.save(folder + sub_dict + '_counts.npy', np.array(counts, dtype=np.int64))
+        keys[sub_dict] = [list(key) for key in columns]
+    with open(folder + 'substructure_keys.json', 'w') as fo:
+        json.dump(keys, fo)
+    if sf.derived is not None:
+        np.save(folder + 'human_derived.npy', np.ascontiguousarray(sf.human_derived, dtype=float))
+        np.save(folder + 'alpha_derived.npy', np.ascontiguousarray(sf.alpha_derived, dtype=float))
+    # written last, a folder without it is not ready to attach to
+    with open(folder + 'shared.json', 'w') as fo:
+        json.dump({'database_root': sf.database_root, 'background': sf.background, 'thresholds': list(sf.thresholds), 'disorder_cutoff': sf.disorder_cutoff, 'derived': [[label, sf.derived.expressions[label]] for label in sf.derived.labels] if sf.derived is not None else None}, fo)
+    return folder
+
+class SharedNameIndex(Mapping):
+    '''
+    Name to row lookup over memory mapped sorted names, used like the human_rows and alpha_rows dicts without a copy per process
+    '''
+    def __init__(self, folder, prefix):
+        self.ids = np.load(folder + prefix + '_ids.npy', mmap_mode='r')
+        self.sorted_ids = np.load(folder + prefix + '_sorted_ids.npy', mmap_mode='r')
+        self.sorted_rows = np.load(folder + prefix + '_sorted_rows.npy', mmap_mode='r')
+        self.width = self.sorted_ids.dtype.itemsize//4
+
+    def __getitem__(self, name):
+        # longer names would be cut to the array width and could match another name
+        if not isinstance(name, str) or len(name) > self.width or len(self.sorted_ids) == 0:
+            raise KeyError(name)
+        position = int(np.searchsorted(self.sorted_ids, name))
+        if position < len(self.sorted_ids) and self.sorted_ids[position] == name:
+            return int(self.sorted_rows[position])
+        raise KeyError(name)
+
+    def __iter__(self):
+        for gnuid in self.ids:
+            yield str(gnuid)
+
+    def __len__(self):
+        return len(self.ids)
+
+class SharedStructuralFeatures(StructuralFeatures):
+    '''
+    StructuralFeatures reading the feature matrices, derived features and class counts published by publish_features from memory maps, so any number of processes share one copy
+    Scores are the same as with the StructuralFeatures that was published, only the background is loaded by each process
+    '''
+    def __init__(self, folder, features=None):
+        '''
+        Inputs:
+            folder (str): folder written by publish_features
+            features (str or list): default None for all, feature groups to test, see parse_feature_groups
+        '''
+        self.folder = os.path.join(folder, '')
+        if not os.path.exists(self.folder + 'shared.json'):
+            raise FileNotFoundError(self.folder + ' has no published features, see publish_features')
+        with open(self.folder + 'shared.json') as fo:
+            settings = json.load(fo)
+        self.database_root = settings['database_root']
+        self.thresholds = tuple(settings['thresholds'])
+        # the published values were counted at this cutoff, backgrounds are checked against it
+        self.disorder_cutoff = settings.get('disorder_cutoff', built_disorder_cutoff)
+        self.select_features(features)
+        self.human_values = np.load(self.folder + 'human_values.npy', mmap_mode='r')
+        self.alpha_values = np.load(self.folder + 'alpha_values.npy', mmap_mode='r')
+        self.human_rows = SharedNameIndex(self.folder, 'human')
+        self.alpha_rows = SharedNameIndex(self.folder, 'alpha')
+        self.human_ids = self.human_rows.ids
+        self.alpha_ids = self.alpha_rows.ids
+        self.human_sd_columns = [header.index(label) - 1 for label in average_features if label in header]
+        self.alpha_sd_columns = [headeralpha.index(label) for label in average_features if label in headeralpha]
+        with open(self.folder + 'substructure_keys.json') as fo:
+            keys = json.load(fo)
+        self.substructure_keys = {sub_dict: [tuple(key) for key in keys[sub_dict]] for sub_dict in substructure_types}
+        self.incidence = {sub_dict: [np.load(self.folder + sub_dict + '_' + part + '.npy', mmap_mode='r') for part in ('indptr', 'indices', 'counts')] for sub_dict in substructure_types}
+        self.index = None
+        self.substructure_cache = {}
+        self.backgrounds = {}
+        self.background = settings['background']
+        self.permutation_nulls = {}
+        if settings.get('derived'):
+            self.add_derived(settings['derived'], (np.load(self.folder + 'human_derived.npy', mmap_mode='r'), np.load(self.folder + 'alpha_derived.npy', mmap_mode='r')))
+
+    @property
+    def substructure_index(self):
+        # only opened for names outside the precounted human genome or a threshold sweep
+        if self.index is None:
+            self.index = SubstructureIndex(self.database_root + 'structure_database.db', self.substructure_tables)
+        return self.index
+
+    def substructures(self, gnuid):
+        '''
+        Scope and interproscan class counts of one protien, from the published class counts, empty for structure types not selected
+        Inputs:
+            gnuid (str): gene or protien name
+        Outputs:
+            (dict) class counts by structure type
+        '''
+        if gnuid not in self.human_rows:
+            return StructuralFeatures.substructures(self, gnuid)
+        row = self.human_rows[gnuid]
+        out_dict = {sub_dict: {} for sub_dict in substructure_types}
+        for sub_dict in self.substructure_types:
+            indptr, indices, counts = self.incidence[sub_dict]
+            keys = self.substructure_keys[sub_dict]
+            out_dict[sub_dict] = {keys[indices[position]]: int(counts[position]) for position in range(indptr[row], indptr[row + 1])}
+        return out_dict
+
+def attach_features(folder):
+    '''
+    Attaches this process to published features, once per process, usable as a multiprocessing.Pool initializer
+    Example:
+        folder = publish_features(StructuralFeatures('./databases/'))
+        with multiprocessing.Pool(64, initializer=attach_features, initargs=(folder,)) as pool:
+            results = pool.starmap(score_in_worker, [(folder, genes) for genes in gene_lists])
+    Inputs:
+        folder (str): folder written by publish_features
+    Outputs:
+        (SharedStructuralFeatures)
+    '''
+    folder = os.path.join(folder, '')
+    if folder not in attached:
+        attached[folder] = SharedStructuralFeatures(folder)
+    return attached[folder]
+
+def score_in_worker(folder, genes, use_weight=None, background=None):
+    '''
+    Scores one gene list in a worker process with the features attached to, see attach_features
+    Outputs:
+        average, frequency (pandas DataFrames) like StructuralFeatures.score
+    '''
+    return attach_features(folder).score(genes, use_weight, background)
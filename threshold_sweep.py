@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+#######################################################
+### Structural Features Scope Threshold Sweep      ###
+#######################################################
+
+# import statements
+import sys
+import os
+import glob
+import itertools
+import numpy as np
+from generate_structural_features import StructuralFeatures, read_sample_file, parse_bool, format_rows, frequency_columns, fisher_exact_greater
+
+# cutoffs of check_if_thresholds_met in order, and the fold table columns they are compared to
+threshold_names = ['prob', 'evalue', 'pvalue', 'coverage', 'percent_identity', 'len_template']
+fold_value_columns = [10, 11, 12, 13, 16, 17, 18]
+# fold table columns of the (id, description) key of each scope structure type
+scope_key_columns = {'fold': (4, 5), 'superfamily': (6, 7), 'family': (8, 9)}
+
+# functions
+def threshold_grid(grid=None, defaults=(50, 1e-5, 1e-5, 0.3, 30, 30)):
+    '''
+    Lists the threshold settings of a sweep
+    Inputs:
+        grid (dict or list): cutoff name mapped to a list of values (every combination is used, cutoffs not given keep their default), or a list of settings each a dict or a tuple in threshold_names order
+        defaults (tuple): cutoffs in threshold_names order used for anything not given
+    Outputs:
+        settings (list): tuples in threshold_names order
+    '''
+    if grid is None:
+        return [tuple(defaults)]
+    if isinstance(grid, dict):
+        for name in grid:
+            if name not in threshold_names:
+                raise ValueError(name + ' is not a threshold, expected one of ' + ', '.join(threshold_names))
+        values = [list(grid[name]) if name in grid else [defaults[index]] for index, name in enumerate(threshold_names)]
+        return list(itertools.product(*values))
+    settings = []
+    for setting in grid:
+        if isinstance(setting, dict):
+            setting = tuple(setting.get(name, defaults[index]) for index, name in enumerate(threshold_names))
+        settings.append(tuple(setting))
+    return settings
+
+def parse_grid_arguments(arguments):
+    '''
+    Reads command line threshold lists like prob=30,50,70 evalue=1e-3,1e-5
+    Inputs:
+        arguments (list): name=value,value strings
+    Outputs:
+        (dict) cutoff name mapped to a list of floats
+    '''
+    grid = {}
+    for argument in arguments:
+        name, values = argument.split('=', 1)
+        grid[name] = [float(value) for value in values.split(',')]
+    return grid
+
+class ThresholdSweep:
+    '''
+    Scores gene lists under many scope cutoff settings at once
+    The fold table rows of each protien are fetched once, then every setting is checked against all rows as one settings x rows boolean matrix, giving the same classes as check_if_thresholds_met
+    Interproscan domains and the precounted features do not depend on the cutoffs and are left out of the results
+    '''
+    def __init__(self, sf, grid=None):
+        '''
+        Inputs:
+            sf (StructuralFeatures): loaded databases
+            grid (dict or list): threshold settings, see threshold_grid, default only the cutoffs sf was loaded with
+        '''
+        self.sf = sf
+        self.settings = threshold_grid(grid, sf.thresholds)
+        self.fold_rows = {}
+
+    def hits(self, ids):
+        '''
+        Fold table rows of some proteins as arrays, fetched once per protien
+        Inputs:
+            ids (list): gene or protien names, in the order classes should first appear
+        Outputs:
+            values (numpy array): rows x (prob, evalue, pvalue, coverage, percent identity, template start, template end)
+            valid (numpy array): False for rows with values check_if_thresholds_met cannot compare
+            keys (dict): scope structure type mapped to the (id, description) key of each row
+        '''
+        rows = []
+        for gnuid in ids:
+            if gnuid not in self.fold_rows:
+                self.fold_rows[gnuid] = self.sf.substructure_index.rows_for(gnuid)[1]
+            rows += self.fold_rows[gnuid]
+        values = np.zeros((len(rows), len(fold_value_columns)))
+        valid = np.ones(len(rows), dtype=bool)
+        for index in range(len(rows)):
+            row = rows[index]
+            # check_if_thresholds_met returns False when a value is missing or not a number
+            if len(row) <= max(fold_value_columns) or not all(isinstance(row[column], (int, float)) for column in fold_value_columns):
+                valid[index] = False
+                continue
+            values[index] = [row[column] for column in fold_value_columns]
+        keys = {sub_dict: [(row[scope_key_columns[sub_dict][0]], row[scope_key_columns[sub_dict][1]]) if valid[index] else None for index, row in enumerate(rows)] for sub_dict in scope_key_columns}
+        return values, valid, keys
+
+    def passes(self, values, valid):
+        '''
+        Checks every row against every setting
+        Inputs:
+            values (numpy array): from hits
+            valid (numpy array): from hits
+        Outputs:
+            (numpy array) settings x rows, True where the row meets all cutoffs of the setting
+        '''
+        settings = np.array(self.settings, dtype=float).reshape(len(self.settings), len(threshold_names))
+        with np.errstate(invalid='ignore'):
+            failed = (values[None, :, 0] < settings[:, None, 0]) | (values[None, :, 1] > settings[:, None, 1]) | (values[None, :, 2] > settings[:, None, 2]) | (values[None, :, 3] < settings[:, None, 3]) | (values[None, :, 4] < settings[:, None, 4]) | ((values[None, :, 6] - values[None, :, 5]) < settings[:, None, 5])
+        return valid[None, :] & ~failed
+
+    def class_counts(self, ids):
+        '''
+        Counts the scope classes of some proteins for every setting
+        Inputs:
+            ids (list): gene or protien names
+        Outputs:
+            counts (list): per setting, scope structure type mapped to {(id, description): count} in the order the original counting adds them
+        '''
+        values, valid, keys = self.hits(ids)
+        passed = self.passes(values, valid)
+        counts = [{} for setting in self.settings]
+        for sub_dict in scope_key_columns:
+            columns = {}
+            codes = np.array([columns.setdefault(key, len(columns)) if key is not None else -1 for key in keys[sub_dict]], dtype=np.int64)
+            key_list = list(columns)
+            for index in range(len(self.settings)):
+                setting_codes = codes[passed[index]]
+                unique_codes, first, number = np.unique(setting_codes, return_index=True, return_counts=True)
+                order = np.argsort(first, kind='stable')
+                counts[index][sub_dict] = {key_list[unique_codes[position]]: int(number[position]) for position in order}
+        return counts
+
+    def universe_backgrounds(self, background=None, universe=None):
+        '''
+        Backgrounds with the scope class counts of a protien universe recounted under each setting, so sample and background use the same cutoffs
+        Inputs:
+            background (str or dict): background the feature frequencies and averages are taken from, default the one sf was loaded with
+            universe (list): gene or protien names counted, default every protien in the precounted human genome
+        Outputs:
+            (list) background dict per setting, with only the scope classes counted under that setting
+        '''
+        if not isinstance(background, dict):
+            background = self.sf.load_background(background)
+        ids = list(self.sf.human_ids) if universe is None else [gnuid for gnuid in dict.fromkeys(universe) if gnuid in self.sf.human_rows]
+        backgrounds = []
+        for setting_counts in self.class_counts(ids):
+            # each setting starts empty, classes the setting does not pass are not left at another setting's counts
+            substructures = {}
+            for sub_dict in setting_counts:
+                for key in setting_counts[sub_dict]:
+                    substructures[key[0]] = substructures.get(key[0], 0) + setting_counts[sub_dict][key]
+            backgrounds.append({'found': len(ids), 'substructures': substructures, 'frequency': background['frequency'], 'average': background['average']})
+        return backgrounds
+
+    def scope_inputs(self, found, counts, background):
+        '''
+        The test_inputs of only the scope classes of one setting, the features and interproscan classes do not depend on the cutoffs and are not tested
+        Inputs:
+            found (int): number of proteins found in the sample
+            counts (dict): scope structure type mapped to {(id, description): count}, one setting of class_counts
+            background (dict): background compared against
+        Outputs:
+            inputs (dict): see StructuralFeatures.test_inputs
+        '''
+        terms = []
+        for sub_dict in self.sf.substructure_types:
+            if sub_dict not in scope_key_columns:
+                continue
+            keys = [key for key in counts[sub_dict] if key[0] != 'NULL']
+            if keys:
+                terms.append((sub_dict, keys, np.array([counts[sub_dict][key] for key in keys]), [background['substructures'].get(key[0], 0) for key in keys]))
+        return {'found': found, 'background_found': background['found'], 'frequency_labels': [], 'average_labels': [], 'counts': np.zeros(0), 'background_counts': [], 'averages': np.zeros(0), 'sds': np.zeros(0), 'background_averages': [], 'terms': terms, 'substructures': counts}
+
+    def score(self, genes, use_weight=None, background=None, backgrounds=None):
+        '''
+        Scope class enrichment of one gene list under every setting, the fisher tests of all settings are run together
+        Inputs:
+            genes (list, dict or pandas Series): gene or protien names, (name, weight) tuples, or names mapped to expression values
+            use_weight (bool): by default True when weights are given, only changes which proteins are found
+            background (str or dict): background compared against, default the one sf was loaded with
+            backgrounds (list): one background per setting, from universe_backgrounds, used instead of background
+        Outputs:
+            results (list): (setting, frequency rows) per setting, rows in frequency_columns order for fold, superfamily and family classes only
+        '''
+        human_weights = self.sf.find_proteins(genes, use_weight)[0]
+        if len(human_weights) == 0:
+            raise ValueError('None of the genes or protiens were found in the structural features database')
+        if backgrounds is None:
+            backgrounds = [background if isinstance(background, dict) else self.sf.load_background(background)]*len(self.settings)
+        setting_counts = self.class_counts(list(human_weights))
+        all_inputs = [self.scope_inputs(len(human_weights), setting_counts[index], backgrounds[index]) for index in range(len(self.settings))]
+        tables = [self.sf.fisher_tables(inputs) for inputs in all_inputs]
+        fisher_p = fisher_exact_greater(*[np.concatenate([table[cell] for table in tables]) for cell in range(4)])
+        results = []
+        position = 0
+        for index in range(len(self.settings)):
+            size = len(tables[index][0])
+            frequency_rows = self.sf.rows_from_pvalues(all_inputs[index], fisher_p[position:position + size], np.zeros(0))[1]
+            position += size
+            results.append((self.settings[index], frequency_rows))
+        return results
+
+def run_sweep_for_all_files_in_folder(input_dir, folder_out, grid, use_weight=False, background_folder_name='human_background', database_root='./databases/', universe_background=False):
+    '''
+    Writes sweep_<name>.csv per input file with the scope class results of every threshold setting, the setting values in the first (cutoff_) columns
+    Inputs:
+        input_dir (str): path to input directory containing csv files of line separated gene or protien names, expression values
+        folder_out (str): path to where output files will go
+        grid (dict or list): threshold settings, see threshold_grid
+        use_weight (bool or str): default False, use the expression values as weights
+        background_folder_name (str): default 'human_background', name of background to use
+        database_root (str): default './databases/', folder with the unzipped structural features databases
+        universe_background (bool or str): default False, recount the background scope classes over the precounted human genome under each setting
+    Outputs:
+        1 (int) when complete
+    '''
+    use_weight = parse_bool(use_weight)
+    sf = StructuralFeatures(database_root, background_folder_name)
+    sweep = ThresholdSweep(sf, grid)
+    backgrounds = sweep.universe_backgrounds(background_folder_name) if parse_bool(universe_background) else None
+    if not os.path.exists(folder_out):
+        os.makedirs(folder_out)
+    for sample_file in sorted(glob.glob(os.path.join(input_dir, '*'))):
+        try:
+            results = sweep.score(read_sample_file(sample_file, use_weight), use_weight, background_folder_name, backgrounds)
+        except Exception:
+            with open(os.path.join(folder_out, 'errors.csv'), 'a+') as fo:
+                fo.write(sample_file + '\n')
+            continue
+        with open(os.path.join(folder_out, 'sweep_' + os.path.basename(sample_file)), 'w') as fo:
+            fo.write(','.join(['cutoff_' + name for name in threshold_names] + frequency_columns) + '\n')
+            for setting, frequency_rows in results:
+                fo.write(format_rows([tuple(setting) + tuple(row) for row in frequency_rows]))
+    return 1
+
+if __name__ == '__main__':
+    # python threshold_sweep.py input_dir output_dir prob=30,50,70 coverage=0.2,0.3 [use_weight=True] [universe_background=True]
+    options = {}
+    grid_arguments = []
+    for argument in sys.argv[3:]:
+        name = argument.split('=', 1)[0]
+        if name in threshold_names:
+            grid_arguments.append(argument)
+        else:
+            options[name] = argument.split('=', 1)[1]
+    run_sweep_for_all_files_in_folder(sys.argv[1], sys.argv[2], parse_grid_arguments(grid_arguments), **options)
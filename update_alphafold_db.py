@@ -1,4 +1,5 @@
 import glob
+from predictor_archive import open_input
 
 def write_output(out_name, out_str):
     '''
@@ -32,7 +33,7 @@ def get_afdssp(gnuid):
         'H':{'length':0, 'number':0}
     }
     previous_feature = '-'
-    with open(path_to_db + gnuid + '-F1.csv') as fo:
+    with open_input(path_to_db + gnuid + '-F1.csv') as fo:
         for line in fo:
             line_index += 1
             if line_index != 0:
@@ -62,7 +63,7 @@ def get_a3d(gnuid):
     line_index = -1
     out_dict = {'length':0, 'number':0}
     previous_feature = -1
-    with open(path_to_db + gnuid + '-F1_A3D.csv') as fo:
+    with open_input(path_to_db + gnuid + '-F1_A3D.csv') as fo:
         for line in fo:
             line_index += 1
             if line_index != 0:
@@ -95,7 +96,7 @@ def get_com(gnuid):
     max = 0
     average = 0
     previous_feature = -1
-    with open(path_to_db + gnuid + '_dcom.csv') as fo:
+    with open_input(path_to_db + gnuid + '_dcom.csv') as fo:
         for line in fo:
             line_index += 1
             if line_index != 0:
@@ -120,7 +121,7 @@ def get_num_contacts(gnuid):
     line_index = -1
     num_contacts = 0
     tot = 0
-    with open(path_to_db + gnuid + '_map.csv') as fo:
+    with open_input(path_to_db + gnuid + '_map.csv') as fo:
         for line in fo:
             line_index += 1
             if line_index != 0:
@@ -7,21 +7,25 @@
 ####################################
 
 # import statements
-import pandas as pd
-import glob
+import sys
+import os
+import csv
+from feature_store import FeatureStoreWriter, store_name
+from predictor_archive import list_input_files, open_input
+from build_progress import ProgressReporter, BuildCheckpoint
 
 # functions
 def make_file_dict(directory, file_ending):
     '''
     Loads data from file into dictionary format
     Inputs:
-        directory (str): name of directory where the files to load can be found
+        directory (str): name of directory where the files to load can be found, or of a .tar.gz/.tar.zst archive of it (without the ending) when not extracted
         file_ending (str): the type of files to be loaded
     Outputs:
         out (dict): dictionary of file contents
     '''
     file_dict = {}
-    files = glob.glob(directory+'*')
+    files = list_input_files(directory)
     for f in files:
         fn = f.split('/')[-1]
         names = fn[:-len(file_ending)].split('--')
@@ -67,7 +71,7 @@ def num_predict_pro_parse(file_path):
     line_num = -1
     collect = {}
     check_dict = {}
-    with open(file_path) as fo:
+    with open_input(file_path) as fo:
         for line in fo:
             line_num += 1
             split_line = line[:-1].split(',,')
@@ -146,7 +150,7 @@ def get_glob(glob_file_name):
     seen_globs = False
     glob_flag = None
     glob_comp_dict = {'R':0, 'H':0, 'K':0, 'D':0, 'E':0, 'S':0, 'T':0, 'N':0, 'Q':0, 'C':0, 'U':0, 'G':0, 'P':0, 'A':0, 'V':0, 'I':0, 'L':0, 'M':0, 'F':0, 'Y':0, 'W':0}
-    with open(glob_file_name) as fileobject:
+    with open_input(glob_file_name) as fileobject:
         for line in fileobject:
             if 'globular domain ' in line:
                 number_globs += 1
@@ -194,7 +198,7 @@ def get_disorder(iupred_file_name ,disorder_cutoff):
     tot_num_anchor = 0
     anchor_aa_comp = {'R':0, 'H':0, 'K':0, 'D':0, 'E':0, 'S':0, 'T':0, 'N':0, 'Q':0, 'C':0, 'U':0, 'G':0, 'P':0, 'A':0, 'V':0, 'I':0, 'L':0, 'M':0, 'F':0, 'Y':0, 'W':0}
     
-    with open(iupred_file_name) as fileobject:
+    with open_input(iupred_file_name) as fileobject:
         for line in fileobject:
             if line[0] == '#':
                 continue
@@ -239,7 +243,7 @@ def get_stats_from_hhpred(file_name):
     '''
     total_length = 0
     totAA_dict = {'R':0, 'H':0, 'K':0, 'D':0, 'E':0, 'S':0, 'T':0, 'N':0, 'Q':0, 'C':0, 'U':0, 'G':0, 'P':0, 'A':0, 'V':0, 'I':0, 'L':0, 'M':0, 'F':0, 'Y':0, 'W':0}
-    with open(file_name) as fileobject:
+    with open_input(file_name) as fileobject:
         for line in fileobject:
             if line[0] != '>':
                 for elt in line:
@@ -269,7 +273,7 @@ def get_tm(file_path):
     inside = []
     outside = []
     tmhelix = []
-    with open(file_path) as fileobject:
+    with open_input(file_path) as fileobject:
         for line in fileobject:
             if line[0] != '#':
                 parsed_line = line[:-1].split('\t')
@@ -311,37 +315,62 @@ def yn_binary(num_to_check):
         return 1
     return 0
 
-def write_outputs(input_file):
+def write_outputs(input_file, output_format='store', database_root='./databases/', batch_size=1000, error_file='unfound.csv', resume=True, progress_seconds=10):
     '''
     writes the files for the structural features database
+    Names are written in chunks of batch_size, after each chunk the error report lines of the chunk are added to error_file and the number of names done is kept in update_databases.checkpoint in database_root, so a build that was stopped carries on after the last finished chunk when run again
     Inputs:
         input_file (str): path to file with all gene names or protiens to be included in the structural features database
+        output_format (str): default 'store', write the rows into the precounted_human_genome table of precounted_features.db in batched transactions, or 'folder' for one precounted_human_genome/<name>.txt file per name
+        database_root (str): default './databases/', folder with the predictor outputs the database is built from and where it is written
+        batch_size (int): default 1000, rows written to the store per transaction and names per checkpoint
+        error_file (str): default 'unfound.csv', csv file the error report is written to as the build goes
+        resume (bool or str): default True, carry on from the checkpoint of an earlier build of the same input file and output format, False starts over
+        progress_seconds (float): default 10, seconds between progress lines
     Outputs:
-        error_report (list): list of lines containing information about which genes or protein data was not found when creating the database
+        error_report (list): list of lines containing information about which genes or protein data was not found when creating the database, for the names written in this run
     '''
     # # make look up dicts
-    predict_pro_num_dir = './databases/numerical_predict_protein_values/'
+    predict_pro_num_dir = database_root + 'numerical_predict_protein_values/'
     num_predict_pro_file_dict = make_file_dict(predict_pro_num_dir, '.txt')
-    iupred_glob_dir = './databases/iupred2a_glob/'
-    iupred_long_dir = './databases/iupred2a_long/'
+    iupred_glob_dir = database_root + 'iupred2a_glob/'
+    iupred_long_dir = database_root + 'iupred2a_long/'
     glob_file_dict = make_file_dict(iupred_glob_dir, '.fas.txt')
     iupred_file_dict = make_file_dict(iupred_long_dir, '.fas.txt') 
-    hhpred_file_dir = './databases/human_proteome_hhpred/'
+    hhpred_file_dir = database_root + 'human_proteome_hhpred/'
     hhpred_file_dict = make_file_dict(hhpred_file_dir, '.fas')
-    tm_file_dir = './databases/tm_output/'
+    tm_file_dir = database_root + 'tm_output/'
     tm_file_dict = make_file_dict(tm_file_dir, '.fas.txt')
     pred_pro_keys = ['Number of transmembrane helices', 'NHTM Best from query.phdPred', 'Stretch', 'Crowd predictions', 'Number of predictions', 'Number of positive regions', 'Number of positive regions with length >=30', 'Positive region lengths', 'Number of negative regions', 'Number of negative regions with length >=30', 'Negative region lengths', 'Number of coils', 'Total length of coil regions', 'Number amino acid in coil region A', 'Number amino acid in coil region R', 'Number amino acid in coil region N', 'Number amino acid in coil region D', 'Number amino acid in coil region C', 'Number amino acid in coil region E', 'Number amino acid in coil region Q', 'Number amino acid in coil region G', 'Number amino acid in coil region H', 'Number amino acid in coil region I', 'Number amino acid in coil region L', 'Number amino acid in coil region K', 'Number amino acid in coil region M', 'Number amino acid in coil region F', 'Number amino acid in coil region P', 'Number amino acid in coil region S', 'Number amino acid in coil region T', 'Number amino acid in coil region W', 'Number amino acid in coil region Y', 'Number amino acid in coil region V', 'Number amino acid in loop region A', 'Number amino acid in loop region R', 'Number amino acid in loop region N', 'Number amino acid in loop region D', 'Number amino acid in loop region C', 'Number amino acid in loop region E', 'Number amino acid in loop region Q', 'Number amino acid in loop region G', 'Number amino acid in loop region H', 'Number amino acid in loop region I', 'Number amino acid in loop region L', 'Number amino acid in loop region K', 'Number amino acid in loop region M', 'Number amino acid in loop region F', 'Number amino acid in loop region P', 'Number amino acid in loop region S', 'Number amino acid in loop region T', 'Number amino acid in loop region W', 'Number amino acid in loop region Y', 'Number amino acid in loop region V', 'Total length of loop regions', 'Number of loops', 'Number amino acid in sheet region A', 'Number amino acid in sheet region R', 'Number amino acid in sheet region N', 'Number amino acid in sheet region D', 'Number amino acid in sheet region C', 'Number amino acid in sheet region E', 'Number amino acid in sheet region Q', 'Number amino acid in sheet region G', 'Number amino acid in sheet region H', 'Number amino acid in sheet region I', 'Number amino acid in sheet region L', 'Number amino acid in sheet region K', 'Number amino acid in sheet region M', 'Number amino acid in sheet region F', 'Number amino acid in sheet region P', 'Number amino acid in sheet region S', 'Number amino acid in sheet region T', 'Number amino acid in sheet region W', 'Number amino acid in sheet region Y', 'Number amino acid in sheet region V', 'Total length of sheet regions', 'Number of sheets', 'Number amino acid in helix region A', 'Number amino acid in helix region R', 'Number amino acid in helix region N', 'Number amino acid in helix region D', 'Number amino acid in helix region C', 'Number amino acid in helix region E', 'Number amino acid in helix region Q', 'Number amino acid in helix region G', 'Number amino acid in helix region H', 'Number amino acid in helix region I', 'Number amino acid in helix region L', 'Number amino acid in helix region K', 'Number amino acid in helix region M', 'Number amino acid in helix region F', 'Number amino acid in helix region P', 'Number amino acid in helix region S', 'Number amino acid in helix region T', 'Number amino acid in helix region W', 'Number amino acid in helix region Y', 'Number amino acid in helix region V', 'Total length of helix regions', 'Number of helix', 'Number amino acid in nonconserved region A', 'Number amino acid in nonconserved region R', 'Number amino acid in nonconserved region N', 'Number amino acid in nonconserved region D', 'Number amino acid in nonconserved region C', 'Number amino acid in nonconserved region E', 'Number amino acid in nonconserved region Q', 'Number amino acid in nonconserved region G', 'Number amino acid in nonconserved region H', 'Number amino acid in nonconserved region I', 'Number amino acid in nonconserved region L', 'Number amino acid in nonconserved region K', 'Number amino acid in nonconserved region M', 'Number amino acid in nonconserved region F', 'Number amino acid in nonconserved region P', 'Number amino acid in nonconserved region S', 'Number amino acid in nonconserved region T', 'Number amino acid in nonconserved region W', 'Number amino acid in nonconserved region Y', 'Number amino acid in nonconserved region V', 'Total length of nonconserved regions', 'Number of nonconserved regions', 'Number amino acid in conserved region A', 'Number amino acid in conserved region R', 'Number amino acid in conserved region N', 'Number amino acid in conserved region D', 'Number amino acid in conserved region C', 'Number amino acid in conserved region E', 'Number amino acid in conserved region Q', 'Number amino acid in conserved region G', 'Number amino acid in conserved region H', 'Number amino acid in conserved region I', 'Number amino acid in conserved region L', 'Number amino acid in conserved region K', 'Number amino acid in conserved region M', 'Number amino acid in conserved region F', 'Number amino acid in conserved region P', 'Number amino acid in conserved region S', 'Number amino acid in conserved region T', 'Number amino acid in conserved region W', 'Number amino acid in conserved region Y', 'Number amino acid in conserved region V', 'Total length of conserved regions', 'Number of conserved regions']
     output_keys = ['Crowd predictions', 'Length of protein', 'NHTM Best from query.phdPred', 'Negative region lengths', 'Number amino acid in anchor region A', 'Number amino acid in anchor region C', 'Number amino acid in anchor region D', 'Number amino acid in anchor region E', 'Number amino acid in anchor region F', 'Number amino acid in anchor region G', 'Number amino acid in anchor region H', 'Number amino acid in anchor region I', 'Number amino acid in anchor region K', 'Number amino acid in anchor region L', 'Number amino acid in anchor region M', 'Number amino acid in anchor region N', 'Number amino acid in anchor region P', 'Number amino acid in anchor region Q', 'Number amino acid in anchor region R', 'Number amino acid in anchor region S', 'Number amino acid in anchor region T', 'Number amino acid in anchor region V', 'Number amino acid in anchor region W', 'Number amino acid in anchor region Y', 'Number amino acid in coil region A', 'Number amino acid in coil region C', 'Number amino acid in coil region D', 'Number amino acid in coil region E', 'Number amino acid in coil region F', 'Number amino acid in coil region G', 'Number amino acid in coil region H', 'Number amino acid in coil region I', 'Number amino acid in coil region K', 'Number amino acid in coil region L', 'Number amino acid in coil region M', 'Number amino acid in coil region N', 'Number amino acid in coil region P', 'Number amino acid in coil region Q', 'Number amino acid in coil region R', 'Number amino acid in coil region S', 'Number amino acid in coil region T', 'Number amino acid in coil region V', 'Number amino acid in coil region W', 'Number amino acid in coil region Y', 'Number amino acid in conserved region A', 'Number amino acid in conserved region C', 'Number amino acid in conserved region D', 'Number amino acid in conserved region E', 'Number amino acid in conserved region F', 'Number amino acid in conserved region G', 'Number amino acid in conserved region H', 'Number amino acid in conserved region I', 'Number amino acid in conserved region K', 'Number amino acid in conserved region L', 'Number amino acid in conserved region M', 'Number amino acid in conserved region N', 'Number amino acid in conserved region P', 'Number amino acid in conserved region Q', 'Number amino acid in conserved region R', 'Number amino acid in conserved region S', 'Number amino acid in conserved region T', 'Number amino acid in conserved region V', 'Number amino acid in conserved region W', 'Number amino acid in conserved region Y', 'Number amino acid in disordered region A', 'Number amino acid in disordered region C', 'Number amino acid in disordered region D', 'Number amino acid in disordered region E', 'Number amino acid in disordered region F', 'Number amino acid in disordered region G', 'Number amino acid in disordered region H', 'Number amino acid in disordered region I', 'Number amino acid in disordered region K', 'Number amino acid in disordered region L', 'Number amino acid in disordered region M', 'Number amino acid in disordered region N', 'Number amino acid in disordered region P', 'Number amino acid in disordered region Q', 'Number amino acid in disordered region R', 'Number amino acid in disordered region S', 'Number amino acid in disordered region T', 'Number amino acid in disordered region V', 'Number amino acid in disordered region W', 'Number amino acid in disordered region Y', 'Number amino acid in globular region A', 'Number amino acid in globular region C', 'Number amino acid in globular region D', 'Number amino acid in globular region E', 'Number amino acid in globular region F', 'Number amino acid in globular region G', 'Number amino acid in globular region H', 'Number amino acid in globular region I', 'Number amino acid in globular region K', 'Number amino acid in globular region L', 'Number amino acid in globular region M', 'Number amino acid in globular region N', 'Number amino acid in globular region P', 'Number amino acid in globular region Q', 'Number amino acid in globular region R', 'Number amino acid in globular region S', 'Number amino acid in globular region T', 'Number amino acid in globular region V', 'Number amino acid in globular region W', 'Number amino acid in globular region Y', 'Number amino acid in helix region A', 'Number amino acid in helix region C', 'Number amino acid in helix region D', 'Number amino acid in helix region E', 'Number amino acid in helix region F', 'Number amino acid in helix region G', 'Number amino acid in helix region H', 'Number amino acid in helix region I', 'Number amino acid in helix region K', 'Number amino acid in helix region L', 'Number amino acid in helix region M', 'Number amino acid in helix region N', 'Number amino acid in helix region P', 'Number amino acid in helix region Q', 'Number amino acid in helix region R', 'Number amino acid in helix region S', 'Number amino acid in helix region T', 'Number amino acid in helix region V', 'Number amino acid in helix region W', 'Number amino acid in helix region Y', 'Number amino acid in loop region A', 'Number amino acid in loop region C', 'Number amino acid in loop region D', 'Number amino acid in loop region E', 'Number amino acid in loop region F', 'Number amino acid in loop region G', 'Number amino acid in loop region H', 'Number amino acid in loop region I', 'Number amino acid in loop region K', 'Number amino acid in loop region L', 'Number amino acid in loop region M', 'Number amino acid in loop region N', 'Number amino acid in loop region P', 'Number amino acid in loop region Q', 'Number amino acid in loop region R', 'Number amino acid in loop region S', 'Number amino acid in loop region T', 'Number amino acid in loop region V', 'Number amino acid in loop region W', 'Number amino acid in loop region Y', 'Number amino acid in nonconserved region A', 'Number amino acid in nonconserved region C', 'Number amino acid in nonconserved region D', 'Number amino acid in nonconserved region E', 'Number amino acid in nonconserved region F', 'Number amino acid in nonconserved region G', 'Number amino acid in nonconserved region H', 'Number amino acid in nonconserved region I', 'Number amino acid in nonconserved region K', 'Number amino acid in nonconserved region L', 'Number amino acid in nonconserved region M', 'Number amino acid in nonconserved region N', 'Number amino acid in nonconserved region P', 'Number amino acid in nonconserved region Q', 'Number amino acid in nonconserved region R', 'Number amino acid in nonconserved region S', 'Number amino acid in nonconserved region T', 'Number amino acid in nonconserved region V', 'Number amino acid in nonconserved region W', 'Number amino acid in nonconserved region Y', 'Number amino acid in protein A', 'Number amino acid in protein C', 'Number amino acid in protein D', 'Number amino acid in protein E', 'Number amino acid in protein F', 'Number amino acid in protein G', 'Number amino acid in protein H', 'Number amino acid in protein I', 'Number amino acid in protein K', 'Number amino acid in protein L', 'Number amino acid in protein M', 'Number amino acid in protein N', 'Number amino acid in protein P', 'Number amino acid in protein Q', 'Number amino acid in protein R', 'Number amino acid in protein S', 'Number amino acid in protein T', 'Number amino acid in protein V', 'Number amino acid in protein W', 'Number amino acid in protein Y', 'Number amino acid in sheet region A', 'Number amino acid in sheet region C', 'Number amino acid in sheet region D', 'Number amino acid in sheet region E', 'Number amino acid in sheet region F', 'Number amino acid in sheet region G', 'Number amino acid in sheet region H', 'Number amino acid in sheet region I', 'Number amino acid in sheet region K', 'Number amino acid in sheet region L', 'Number amino acid in sheet region M', 'Number amino acid in sheet region N', 'Number amino acid in sheet region P', 'Number amino acid in sheet region Q', 'Number amino acid in sheet region R', 'Number amino acid in sheet region S', 'Number amino acid in sheet region T', 'Number amino acid in sheet region V', 'Number amino acid in sheet region W', 'Number amino acid in sheet region Y', 'Number of anchor regions', 'Number of coils', 'Number of conserved regions', 'Number of disordered regions', 'Number of globular regions', 'Number of helix', 'Number of loops', 'Number of negative regions', 'Number of negative regions with length >=30', 'Number of nonconserved regions', 'Number of positive regions', 'Number of positive regions with length >=30', 'Number of predictions', 'Number of sheets', 'Number of transmembrane helices', 'Positive region lengths', 'Stretch', 'Total length of anchor regions', 'Total length of coil regions', 'Total length of conserved regions', 'Total length of disordered regions', 'Total length of globular regions', 'Total length of helix regions', 'Total length of loop regions', 'Total length of nonconserved regions', 'Total length of sheet regions', 'Total length tmh regions', 'Y/n anchor regions', 'Y/n disordered regions', 'Y/n globular regions', 'Y/n tmh regions']
     aa_list = ['A', 'R', 'N', 'D', 'C', 'E', 'Q', 'G', 'H', 'I', 'L', 'K', 'M', 'F', 'P', 'S', 'T', 'W', 'Y', 'V']
 
+    batch_size = int(batch_size)
+    checkpoint = BuildCheckpoint(database_root + 'update_databases.checkpoint', {'input_file': os.path.abspath(input_file), 'output_format': output_format})
+    state = checkpoint.load() if str(resume) != 'False' and resume else None
+    if state is None:
+        state = {'lines_done': 0, 'error_file_size': 0}
+    elif os.path.exists(error_file):
+        # drop error lines written after the last checkpoint, their names are done again
+        with open(error_file, 'r+') as fo:
+            fo.truncate(state['error_file_size'])
+    error_fo = open(error_file, 'a' if state['lines_done'] > 0 else 'w', newline='')
+    error_writer = csv.writer(error_fo)
     error_report = []
-    current_line = 0
-    tot_lines = 116681
+    errors_written = 0
+    with open(input_file) as fileobject:
+        tot_lines = sum(1 for line in fileobject)
+    progress = ProgressReporter(tot_lines, 'names', progress_seconds, done=state['lines_done'])
+    if state['lines_done'] > 0:
+        print('resuming after ' + str(state['lines_done']) + ' names')
+    store = None
+    if output_format == 'store':
+        store = FeatureStoreWriter(database_root + store_name, 'precounted_human_genome', output_keys, batch_size=batch_size, replace_table=state['lines_done'] == 0)
     # Look through list of gns
     with open(input_file) as fileobject:
-        for line in fileobject:
-            print(str(current_line/tot_lines) + '% done')
-            current_line += 1
+        for current_line, line in enumerate(fileobject):
+            if current_line < state['lines_done']:
+                continue
             name = line[:-1]
             out_dict = {}
             try:
@@ -470,15 +499,31 @@ def write_outputs(input_file):
                 out_dict['Y/n tmh regions'] = 0
                 if 'Number of transmembrane helices' not in out_dict:
                     out_dict['Number of transmembrane helices'] = 0
-            out_line = name + ','
-            for key in output_keys:
-                out_line = out_line + str(out_dict[key]) + ','
-            f = open('databases/precounted_human_genome/'+name+'.txt', 'w')
-            f.write(out_line[:-1])
-            f.close() 
+            values = [out_dict[key] for key in output_keys]
+            if store is not None:
+                store.add(name, values)
+            else:
+                with open(database_root + 'precounted_human_genome/'+name+'.txt', 'w') as f:
+                    f.write(name + ',' + ','.join(str(value) for value in values))
+            progress.update()
+            if (current_line + 1) % batch_size == 0 or current_line + 1 == tot_lines:
+                # the rows, then the error lines, then the checkpoint, so the checkpoint never gets ahead of what is on disk
+                if store is not None:
+                    store.flush()
+                error_writer.writerows(error_report[errors_written:])
+                errors_written = len(error_report)
+                error_fo.flush()
+                os.fsync(error_fo.fileno())
+                checkpoint.save({'lines_done': current_line + 1, 'error_file_size': error_fo.tell()})
+        if store is not None:
+            store.close()
+        error_fo.close()
+        progress.finish()
+        checkpoint.clear()
         return error_report
 
 if __name__ == '__main__':
     input_file ='databases/all_ids.txt'
-    error_report = write_outputs(input_file)
-    pd.DataFrame(error_report).to_csv('unfound.csv', index = None, header= None)
\ No newline at end of file
+    # optional arguments: store (default) or folder, then False to start over instead of resuming an interrupted build
+    # the error report is written to unfound.csv as the build goes
+    write_outputs(input_file, *sys.argv[1:2], resume=sys.argv[2] if len(sys.argv) > 2 else True)
\ No newline at end of file